@@ -0,0 +1,390 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+import custos
+import dados
+import esbocos
+import instrumentacao
+import perfis
+
+
+# Abaixo deste número de linhas, a agregação paralela não compensa o custo de enviar as partições
+LINHAS_MINIMAS_PARALELO = 200_000
+
+# Depois dos blocos 1, 2, 4... até este, os agregados parciais da leitura em blocos são gerados
+# a cada este número de blocos (uma potência de dois)
+BLOCOS_ENTRE_PARCIAIS = 16
+
+# Dimensões do cubo de agregados que alimenta os gráficos da página inicial. Os prestadores (alta
+# cardinalidade) ficam fora dele: com eles, o cubo teria quase tantas linhas quanto a própria base
+DIMENSOES = [
+    'month',
+    'categoria',
+    'elegibilidade_sinistro',
+    'sexo_colaborador_sinistro',
+    'faixa_etaria_colaborador_sinistro',
+]
+
+# Dimensões da tabela de contagens de prestadores do modo exato
+DIMENSOES_PRESTADORES = ['elegibilidade_sinistro', 'nome_prestador_sinistro']
+
+
+@dataclass
+class SerieTemporal:
+    """Contagens densas indexadas por (categoria, elegibilidade, mês), com todos os meses do período."""
+    categorias: pd.Index
+    elegibilidades: pd.Index
+    # Chaves inteiras dos meses (ver `dados.chaves_mes`), consecutivas
+    meses: np.ndarray
+    contagens: np.ndarray
+
+    def serie(self, categoria, elegibilidades):
+        """Ocorrências mensais de uma categoria, somando as elegibilidades escolhidas."""
+        i = self.categorias.get_loc(categoria)
+        j = self.elegibilidades.get_indexer(elegibilidades)
+        contagem = self.contagens[i, j[j >= 0]].sum(axis=0)
+        return pd.DataFrame({'month': dados.datas_dos_meses(self.meses), 'count': contagem})
+
+
+@dataclass
+class Agregados:
+    """Resumo compacto de uma base: o cubo de contagens/somas e as métricas que não cabem nele.
+
+    Agregados de partes distintas da base podem ser combinados com `combinar_agregados`.
+    No modo exato, os prestadores são contados por elegibilidade em uma tabela à parte; no
+    modo aproximado, `segurados` é um `HyperLogLog` e os prestadores mais frequentes vêm de
+    resumos Space-Saving por elegibilidade.
+    """
+    cubo: pd.DataFrame
+    segurados: pd.Index
+    categorias: pd.Index
+    # Resumo dos perfis do GMM (ausente quando a base não tem a coluna `cluster`)
+    resumo_perfis: perfis.ResumoPerfis = None
+    # Sinistros por elegibilidade e prestador (modo exato) ou elegibilidade -> `SpaceSaving` (modo aproximado)
+    prestadores: object = None
+    # Histograma dos valores pagos e custos por segurado, para a página de custos
+    resumo_custos: custos.ResumoCustos = None
+
+    @property
+    def aproximado(self):
+        return isinstance(self.segurados, esbocos.HyperLogLog)
+
+    @property
+    def n_segurados(self):
+        if self.aproximado:
+            return self.segurados.estimativa()
+        return len(self.segurados)
+
+    @property
+    def erro_segurados(self):
+        """Erro típico (um desvio-padrão) do número de segurados; zero no modo exato."""
+        if self.aproximado:
+            return int(round(self.segurados.erro_relativo * self.n_segurados))
+        return 0
+
+    @property
+    def n_sinistros(self):
+        return int(self.cubo['count'].sum())
+
+    @property
+    def valor_maximo(self):
+        return self.cubo['valor_max'].max()
+
+    def contagem(self, colunas, **filtros):
+        """Número de sinistros por grupo de `colunas`, opcionalmente filtrando dimensões (coluna=valor)."""
+        por_prestador = 'nome_prestador_sinistro' in ([colunas] if isinstance(colunas, str) else colunas)
+        cubo = self.prestadores if por_prestador else self.cubo
+        for coluna, valor in filtros.items():
+            cubo = cubo[cubo[coluna] == valor]
+        return cubo.groupby(colunas, observed=True)['count'].sum()
+
+    def top(self, coluna, n=3, **filtros):
+        """Os `n` valores de `coluna` com mais sinistros."""
+        if self.aproximado and coluna == 'nome_prestador_sinistro':
+            return self._top_prestadores(n, **filtros)['count']
+        return self.contagem(coluna, **filtros).sort_values(ascending=False, kind='stable')[:n]
+
+    def erro_top(self, coluna, n=3, **filtros):
+        """Quanto a contagem de cada valor de `top` pode superar a real; zero quando é exata."""
+        if self.aproximado and coluna == 'nome_prestador_sinistro':
+            return self._top_prestadores(n, **filtros)['erro']
+        return pd.Series(0, index=self.top(coluna, n, **filtros).index)
+
+    def _top_prestadores(self, n, elegibilidade_sinistro=None):
+        if elegibilidade_sinistro is not None:
+            resumos = [self.prestadores[elegibilidade_sinistro]] if elegibilidade_sinistro in self.prestadores else []
+        else:
+            resumos = list(self.prestadores.values())
+        if not resumos:
+            return pd.DataFrame({'count': pd.Series(dtype=np.int64), 'erro': pd.Series(dtype=np.int64)})
+        resumo = resumos[0]
+        for outro in resumos[1:]:
+            resumo = resumo.combinar(outro)
+        return resumo.top(n)
+
+    @cached_property
+    def serie_temporal(self):
+        return construir_serie_temporal(self.cubo, self.categorias)
+
+    @cached_property
+    def cubo_custos(self):
+        """Sinistros e valor total por mês x categoria x faixa etária, indexados para a busca de fatias."""
+        tabela = self.cubo.groupby(custos.DIMENSOES_CUSTOS, observed=True, dropna=False)[['count', 'valor_total']].sum()
+        return custos.rotulos_texto(tabela).sort_index()
+
+    def memoria(self):
+        """Bytes ocupados pelo resumo (usado para respeitar o limite de memória da leitura em blocos)."""
+        tabelas = [self.cubo]
+        indices = [self.categorias]
+        tamanho_esbocos = 0
+        if self.aproximado:
+            tamanho_esbocos = self.segurados.memoria() + sum(resumo.memoria() for resumo in self.prestadores.values())
+        else:
+            indices.append(self.segurados)
+            tabelas.append(self.prestadores)
+        if self.resumo_custos is not None:
+            tamanho_esbocos += self.resumo_custos.memoria()
+        if self.resumo_perfis is not None:
+            tabelas += [self.resumo_perfis.contagem_categoria, self.resumo_perfis.contagem_prestador,
+                        self.resumo_perfis.valores]
+            indices.append(self.resumo_perfis.primeiro_cluster.index)
+        return int(sum(tabela.memory_usage(deep=True).sum() for tabela in tabelas)
+                   + sum(indice.memory_usage(deep=True) for indice in indices)
+                   + tamanho_esbocos)
+
+
+def construir_cubo(df):
+    """Agrega a base, em uma única passada, por todas as dimensões usadas nos gráficos."""
+    return (
+        df.groupby(DIMENSOES, observed=True, dropna=False)['valor_pago_sinistro']
+        .agg(count='size', valor_total='sum', valor_max='max')
+        .reset_index()
+    )
+
+
+def construir_serie_temporal(cubo, categorias):
+    """Monta o arranjo denso da série temporal das categorias a partir do cubo."""
+    contagens = (
+        cubo.groupby(['categoria', 'elegibilidade_sinistro', 'month'], observed=True)['count']
+        .sum()
+        .reset_index()
+    )
+    contagens = contagens[contagens['month'] != dados.MES_AUSENTE]
+    elegibilidades = pd.Index(contagens['elegibilidade_sinistro'].unique())
+    # Eixo com todos os meses do período: as chaves são inteiras e consecutivas
+    primeiro = contagens['month'].min() if len(contagens) else 0
+    meses = np.arange(primeiro, contagens['month'].max() + 1 if len(contagens) else 0, dtype=np.int32)
+
+    i = categorias.get_indexer(contagens['categoria'])
+    j = elegibilidades.get_indexer(contagens['elegibilidade_sinistro'])
+    k = contagens['month'].to_numpy() - primeiro
+    validos = (i >= 0) & (j >= 0)
+
+    matriz = np.zeros((len(categorias), len(elegibilidades), len(meses)), dtype=np.int64)
+    matriz[i[validos], j[validos], k[validos]] = contagens['count'].to_numpy()[validos]
+
+    return SerieTemporal(categorias, elegibilidades, meses, matriz)
+
+
+def construir_resumos_prestadores(df):
+    """Um resumo Space-Saving dos prestadores para cada elegibilidade."""
+    contagens = df.groupby(['elegibilidade_sinistro', 'nome_prestador_sinistro'], observed=True).size()
+    return {
+        str(elegibilidade): esbocos.SpaceSaving.de_contagens(
+            grupo.droplevel('elegibilidade_sinistro').rename(index=str))
+        for elegibilidade, grupo in contagens.groupby(level='elegibilidade_sinistro', observed=True)
+    }
+
+
+def combinar_resumos_prestadores(anteriores, novos):
+    combinados = dict(anteriores)
+    for elegibilidade, resumo in novos.items():
+        combinados[elegibilidade] = (combinados[elegibilidade].combinar(resumo)
+                                     if elegibilidade in combinados else resumo)
+    return combinados
+
+
+@instrumentacao.medido('agregar')
+def construir_agregados(df, rotulos_perfis=perfis.PERFIS, aproximado=False):
+    """Agregados de uma base (ou parte dela) já preparada.
+
+    Com `aproximado=True`, os segurados distintos e os prestadores mais frequentes são
+    estimados por esboços de tamanho fixo, que não crescem com a cardinalidade da base.
+    """
+    if aproximado:
+        segurados = esbocos.HyperLogLog().adicionar(df['segurado'])
+        prestadores = construir_resumos_prestadores(df)
+    else:
+        segurados = pd.Index(df['segurado'].dropna().unique().astype(str))
+        prestadores = df.groupby(DIMENSOES_PRESTADORES, observed=True, dropna=False).size().reset_index(name='count')
+
+    return Agregados(
+        cubo=construir_cubo(df),
+        segurados=segurados,
+        # Categorias na ordem em que aparecem na base, como no seletor da página inicial
+        categorias=pd.Index(df['categoria'].dropna().unique().astype(str)),
+        resumo_perfis=perfis.construir_resumo_perfis(df, rotulos_perfis) if 'cluster' in df.columns else None,
+        prestadores=prestadores,
+        resumo_custos=custos.construir_resumo_custos(df, aproximado),
+    )
+
+
+def combinar_cubos(cubos):
+    """Soma cubos calculados sobre partes distintas da base."""
+    return (
+        dados.concatenar(cubos)
+        .groupby(DIMENSOES, observed=True, dropna=False)
+        .agg(count=('count', 'sum'), valor_total=('valor_total', 'sum'), valor_max=('valor_max', 'max'))
+        .reset_index()
+    )
+
+
+def combinar_contagens_prestadores(tabelas):
+    return (
+        dados.concatenar(tabelas)
+        .groupby(DIMENSOES_PRESTADORES, observed=True, dropna=False)['count'].sum()
+        .reset_index()
+    )
+
+
+@instrumentacao.medido('combinar_agregados')
+def combinar_agregados(partes):
+    """Combina os agregados de partes da base, na ordem em que elas aparecem no arquivo."""
+    segurados = partes[0].segurados
+    categorias = partes[0].categorias
+    prestadores = partes[0].prestadores
+    for parte in partes[1:]:
+        if parte.aproximado:
+            segurados = segurados.combinar(parte.segurados)
+            prestadores = combinar_resumos_prestadores(prestadores, parte.prestadores)
+        else:
+            segurados = segurados.append(parte.segurados.difference(segurados))
+        categorias = categorias.append(parte.categorias.difference(categorias, sort=False))
+    if not partes[0].aproximado:
+        prestadores = combinar_contagens_prestadores([parte.prestadores for parte in partes])
+
+    return Agregados(
+        cubo=combinar_cubos([parte.cubo for parte in partes]),
+        segurados=segurados,
+        categorias=categorias,
+        resumo_perfis=(perfis.combinar_resumos_perfis([parte.resumo_perfis for parte in partes])
+                       if all(parte.resumo_perfis is not None for parte in partes) else None),
+        prestadores=prestadores,
+        resumo_custos=custos.combinar_resumos_custos([parte.resumo_custos for parte in partes]),
+    )
+
+
+def atualizar_agregados(resumo, delta):
+    """Incorpora um lote de sinistros novos, já preparado, aos agregados existentes.
+
+    O custo é proporcional ao lote e ao tamanho dos agregados, não ao histórico da base.
+    """
+    rotulos = resumo.resumo_perfis.rotulos if resumo.resumo_perfis is not None else perfis.PERFIS
+    return combinar_agregados([resumo, construir_agregados(delta, rotulos, resumo.aproximado)])
+
+
+def criar_executor(processos):
+    """Pool de `processos` processos para a agregação paralela.
+
+    Os processos são criados por um servidor de fork (`forkserver`), e não por fork do
+    processo atual: o dashboard tem várias threads (sessões e carregamentos em segundo
+    plano), e um fork copiaria locks mantidos por elas.
+    """
+    return ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context('forkserver'))
+
+
+def _usar_executor(executor, processos):
+    # Um executor compartilhado continua aberto ao final; sem ele, cria-se um só para esta agregação
+    return nullcontext(executor) if executor is not None else criar_executor(processos)
+
+
+@instrumentacao.medido('agregar_paralelo')
+def construir_agregados_paralelo(df, rotulos_perfis=perfis.PERFIS, processos=None, aproximado=False, executor=None):
+    """Como `construir_agregados`, dividindo a base em faixas de linhas agregadas em processos separados.
+
+    As partes são combinadas na ordem das linhas, então o resultado é o mesmo da versão sequencial.
+    Com `executor` (de `criar_executor`), as partes são agregadas nesse pool compartilhado.
+    """
+    processos = processos or os.cpu_count() or 1
+    if processos <= 1 or len(df) < LINHAS_MINIMAS_PARALELO:
+        return construir_agregados(df, rotulos_perfis, aproximado)
+
+    limites = np.linspace(0, len(df), processos + 1, dtype=int)
+    particoes = [df.iloc[inicio:fim] for inicio, fim in zip(limites[:-1], limites[1:])]
+    with _usar_executor(executor, processos) as executor:
+        partes = list(executor.map(construir_agregados, particoes, [rotulos_perfis] * len(particoes),
+                                   [aproximado] * len(particoes)))
+    return combinar_agregados(partes)
+
+
+def _agregar_blocos_em_paralelo(blocos, rotulos_perfis, processos, aproximado, executor):
+    # No máximo dois blocos por processo ficam em trânsito, limitando a memória usada
+    with _usar_executor(executor, processos) as executor:
+        pendentes = deque()
+        for bloco in blocos:
+            pendentes.append(executor.submit(construir_agregados, bloco, rotulos_perfis, aproximado))
+            if len(pendentes) >= 2 * processos:
+                yield pendentes.popleft().result()
+        while pendentes:
+            yield pendentes.popleft().result()
+
+
+def agregados_parciais(blocos, limite_memoria=None, rotulos_perfis=perfis.PERFIS, processos=1, aproximado=False,
+                       executor=None):
+    """Dobra blocos já preparados, gerando após cada bloco os `Agregados` de tudo o que já foi lido, ou None.
+
+    Os agregados dos blocos são combinados aos pares, como em um contador binário: uma
+    pilha guarda partes de 1, 2, 4... blocos, e cada bloco só é recombinado O(log n)
+    vezes. O acumulado é gerado depois dos blocos 1, 2, 4... até `BLOCOS_ENTRE_PARCIAIS`
+    (quando a pilha tem uma só parte), depois a cada `BLOCOS_ENTRE_PARCIAIS` blocos e ao
+    final; nos demais blocos, é gerado None.
+
+    Se `limite_memoria` (em bytes) for informado, a leitura é interrompida com
+    `LimiteMemoriaExcedido` assim que as partes da pilha ultrapassarem-no. Com
+    `processos` > 1, os blocos são agregados em paralelo (no `executor` compartilhado,
+    se informado) e combinados em ordem.
+    """
+    if processos > 1:
+        parciais = _agregar_blocos_em_paralelo(blocos, rotulos_perfis, processos, aproximado, executor)
+    else:
+        parciais = (construir_agregados(bloco, rotulos_perfis, aproximado) for bloco in blocos)
+
+    # Pilha de [agregados, número de blocos, memória], em ordem de leitura
+    pilha = []
+    for lidos, parcial in enumerate(parciais, start=1):
+        pilha.append([parcial, 1, parcial.memoria()])
+        while len(pilha) > 1 and pilha[-2][1] == pilha[-1][1]:
+            anterior, ultimo = pilha.pop(-2), pilha.pop()
+            combinado = combinar_agregados([anterior[0], ultimo[0]])
+            pilha.append([combinado, anterior[1] + ultimo[1], combinado.memoria()])
+        if len(pilha) > 1 and lidos % BLOCOS_ENTRE_PARCIAIS == 0:
+            # O acumulado vira a única parte da pilha: os blocos seguintes formam partes novas, que só
+            # são combinadas com ele no próximo acumulado
+            combinado = combinar_agregados([parte for parte, _, _ in pilha])
+            pilha = [[combinado, lidos, combinado.memoria()]]
+
+        if limite_memoria is not None and sum(memoria for _, _, memoria in pilha) > limite_memoria:
+            raise dados.LimiteMemoriaExcedido(
+                f'Os agregados da base ultrapassaram o limite de {limite_memoria / 2**20:.0f} MB'
+            )
+        yield pilha[0][0] if len(pilha) == 1 else None
+
+    if len(pilha) > 1:
+        yield combinar_agregados([parte for parte, _, _ in pilha])
+
+
+def agregar_em_blocos(blocos, limite_memoria=None, rotulos_perfis=perfis.PERFIS, processos=1, aproximado=False,
+                      executor=None):
+    """Dobra blocos já preparados em um único `Agregados`, sem manter a base inteira em memória."""
+    resumo = None
+    for parcial in agregados_parciais(blocos, limite_memoria, rotulos_perfis, processos, aproximado, executor):
+        resumo = parcial if parcial is not None else resumo
+    return resumo
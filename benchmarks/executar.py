@@ -0,0 +1,218 @@
+"""Benchmark do pipeline do dashboard sobre bases sintéticas de vários tamanhos.
+
+Para cada tamanho, mede a leitura e a preparação da base (com as etapas internas
+registradas por `instrumentacao`), a construção dos agregados, cada tabela das
+páginas inicial, de análises e de custos e a geração da especificação de cada gráfico. Cada
+tamanho roda em um processo novo, para que o pico de memória (RSS) seja só dele.
+Uso, a partir da raiz do projeto:
+
+    python -m benchmarks.executar --linhas 10000 100000 1000000 --rotulo v1.2
+    python -m benchmarks.executar --linhas 1000000 --comparar benchmarks/resultados/v1.2.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import agregados
+import dados
+import graficos
+import instrumentacao
+import relatorio
+from benchmarks import gerador
+
+
+TAMANHOS = [10_000, 100_000, 1_000_000]
+
+# Acima deste tamanho a base é lida em blocos, como no modo "Leitura em blocos" do app
+LINHAS_MAXIMAS_EM_MEMORIA = 5_000_000
+
+DIRETORIO = Path(__file__).parent
+DIRETORIO_DADOS = DIRETORIO / 'dados'
+DIRETORIO_RESULTADOS = DIRETORIO / 'resultados'
+
+# Tabelas das páginas, na ordem em que o dashboard as usa
+TABELAS_INICIO = [
+    ('metricas_resumo', lambda resumo: relatorio.metricas_resumo(resumo)),
+    ('distribuicao_sexo', lambda resumo: relatorio.distribuicao_sexo(resumo)),
+    ('distribuicao_elegibilidade', lambda resumo: relatorio.distribuicao_elegibilidade(resumo)),
+    ('faixa_etaria_sexo', lambda resumo: relatorio.faixa_etaria_sexo(resumo)),
+    ('ocorrencias_por_mes', lambda resumo: relatorio.ocorrencias_por_mes(resumo)),
+    ('top_categorias', lambda resumo: [relatorio.top_categorias(resumo, e) for e in ['Titular', 'Dependente']]),
+    ('top_prestadores', lambda resumo: [relatorio.top_prestadores(resumo, e) for e in ['Titular', 'Dependente']]),
+    ('series_categorias', lambda resumo: relatorio.series_categorias(resumo)),
+]
+TABELAS_ANALISES = [
+    ('perfis_ocorrencias', lambda resumo_perfis: relatorio.perfis_ocorrencias(resumo_perfis)),
+    ('perfis_segurados', lambda resumo_perfis: relatorio.perfis_segurados(resumo_perfis)),
+    ('perfis_top_categorias', lambda resumo_perfis: relatorio.perfis_top(resumo_perfis, 'categoria')),
+    ('perfis_top_prestadores', lambda resumo_perfis: relatorio.perfis_top(resumo_perfis, 'nome_prestador_sinistro')),
+    ('perfis_valor_pago', lambda resumo_perfis: relatorio.perfis_valor_pago(resumo_perfis)),
+]
+
+TABELAS_CUSTOS = [
+    ('custos_metricas', lambda resumo: relatorio.custos_metricas(resumo)),
+    ('custos_por_mes', lambda resumo: relatorio.custos_por_mes(resumo)),
+    ('custos_por_faixa', lambda resumo: relatorio.custos_por_faixa(resumo)),
+    ('custos_por_categoria', lambda resumo: relatorio.custos_por_categoria(resumo)),
+    ('top_segurados_custo', lambda resumo: relatorio.top_segurados_custo(resumo)),
+    ('ranking_prestadores_custo', lambda resumo: relatorio.ranking_prestadores_custo(resumo)),
+]
+
+GRAFICOS_INICIO = [
+    (graficos.grafico_sexo, ()),
+    (graficos.grafico_elegibilidade, ()),
+    (graficos.grafico_faixa_etaria_sexo, ()),
+    (graficos.grafico_ocorrencias_mes, ()),
+    (graficos.grafico_top_categorias, ('Titular', 'lightgreen', 'Top 3 Categorias')),
+    (graficos.grafico_top_prestadores, ('Titular', 'lightgreen', 'Top 3 Prestadores')),
+    (graficos.grafico_serie_categoria, ('Exames', ['Titular', 'Dependente'])),
+]
+GRAFICOS_ANALISES = [
+    (graficos.grafico_perfis_ocorrencias, ()),
+    (graficos.grafico_perfis_segurados, ()),
+    (graficos.grafico_perfis_top, ('categoria', 'Categoria', 'Categorias por Perfil')),
+    (graficos.grafico_perfis_top, ('nome_prestador_sinistro', 'Prestador', 'Prestadores por Perfil')),
+    (graficos.grafico_perfis_valor_pago, ()),
+]
+# Página de custos sem filtros (toda a base), como ao abri-la
+GRAFICOS_CUSTOS = [
+    (graficos.grafico_custos_mes, (None, None, None, 'valor_total', 'Valor Pago')),
+    (graficos.grafico_custos_mes, (None, None, None, 'custo_per_capita', 'Custo per Capita')),
+    (graficos.grafico_custos_faixa, (None, None, None)),
+    (graficos.grafico_custos_categoria, (None, None, None)),
+    (graficos.grafico_ranking_prestadores, (None, None, None)),
+]
+# Comparação com a própria base como única base comparada
+GRAFICOS_COMPARACAO = [
+    (graficos.grafico_comparacao_mes, ('count', 'Sinistros', 'calendario')),
+    (graficos.grafico_comparacao_faixas, ('custo_per_capita', 'Custo per Capita')),
+    (graficos.grafico_comparacao_categorias, ()),
+]
+
+
+def executar_tamanho(linhas, semente=gerador.SEMENTE, medir_memoria=False, aproximado=False):
+    """Roda todas as etapas para uma base de `linhas` linhas e devolve os registros de `instrumentacao`."""
+    caminho = gerador.gerar_base(linhas, DIRETORIO_DADOS / f'base_{linhas}_{semente}.csv', semente)
+    instrumentacao.ativar_memoria(medir_memoria)
+    instrumentacao.limpar()
+
+    with instrumentacao.etapa('carregamento_total', linhas=linhas):
+        if linhas > LINHAS_MAXIMAS_EM_MEMORIA:
+            resumo = relatorio.carregar_base_em_blocos(caminho, aproximado=aproximado)
+        else:
+            df = dados.preparar_base(dados.ler_base(caminho))
+            resumo = agregados.construir_agregados(df, aproximado=aproximado)
+            del df
+
+    for nome, tabela in TABELAS_INICIO:
+        with instrumentacao.etapa(f'tabela:{nome}'):
+            tabela(resumo)
+    for nome, tabela in TABELAS_ANALISES:
+        with instrumentacao.etapa(f'tabela:{nome}'):
+            tabela(resumo.resumo_perfis)
+    for nome, tabela in TABELAS_CUSTOS:
+        with instrumentacao.etapa(f'tabela:{nome}'):
+            tabela(resumo)
+
+    for graficos_pagina, alvo in [(GRAFICOS_INICIO, resumo), (GRAFICOS_ANALISES, resumo.resumo_perfis),
+                                  (GRAFICOS_CUSTOS, resumo), (GRAFICOS_COMPARACAO, {'base': resumo})]:
+        for construir, parametros in graficos_pagina:
+            with instrumentacao.etapa(f'grafico:{construir.__name__}') as registro:
+                especificacao = construir(alvo, *parametros).to_dict()
+                registro['linhas'] = sum(len(valores) for valores in especificacao.get('datasets', {}).values())
+
+    registros = instrumentacao.registros()
+    # ru_maxrss é dado em KB no Linux
+    pico_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {'linhas': linhas, 'pico_rss_mb': round(pico_rss_mb, 1),
+            'registros': json.loads(registros.to_json(orient='records'))}
+
+
+def resumir(resultado):
+    """Tempo total, chamadas, linhas por segundo e pico de memória de cada etapa de um tamanho."""
+    registros = pd.DataFrame(resultado['registros'])
+    tabela = registros.groupby('etapa', sort=False).agg(
+        chamadas=('duracao_s', 'size'), duracao_s=('duracao_s', 'sum'),
+        linhas=('linhas', 'sum'), pico_memoria_mb=('pico_memoria_mb', 'max'),
+    )
+    tabela['linhas_por_s'] = np.where(tabela['linhas'] > 0, tabela['linhas'] / tabela['duracao_s'], np.nan)
+    tabela.insert(0, 'tamanho', resultado['linhas'])
+    return tabela.reset_index()
+
+
+def ambiente():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'momento': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'cpus': os.cpu_count(),
+        'plataforma': platform.platform(),
+    }
+
+
+def comparar(atual, anterior):
+    """Razão entre as durações atuais e as de um resultado anterior (> 1: ficou mais lento)."""
+    chaves = ['tamanho', 'etapa']
+    tabela = atual[chaves + ['duracao_s']].merge(anterior[chaves + ['duracao_s']], on=chaves,
+                                                 suffixes=('', '_anterior'))
+    tabela['razao'] = (tabela['duracao_s'] / tabela['duracao_s_anterior']).round(2)
+    return tabela
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark do pipeline do dashboard UniData.')
+    parser.add_argument('--linhas', type=int, nargs='+', default=TAMANHOS, help='tamanhos das bases sintéticas')
+    parser.add_argument('--semente', type=int, default=gerador.SEMENTE)
+    parser.add_argument('--memoria', action='store_true', help='mede o pico de memória de cada etapa (mais lento)')
+    parser.add_argument('--aproximado', action='store_true', help='usa o modo aproximado dos agregados')
+    parser.add_argument('--rotulo', default=datetime.now().strftime('%Y%m%d-%H%M%S'),
+                        help='nome do arquivo de resultado em benchmarks/resultados')
+    parser.add_argument('--comparar', help='resultado anterior (JSON) para comparar as durações')
+    args = parser.parse_args(argv)
+
+    resultados = []
+    for linhas in args.linhas:
+        # Um processo novo por tamanho: o pico de RSS e os caches não vazam entre tamanhos
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            resultados.append(executor.submit(executar_tamanho, linhas, args.semente, args.memoria,
+                                              args.aproximado).result())
+
+    tabela = pd.concat([resumir(resultado) for resultado in resultados], ignore_index=True)
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(tabela.round(4).to_string(index=False))
+        for resultado in resultados:
+            print(f"{resultado['linhas']} linhas: pico de RSS {resultado['pico_rss_mb']} MB")
+
+        if args.comparar:
+            anterior = json.loads(Path(args.comparar).read_text(encoding='utf-8'))
+            print(comparar(tabela, pd.DataFrame(anterior['resumo'])).to_string(index=False))
+
+    DIRETORIO_RESULTADOS.mkdir(parents=True, exist_ok=True)
+    destino = DIRETORIO_RESULTADOS / f'{args.rotulo}.json'
+    destino.write_text(json.dumps({
+        'ambiente': ambiente(),
+        'parametros': {'semente': args.semente, 'memoria': args.memoria, 'aproximado': args.aproximado},
+        'resumo': json.loads(tabela.to_json(orient='records')),
+        'resultados': resultados,
+    }, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f'Resultado salvo em {destino}')
+
+
+if __name__ == '__main__':
+    main()
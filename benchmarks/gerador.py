@@ -0,0 +1,111 @@
+"""Bases sintéticas de sinistros, com o esquema esperado pelo dashboard e assimetrias realistas.
+
+Os segurados têm sexo, faixa etária, elegibilidade e cluster fixos; o número de
+sinistros por segurado e a escolha de prestadores seguem distribuições de cauda
+longa, e as categorias aparecem com grafias variadas (exercitando a normalização).
+A mesma semente gera sempre a mesma base. Uso:
+
+    python -m benchmarks.gerador 1000000 benchmarks/dados/base_1000000.csv
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+SEMENTE = 0
+
+# Linhas geradas e gravadas por vez: bases de dezenas de milhões de linhas não cabem em memória
+LINHAS_POR_BLOCO = 1_000_000
+
+CATEGORIAS = [
+    'Exames', 'Consultas', 'Terapias', 'Internação', 'Pronto Socorro', 'Procedimentos Diagnósticos',
+    'Exames Endócrinos', 'Cirurgias', 'Odontologia', 'Fisioterapia', 'Psicologia', 'Outros',
+]
+FAIXAS_ETARIAS = [
+    '0 a 18', '19 a 23', '24 a 28', '29 a 33', '34 a 38', '39 a 43', '44 a 48', '49 a 53', '54 a 58', '59 ou mais',
+]
+N_PRESTADORES = 5_000
+N_CLUSTERS = 10
+PERIODO = ('2018-01-01', '2024-12-31')
+
+
+def _grafias(nome):
+    # Variações de caixa vistas nas bases reais, resolvidas por `dados.normalizar_texto`
+    return [nome, nome.upper(), nome.lower()]
+
+
+def _pesos_zipf(n, expoente, gerador):
+    pesos = 1 / np.arange(1, n + 1) ** expoente
+    return gerador.permutation(pesos / pesos.sum())
+
+
+def gerar_blocos(linhas, semente=SEMENTE, linhas_por_bloco=LINHAS_POR_BLOCO, n_segurados=None):
+    """Gera a base em DataFrames de até `linhas_por_bloco` linhas.
+
+    Sem `n_segurados`, a população cresce com a base (em média dez sinistros por segurado).
+    """
+    gerador = np.random.default_rng(semente)
+
+    # Segurados: poucos deles concentram muitos sinistros
+    n_segurados = n_segurados or max(100, linhas // 10)
+    atividade = gerador.lognormal(0, 1.2, n_segurados)
+    atividade /= atividade.sum()
+    sexo = gerador.choice(np.array(['M', 'F'], dtype=object), n_segurados)
+    faixa = gerador.choice(np.array(FAIXAS_ETARIAS, dtype=object), n_segurados,
+                           p=np.array([16, 7, 8, 10, 11, 11, 10, 9, 8, 10]) / 100)
+    elegibilidade = gerador.choice(np.array(['Titular', 'Dependente'] + ['TITULAR', 'dependente'], dtype=object),
+                                   n_segurados, p=[0.5, 0.4, 0.06, 0.04])
+    cluster = gerador.integers(0, N_CLUSTERS, n_segurados)
+
+    grafias = np.array([grafia for nome in CATEGORIAS for grafia in _grafias(nome)], dtype=object)
+    pesos_categorias = np.repeat(_pesos_zipf(len(CATEGORIAS), 1.1, gerador), 3) * np.tile([0.9, 0.07, 0.03],
+                                                                                        len(CATEGORIAS))
+    prestadores = np.array([f'Prestador {i:05d}' for i in range(N_PRESTADORES)], dtype=object)
+    pesos_prestadores = _pesos_zipf(N_PRESTADORES, 1.05, gerador)
+    datas = pd.date_range(*PERIODO).strftime('%d/%m/%Y').to_numpy(dtype=object)
+    # Sazonalidade leve e crescimento da utilização ao longo do período
+    pesos_datas = np.linspace(1, 2, len(datas)) * (1 + 0.2 * np.sin(np.arange(len(datas)) / 365 * 2 * np.pi))
+    pesos_datas /= pesos_datas.sum()
+
+    for inicio in range(0, linhas, linhas_por_bloco):
+        n = min(linhas_por_bloco, linhas - inicio)
+        segurados = gerador.choice(n_segurados, n, p=atividade)
+        yield pd.DataFrame({
+            'segurado': segurados,
+            'categoria': gerador.choice(grafias, n, p=pesos_categorias),
+            'elegibilidade_sinistro': elegibilidade[segurados],
+            'sexo_colaborador_sinistro': sexo[segurados],
+            'faixa_etaria_colaborador_sinistro': faixa[segurados],
+            'data_ocorrencia_sinistro': gerador.choice(datas, n, p=pesos_datas),
+            'nome_prestador_sinistro': gerador.choice(prestadores, n, p=pesos_prestadores),
+            'valor_pago_sinistro': np.round(gerador.lognormal(4.5, 1.1, n), 2),
+            'cluster': cluster[segurados],
+        })
+
+
+def gerar_base(linhas, destino, semente=SEMENTE):
+    """Grava a base sintética em CSV, bloco a bloco. Uma base já gerada com os mesmos parâmetros é reaproveitada."""
+    destino = Path(destino)
+    if destino.exists():
+        return destino
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporario = destino.with_suffix('.tmp')
+    for i, bloco in enumerate(gerar_blocos(linhas, semente)):
+        bloco.to_csv(temporario, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    temporario.replace(destino)
+    return destino
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Gera uma base sintética de sinistros em CSV.')
+    parser.add_argument('linhas', type=int)
+    parser.add_argument('destino')
+    parser.add_argument('--semente', type=int, default=SEMENTE)
+    args = parser.parse_args(argv)
+    print(gerar_base(args.linhas, args.destino, args.semente))
+
+
+if __name__ == '__main__':
+    main()
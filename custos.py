@@ -0,0 +1,352 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import esbocos
+
+
+# Dimensões do cubo de custos: cada fatia da página de custos é uma seleção delas
+DIMENSOES_CUSTOS = ['month', 'categoria', 'faixa_etaria_colaborador_sinistro']
+
+# Dimensões do histograma de valores. Sem o mês, o histograma tem no máximo categorias x faixas x
+# classes linhas, qualquer que seja o tamanho da base (com ele, teria quase uma linha por sinistro)
+DIMENSOES_HISTOGRAMA = ['categoria', 'faixa_etaria_colaborador_sinistro']
+
+# Razão entre os limites de classes consecutivas do histograma de valores: os quantis são
+# interpolados dentro da classe, com erro relativo de no máximo a largura dela (5%)
+RAZAO_CLASSES = 1.05
+
+# Valores pagos abaixo deste (inclusive zero e estornos) caem na primeira classe
+VALOR_MINIMO = 0.01
+
+# Percentis do valor pago por sinistro exibidos na página de custos
+PERCENTIS_CUSTOS = [0.5, 0.9, 0.99]
+
+# Meses guardados em cada palavra do mapa de meses dos segurados (um bit por mês)
+MESES_POR_PALAVRA = 64
+
+
+def classes_valor(valores):
+    """Classe do histograma de cada valor pago: floor(log(valor) / log(RAZAO_CLASSES))."""
+    valores = np.maximum(np.asarray(valores, dtype=np.float64), VALOR_MINIMO)
+    return np.floor(np.log(valores) / np.log(RAZAO_CLASSES)).astype(np.int16)
+
+
+def valores_ordenados(classes, contagens, posicoes):
+    """Valor estimado do sinistro em cada posição (a partir de 0) da ordem crescente do histograma.
+
+    Dentro de uma classe, os valores são supostos espalhados uniformemente na escala logarítmica.
+    """
+    acumulado = np.cumsum(contagens)
+    indices = np.minimum(np.searchsorted(acumulado, posicoes, side='right'), len(acumulado) - 1)
+    anteriores = acumulado[indices] - contagens[indices]
+    fracoes = (posicoes - anteriores + 0.5) / contagens[indices]
+    return RAZAO_CLASSES ** (classes[indices] + fracoes)
+
+
+def mascara_meses(palavras, meses):
+    """Máscara, para cada palavra do mapa de meses, dos bits dos meses entre o par (primeiro, último)."""
+    inicio = np.asarray(palavras, dtype=np.int64) * MESES_POR_PALAVRA
+
+    def primeiros_bits(n):
+        # Os `n` bits menos significativos ligados (0 <= n <= 64)
+        n = np.clip(n, 0, MESES_POR_PALAVRA).astype(np.uint64)
+        return np.where(n >= MESES_POR_PALAVRA, ~np.uint64(0),
+                        (np.uint64(1) << np.minimum(n, np.uint64(MESES_POR_PALAVRA - 1))) - np.uint64(1))
+
+    primeiro, ultimo = meses
+    return primeiros_bits(ultimo - inicio + 1) & ~primeiros_bits(primeiro - inicio)
+
+
+def _ou_por_indice(mapas):
+    # OU bit a bit dos mapas de meses com o mesmo índice: depois de ordenados, cada grupo é contíguo
+    mapas = mapas.sort_index()
+    if mapas.empty:
+        return mapas
+    inicios = np.flatnonzero(~mapas.index.duplicated())
+    return pd.Series(np.bitwise_or.reduceat(mapas.to_numpy(), inicios), index=mapas.index[inicios], name=mapas.name)
+
+
+def centavos(valores):
+    # Custos inteiros, para os resumos Space-Saving (cujas contagens e erros são inteiros)
+    return np.round(valores * 100).astype(np.int64)
+
+
+@dataclass
+class ResumoCustos:
+    """Distribuição dos valores pagos e custos por segurado, combináveis entre partes da base.
+
+    As somas e contagens por mês x categoria x faixa etária vêm do cubo dos `Agregados`;
+    aqui ficam o histograma dos valores por categoria e faixa etária (para os quantis), os
+    custos por segurado e por prestador em cada faixa etária e, para o custo per capita de
+    qualquer fatia, os meses em que cada segurado teve sinistros em cada categoria e faixa
+    (um bit por mês). Nenhuma tabela tem o mês junto de uma dimensão de alta cardinalidade: o
+    tamanho do resumo depende dos segurados e prestadores distintos, não do número de
+    sinistros. Todas as tabelas são indexadas e ordenadas pelas dimensões, de modo que uma
+    fatia é lida pelo índice, sem percorrer a tabela inteira. No modo aproximado, os segurados
+    de cada faixa e de cada célula mês x categoria x faixa são contados por HyperLogLog e os
+    maiores custos por segurado e por prestador vêm de resumos Space-Saving (em centavos).
+    """
+    # (categoria, faixa, classe do valor) -> número de sinistros
+    histograma: pd.Series
+    # (faixa, segurado) -> sinistros e valor total (apenas no modo exato)
+    segurados: pd.DataFrame = None
+    # (faixa, prestador) -> sinistros e valor total (apenas no modo exato)
+    prestadores: pd.DataFrame = None
+    # (categoria, faixa, segurado, palavra) -> meses com sinistros, um bit por mês a partir do mês
+    # palavra * MESES_POR_PALAVRA (apenas no modo exato)
+    meses_segurados: pd.Series = None
+    # Faixa -> `HyperLogLog` dos segurados (apenas no modo aproximado)
+    populacao: dict = None
+    # (mês, categoria, faixa) -> registros do HyperLogLog dos segurados da célula (apenas no modo aproximado)
+    populacao_celulas: pd.DataFrame = None
+    # Faixa -> `SpaceSaving` do valor pago, em centavos, por segurado e por prestador (apenas no modo aproximado)
+    custos_segurados: dict = None
+    custos_prestadores: dict = None
+
+    @property
+    def aproximado(self):
+        return self.populacao is not None
+
+    def n_segurados(self, meses=None, categorias=None, faixas=None):
+        """Segurados distintos com sinistros na fatia (a população do custo per capita)."""
+        return int(self._segurados_por(None, meses, categorias, faixas).sum())
+
+    def segurados_por_faixa(self, meses=None, categorias=None, faixas=None):
+        """Segurados distintos com sinistros na fatia, em cada faixa etária."""
+        return self._segurados_por('faixa_etaria_colaborador_sinistro', meses, categorias, faixas)
+
+    def segurados_por_mes(self, meses=None, categorias=None, faixas=None):
+        """Segurados distintos com sinistros na fatia, em cada mês (chaves inteiras de mês)."""
+        return self._segurados_por('month', meses, categorias, faixas)
+
+    def _segurados_por(self, nivel, meses, categorias, faixas):
+        # Distintos na união das células da fatia, por `nivel` (ou no total, se None)
+        if self.aproximado:
+            if nivel != 'month' and meses is None and categorias is None:
+                # Sem filtro de mês e categoria, os HyperLogLog de cada faixa, mais precisos que os das células
+                return self._populacao_por_faixa(nivel, faixas)
+            fatia = fatiar(self.populacao_celulas, meses, categorias, faixas)
+            registros = fatia.max().to_numpy() if nivel is None else fatia.groupby(level=nivel).max()
+            if nivel is None:
+                return pd.Series(esbocos.estimativas(registros) if len(fatia) else [0])
+            return pd.Series(esbocos.estimativas(registros.to_numpy()), index=registros.index, dtype=np.int64)
+
+        fatia = fatiar(self.meses_segurados, categorias=categorias, faixas=faixas)
+        if meses is not None:
+            fatia = fatia & mascara_meses(fatia.index.get_level_values('palavra'), meses)
+            fatia = fatia[fatia != 0]
+        if nivel is None:
+            return pd.Series([fatia.index.get_level_values('segurado').nunique()])
+        if nivel != 'month':
+            return fatia.reset_index('segurado').groupby(level=nivel)['segurado'].nunique()
+
+        # Um segurado conta uma vez por mês, mesmo com sinistros em várias categorias ou faixas
+        mapas = _ou_por_indice(fatia.droplevel(DIMENSOES_HISTOGRAMA))
+        if mapas.empty:
+            return pd.Series(dtype=np.int64, index=pd.Index([], dtype=np.int64, name='month'))
+        palavras = mapas.index.get_level_values('palavra').to_numpy()
+        bits = np.unpackbits(mapas.to_numpy().astype('<u8').view(np.uint8).reshape(-1, 8), axis=1,
+                             bitorder='little')
+        contagens = pd.DataFrame(bits).groupby(palavras).sum().stack()
+        contagens = contagens[contagens > 0]
+        meses_contagens = (contagens.index.get_level_values(0).to_numpy(dtype=np.int64) * MESES_POR_PALAVRA
+                           + contagens.index.get_level_values(1).to_numpy(dtype=np.int64))
+        return pd.Series(contagens.to_numpy(dtype=np.int64), index=pd.Index(meses_contagens, name='month'))
+
+    def _populacao_por_faixa(self, nivel, faixas):
+        populacao = {faixa: hll for faixa, hll in self.populacao.items() if faixas is None or faixa in faixas}
+        if nivel is not None:
+            return pd.Series({faixa: hll.estimativa() for faixa, hll in populacao.items()}, dtype=np.int64)
+        if not populacao:
+            return pd.Series([0])
+        hlls = list(populacao.values())
+        combinado = hlls[0]
+        for hll in hlls[1:]:
+            combinado = combinado.combinar(hll)
+        return pd.Series([combinado.estimativa()])
+
+    def quantis(self, qs=PERCENTIS_CUSTOS, categorias=None, faixas=None):
+        """Quantis do valor pago por sinistro em todo o período, nas categorias e faixas escolhidas.
+
+        Interpola entre as posições vizinhas, como `np.quantile`; NaN se a fatia não tiver sinistros.
+        """
+        contagens = fatiar(self.histograma, categorias=categorias, faixas=faixas)
+        contagens = contagens.groupby(level='classe', sort=True).sum()
+        if not contagens.sum():
+            return pd.Series(np.nan, index=qs)
+        classes, contagens = contagens.index.to_numpy(dtype=np.float64), contagens.to_numpy()
+        posicoes = np.asarray(qs) * (contagens.sum() - 1)
+        inferiores = valores_ordenados(classes, contagens, np.floor(posicoes))
+        superiores = valores_ordenados(classes, contagens, np.ceil(posicoes))
+        return pd.Series(inferiores + (superiores - inferiores) * (posicoes - np.floor(posicoes)), index=qs)
+
+    def top_segurados(self, n=10, faixas=None):
+        """Os `n` segurados de maior valor pago nas faixas escolhidas, com o erro máximo (zero se exato)."""
+        if self.aproximado:
+            resumos = [self.custos_segurados[faixa] for faixa in (faixas or self.custos_segurados)
+                       if faixa in self.custos_segurados]
+            return _top_combinado(resumos, n)
+        custos = self._segurados_nas_faixas(faixas).groupby(level='segurado', observed=True).sum()
+        custos = custos.sort_values('valor_total', ascending=False, kind='stable')[:n]
+        return pd.DataFrame({'count': custos['count'], 'valor_total': custos['valor_total'], 'erro': 0.0})
+
+    def top_prestadores(self, n=10, faixas=None):
+        """Os `n` prestadores de maior valor pago em todo o período, nas faixas escolhidas.
+
+        Traz o erro máximo de cada valor (zero se exato), como `top_segurados`.
+        """
+        if self.aproximado:
+            resumos = [self.custos_prestadores[faixa] for faixa in (faixas or self.custos_prestadores)
+                       if faixa in self.custos_prestadores]
+            return _top_combinado(resumos, n)
+        fatia = fatiar(self.prestadores, faixas=faixas)
+        custos = fatia.groupby(level='nome_prestador_sinistro').sum()
+        custos = custos.sort_values('valor_total', ascending=False, kind='stable')[:n]
+        return pd.DataFrame({'count': custos['count'], 'valor_total': custos['valor_total'], 'erro': 0.0})
+
+    def _segurados_nas_faixas(self, faixas):
+        if faixas is None:
+            return self.segurados
+        return self.segurados[self.segurados.index.get_level_values(0).isin(faixas)]
+
+    def memoria(self):
+        tamanho = self.histograma.memory_usage(deep=True)
+        if self.aproximado:
+            tamanho += sum(hll.memoria() for hll in self.populacao.values())
+            tamanho += self.populacao_celulas.memory_usage(deep=True).sum()
+            tamanho += self.populacao_celulas.index.memory_usage(deep=True)
+            tamanho += sum(resumo.memoria() for resumos in [self.custos_segurados, self.custos_prestadores]
+                           for resumo in resumos.values())
+        else:
+            for tabela in [self.segurados, self.prestadores]:
+                tamanho += tabela.memory_usage(deep=True).sum() + tabela.index.memory_usage(deep=True)
+            tamanho += self.meses_segurados.memory_usage(deep=True)
+        return int(tamanho)
+
+
+def _top_combinado(resumos, n):
+    # Soma os resumos Space-Saving das faixas escolhidas e converte os centavos de volta para reais
+    if not resumos:
+        return pd.DataFrame({'valor_total': pd.Series(dtype=float), 'erro': pd.Series(dtype=float)})
+    resumo = resumos[0]
+    for outro in resumos[1:]:
+        resumo = resumo.combinar(outro)
+    top = resumo.top(n)
+    return pd.DataFrame({'valor_total': top['count'] / 100, 'erro': top['erro'] / 100})
+
+
+def fatiar(tabela, meses=None, categorias=None, faixas=None):
+    """Linhas de uma tabela indexada por dimensões de `DIMENSOES_CUSTOS` (e outros níveis depois delas) na fatia escolhida.
+
+    `meses` é um par (primeiro, último) de chaves de mês; `categorias` e `faixas` são listas.
+    None em qualquer um deles seleciona tudo; o filtro de uma dimensão que a tabela não tem é
+    ignorado. A busca usa o índice ordenado da tabela.
+    """
+    def presentes(valores, nivel):
+        # Valores ausentes do índice são ignorados (a busca por uma lista com algum deles falharia)
+        return slice(None) if valores is None else list(tabela.index.levels[nivel].intersection(valores))
+
+    filtros = dict(zip(DIMENSOES_CUSTOS, [meses, categorias, faixas]))
+    seletores = []
+    for nivel, nome in enumerate(tabela.index.names):
+        valores = filtros.get(nome)
+        if valores is None:
+            seletores.append(slice(None))
+        elif nome == 'month':
+            seletores.append(slice(*valores))
+        else:
+            seletores.append(presentes(valores, nivel))
+    seletores = tuple(seletores)
+    if any(isinstance(seletor, list) and not seletor for seletor in seletores):
+        return tabela.iloc[:0]
+    return tabela.loc[seletores]
+
+
+def construir_resumo_custos(df, aproximado=False):
+    """Resumo dos custos de uma base (ou parte dela) já preparada."""
+    faixa = 'faixa_etaria_colaborador_sinistro'
+    histograma = (
+        df.assign(classe=classes_valor(df['valor_pago_sinistro'].fillna(0)))
+        .dropna(subset=['valor_pago_sinistro'])
+        .groupby(DIMENSOES_HISTOGRAMA + ['classe'], observed=True, dropna=False)
+        .size()
+    )
+    histograma = rotulos_texto(histograma).sort_index()
+
+    # Sem o segurado, o sinistro não entra na população do custo per capita
+    com_segurado = df.loc[df['segurado'].notna(), ['month', 'segurado'] + DIMENSOES_HISTOGRAMA]
+
+    if aproximado:
+        celulas = com_segurado.groupby(DIMENSOES_CUSTOS, observed=True, dropna=False)
+        registros = esbocos.registros_por_grupo(com_segurado['segurado'], celulas.ngroup().to_numpy(),
+                                                celulas.ngroups)
+        populacao_celulas = rotulos_texto(pd.DataFrame(registros, index=celulas.size().index)).sort_index()
+
+        populacao, custos_segurados, custos_prestadores = {}, {}, {}
+        for valor_faixa, grupo in df.groupby(faixa, observed=True):
+            valor_faixa = str(valor_faixa)
+            populacao[valor_faixa] = esbocos.HyperLogLog().adicionar(grupo['segurado'])
+            custos_segurados[valor_faixa] = _space_saving_custos(grupo, 'segurado')
+            custos_prestadores[valor_faixa] = _space_saving_custos(grupo, 'nome_prestador_sinistro')
+        return ResumoCustos(histograma, populacao=populacao, populacao_celulas=populacao_celulas,
+                            custos_segurados=custos_segurados, custos_prestadores=custos_prestadores)
+
+    # Meses distintos de cada segurado por categoria e faixa: a soma de potências de 2 distintas é o OU dos bits
+    palavras, bits = np.divmod(com_segurado['month'].to_numpy(dtype=np.int64), MESES_POR_PALAVRA)
+    meses_segurados = (
+        com_segurado.assign(palavra=palavras, meses=np.uint64(1) << bits.astype(np.uint64))
+        .drop_duplicates(DIMENSOES_HISTOGRAMA + ['segurado', 'month'])
+        .groupby(DIMENSOES_HISTOGRAMA + ['segurado', 'palavra'], observed=True, dropna=False)['meses']
+        .sum()
+    )
+    meses_segurados = rotulos_texto(meses_segurados).sort_index()
+
+    def custos_por(dimensoes):
+        tabela = df.groupby(dimensoes, observed=True)['valor_pago_sinistro'].agg(count='size', valor_total='sum')
+        return rotulos_texto(tabela).sort_index()
+
+    return ResumoCustos(histograma, segurados=custos_por([faixa, 'segurado']),
+                        prestadores=custos_por([faixa, 'nome_prestador_sinistro']), meses_segurados=meses_segurados)
+
+
+def _space_saving_custos(df, coluna):
+    custos = df.groupby(coluna, observed=True)['valor_pago_sinistro'].sum()
+    custos = pd.Series(centavos(custos.to_numpy()), index=custos.index.astype(str))
+    return esbocos.SpaceSaving.de_contagens(custos)
+
+
+def rotulos_texto(tabela):
+    """Converte em texto os níveis categóricos do índice: blocos diferentes têm categorias diferentes."""
+    niveis = [nivel.astype(str) if isinstance(nivel.dtype, pd.CategoricalDtype) else nivel
+              for nivel in tabela.index.levels]
+    tabela.index = tabela.index.set_levels(niveis)
+    return tabela
+
+
+def combinar_resumos_custos(partes):
+    """Combina resumos de partes distintas da base."""
+    histograma = pd.concat([parte.histograma for parte in partes])
+    histograma = histograma.groupby(level=list(range(histograma.index.nlevels)), dropna=False).sum().sort_index()
+
+    if partes[0].aproximado:
+        def combinar_por_faixa(atributo):
+            combinados = {}
+            for parte in partes:
+                for faixa, resumo in getattr(parte, atributo).items():
+                    combinados[faixa] = combinados[faixa].combinar(resumo) if faixa in combinados else resumo
+            return combinados
+
+        celulas = pd.concat([parte.populacao_celulas for parte in partes])
+        celulas = celulas.groupby(level=list(range(celulas.index.nlevels)), dropna=False).max().sort_index()
+        return ResumoCustos(histograma, populacao=combinar_por_faixa('populacao'), populacao_celulas=celulas,
+                            custos_segurados=combinar_por_faixa('custos_segurados'),
+                            custos_prestadores=combinar_por_faixa('custos_prestadores'))
+
+    def somar(atributo):
+        tabela = pd.concat([getattr(parte, atributo) for parte in partes])
+        return tabela.groupby(level=list(range(tabela.index.nlevels)), dropna=False).sum().sort_index()
+
+    return ResumoCustos(histograma, segurados=somar('segurados'), prestadores=somar('prestadores'),
+                        meses_segurados=_ou_por_indice(pd.concat([parte.meses_segurados for parte in partes])))
@@ -0,0 +1,228 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import instrumentacao
+
+
+# Colunas textuais de baixa cardinalidade, armazenadas como categóricas
+COLUNAS_CATEGORICAS = [
+    'categoria',
+    'elegibilidade_sinistro',
+    'sexo_colaborador_sinistro',
+    'faixa_etaria_colaborador_sinistro',
+    'nome_prestador_sinistro',
+    'segurado',
+]
+
+# Colunas cujo texto é padronizado (ex.: 'EXAMES' e 'exames' viram 'Exames')
+COLUNAS_NORMALIZADAS = ['categoria', 'elegibilidade_sinistro']
+
+# Tipos explícitos usados na leitura da base de sinistros
+DTYPES = {
+    **{coluna: 'category' for coluna in COLUNAS_CATEGORICAS},
+    # Lida como categórica: cada data distinta é interpretada uma única vez (ver `converter_datas`)
+    'data_ocorrencia_sinistro': 'category',
+    'valor_pago_sinistro': 'float64',
+}
+
+# Colunas usadas pelas páginas; as demais são descartadas na leitura em blocos
+COLUNAS = [
+    'segurado',
+    'categoria',
+    'elegibilidade_sinistro',
+    'sexo_colaborador_sinistro',
+    'faixa_etaria_colaborador_sinistro',
+    'data_ocorrencia_sinistro',
+    'nome_prestador_sinistro',
+    'valor_pago_sinistro',
+    'cluster',
+]
+
+FORMATO_DATA = '%d/%m/%Y'
+
+# A coluna `month` guarda cada mês como um inteiro (meses desde janeiro de 1970); sem data, MES_AUSENTE
+MES_AUSENTE = -1
+
+# Diretório dos snapshots colunares (Parquet) de bases já preparadas
+DIRETORIO_SNAPSHOTS = Path(os.environ.get('UNIDATA_SNAPSHOTS', 'snapshots'))
+
+# Chave, nos metadados do Parquet, dos rótulos dos perfis de um snapshot com clusters do GMM do app
+METADADO_ROTULOS_PERFIS = b'unidata.rotulos_perfis'
+
+# Linhas lidas no primeiro bloco, antes de se conhecer o tamanho médio de uma linha
+TAMANHO_BLOCO = 100_000
+
+
+class LimiteMemoriaExcedido(MemoryError):
+    """A leitura em blocos ultrapassaria o limite de memória configurado."""
+
+
+class ColunasAusentes(ValueError):
+    """A base não tem todas as colunas obrigatórias."""
+
+
+@instrumentacao.medido('ler_csv')
+def ler_base(fonte):
+    """Lê a base de sinistros (caminho ou arquivo) com os tipos explícitos."""
+    return pd.read_csv(fonte, dtype=DTYPES)
+
+
+def ler_em_blocos(fonte, limite_memoria=None, tamanho_bloco=TAMANHO_BLOCO):
+    """Lê e prepara a base em blocos, apenas com as colunas usadas pelas páginas.
+
+    Com `limite_memoria` (em bytes), o tamanho dos blocos seguintes é ajustado
+    para que cada bloco ocupe no máximo um quarto do limite.
+    """
+    with pd.read_csv(fonte, dtype=DTYPES, usecols=lambda coluna: coluna in COLUNAS,
+                     chunksize=tamanho_bloco) as leitor:
+        while True:
+            try:
+                with instrumentacao.etapa('ler_csv_bloco') as registro:
+                    bloco = leitor.get_chunk(tamanho_bloco)
+                    registro['linhas'] = len(bloco)
+            except StopIteration:
+                return
+
+            if limite_memoria is not None and len(bloco):
+                bytes_por_linha = bloco.memory_usage(deep=True).sum() / len(bloco)
+                tamanho_bloco = max(1_000, int(limite_memoria / 4 / bytes_por_linha))
+
+            yield preparar_base(bloco)
+
+
+def normalizar_texto(serie):
+    """Padroniza uma coluna categórica para 'Title Case' operando só nas categorias distintas."""
+    normalizadas = serie.cat.categories.astype(str).str.lower().str.title()
+    categorias = normalizadas.unique()
+    mapa = categorias.get_indexer(normalizadas)
+
+    codigos = serie.cat.codes.to_numpy()
+    codigos = np.where(codigos >= 0, mapa[codigos], -1)
+
+    return pd.Series(pd.Categorical.from_codes(codigos, categorias), index=serie.index, name=serie.name)
+
+
+def converter_datas(serie):
+    """Converte as datas (texto em FORMATO_DATA) interpretando cada data distinta uma única vez."""
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype('category')
+    distintas = pd.to_datetime(serie.cat.categories, format=FORMATO_DATA).to_numpy()
+
+    codigos = serie.cat.codes.to_numpy()
+    datas = np.where(codigos >= 0, distintas[codigos], np.datetime64('NaT'))
+    return pd.Series(datas, index=serie.index, name=serie.name)
+
+
+def chaves_mes(datas):
+    """Mês de cada data como inteiro (meses desde janeiro de 1970), com MES_AUSENTE nas datas vazias."""
+    meses = datas.to_numpy().astype('datetime64[M]')
+    chaves = meses.astype(np.int64)
+    chaves[np.isnat(meses)] = MES_AUSENTE
+    return chaves.astype(np.int32)
+
+
+def datas_dos_meses(chaves):
+    """Primeiro dia de cada mês, a partir das chaves inteiras de `chaves_mes`."""
+    return pd.DatetimeIndex(np.asarray(chaves, dtype=np.int64).astype('datetime64[M]'))
+
+
+def concatenar(tabelas):
+    """Concatena tabelas de partes distintas da base, mantendo categóricas as colunas categóricas.
+
+    Cada bloco tem as suas próprias categorias; sem uni-las antes, o `concat` converteria essas colunas em texto.
+    """
+    tabelas = list(tabelas)
+    for coluna, tipo in tabelas[0].dtypes.items():
+        if not isinstance(tipo, pd.CategoricalDtype):
+            continue
+        categorias = tipo.categories
+        for tabela in tabelas[1:]:
+            categorias = categorias.append(tabela[coluna].cat.categories.difference(categorias, sort=False))
+        tabelas = [tabela.assign(**{coluna: tabela[coluna].cat.set_categories(categorias)}) for tabela in tabelas]
+    return pd.concat(tabelas, ignore_index=True)
+
+
+def caminho_snapshot(nome, hash_conteudo):
+    return DIRETORIO_SNAPSHOTS / f'{Path(nome).stem}_{hash_conteudo[:16]}.parquet'
+
+
+def listar_snapshots():
+    """Snapshots disponíveis, do mais recente para o mais antigo."""
+    if not DIRETORIO_SNAPSHOTS.is_dir():
+        return []
+    return sorted(DIRETORIO_SNAPSHOTS.glob('*.parquet'), key=lambda caminho: caminho.stat().st_mtime, reverse=True)
+
+
+def salvar_snapshot(df, caminho, rotulos_perfis=None):
+    """Persiste a base preparada (com a coluna `cluster`) em Parquet.
+
+    A coluna `month` é derivada e não é gravada; as categóricas viram colunas de
+    dicionário, lidas de volta já como categóricas. Se a coluna `cluster` veio do GMM
+    do app, `rotulos_perfis` (cluster -> perfil) é gravado nos metadados do arquivo,
+    para que o snapshot reaberto não use os perfis dos clusters da base original.
+    """
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    tabela = pa.Table.from_pandas(df.drop(columns=['month']), preserve_index=False)
+    if rotulos_perfis is not None:
+        tabela = tabela.replace_schema_metadata({
+            **(tabela.schema.metadata or {}),
+            METADADO_ROTULOS_PERFIS: json.dumps({str(cluster): rotulo for cluster, rotulo in rotulos_perfis.items()}),
+        })
+    # Grava em um arquivo temporário para que leitores concorrentes nunca vejam um snapshot incompleto
+    temporario = caminho.with_suffix('.tmp')
+    pq.write_table(tabela, temporario)
+    temporario.replace(caminho)
+    return caminho
+
+
+def rotulos_snapshot(caminho):
+    """Rótulos dos perfis gravados com o snapshot, ou None se os clusters são os da base original."""
+    metadados = pq.read_schema(caminho).metadata or {}
+    if METADADO_ROTULOS_PERFIS not in metadados:
+        return None
+    return {int(cluster): rotulo for cluster, rotulo in json.loads(metadados[METADADO_ROTULOS_PERFIS]).items()}
+
+
+@instrumentacao.medido('ler_snapshot')
+def carregar_snapshot(caminho, colunas=COLUNAS):
+    """Lê um snapshot via memory-map, apenas com as `colunas` pedidas que existirem no arquivo."""
+    arquivo = pq.ParquetFile(caminho, memory_map=True)
+    existentes = [coluna for coluna in colunas if coluna in arquivo.schema_arrow.names]
+    df = arquivo.read(columns=existentes).to_pandas()
+    df['month'] = chaves_mes(df['data_ocorrencia_sinistro'])
+    return df
+
+
+def validar_colunas(df):
+    # A coluna `cluster` é opcional: os perfis podem ser calculados no próprio app
+    ausentes = [coluna for coluna in COLUNAS if coluna != 'cluster' and coluna not in df.columns]
+    if ausentes:
+        raise ColunasAusentes(f'Colunas ausentes na base: {", ".join(ausentes)}')
+
+
+@instrumentacao.medido('preparar_base')
+def preparar_base(df):
+    """Executa, uma única vez por base, toda a padronização usada pelas páginas."""
+    validar_colunas(df)
+
+    for coluna in COLUNAS_CATEGORICAS:
+        if coluna in df.columns and not isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            df[coluna] = df[coluna].astype('category')
+
+    with instrumentacao.etapa('normalizar_texto', linhas=len(df)):
+        for coluna in COLUNAS_NORMALIZADAS:
+            df[coluna] = normalizar_texto(df[coluna])
+
+    # A data e o mês são derivados uma única vez, aqui
+    with instrumentacao.etapa('converter_datas', linhas=len(df)):
+        df['data_ocorrencia_sinistro'] = converter_datas(df['data_ocorrencia_sinistro'])
+        df['month'] = chaves_mes(df['data_ocorrencia_sinistro'])
+
+    return df
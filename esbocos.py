@@ -0,0 +1,143 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+# Bits do hash usados para escolher o registro do HyperLogLog (2**14 registros, ~16 KB)
+PRECISAO_HLL = 14
+
+# Contadores mantidos pelo Space-Saving de cada resumo de prestadores
+CAPACIDADE_SPACE_SAVING = 1000
+
+# Bits do hash usados pelos HyperLogLog de muitos grupos pequenos (ex.: as células mês x categoria x
+# faixa da página de custos): 2**8 registros, 256 bytes por grupo, com erro relativo típico de ~6,5%
+PRECISAO_HLL_GRUPOS = 8
+
+
+def _hashes(valores):
+    # Hash de 64 bits do texto de cada valor, estável entre blocos, processos e execuções
+    valores = pd.Series(valores).dropna()
+    if isinstance(valores.dtype, pd.CategoricalDtype):
+        categorias = pd.util.hash_array(valores.cat.categories.astype(str).to_numpy(dtype=object))
+        return categorias[valores.cat.codes.to_numpy()]
+    return pd.util.hash_array(valores.astype(str).to_numpy(dtype=object))
+
+
+def _registros_e_posicoes(hashes, precisao):
+    # Registro de cada hash (os primeiros `precisao` bits) e a posição do primeiro bit 1 nos restantes.
+    # Só os 53 primeiros bits restantes são usados, para que caibam exatos em um float
+    bits_restantes = 64 - precisao
+    indices = (hashes >> np.uint64(bits_restantes)).astype(np.intp)
+    restantes = hashes & np.uint64(2 ** bits_restantes - 1)
+    if bits_restantes > 53:
+        restantes >>= np.uint64(bits_restantes - 53)
+        bits_restantes = 53
+    _, expoentes = np.frexp(restantes.astype(np.float64))
+    return indices, (bits_restantes - expoentes + 1).astype(np.uint8)
+
+
+def estimativas(registros):
+    """Estimativa de distintos de cada linha de uma matriz de registros de HyperLogLog (ou de um só)."""
+    registros = np.atleast_2d(registros)
+    m = registros.shape[-1]
+    alfa = 0.7213 / (1 + 1.079 / m)
+    estimativa = alfa * m * m / np.ldexp(1.0, -registros.astype(int)).sum(axis=-1)
+    vazios = (registros == 0).sum(axis=-1)
+    # Correção para poucos valores: contagem linear dos registros vazios
+    linear = m * np.log(m / np.maximum(vazios, 1))
+    estimativa = np.where((estimativa <= 2.5 * m) & (vazios > 0), linear, estimativa)
+    return np.round(estimativa).astype(np.int64)
+
+
+def registros_por_grupo(valores, grupos, n_grupos, precisao=PRECISAO_HLL_GRUPOS):
+    """Registros de um HyperLogLog por grupo, combináveis pelo máximo: matriz (`n_grupos`, 2**`precisao`).
+
+    `grupos` é o número do grupo (de 0 a `n_grupos` - 1) de cada valor; `valores` não pode ter ausentes.
+    """
+    indices, posicoes = _registros_e_posicoes(_hashes(valores), precisao)
+    registros = np.zeros((n_grupos, 2 ** precisao), dtype=np.uint8)
+    np.maximum.at(registros, (np.asarray(grupos, dtype=np.intp), indices), posicoes)
+    return registros
+
+
+class HyperLogLog:
+    """Contagem aproximada de valores distintos em memória fixa, combinável entre partes da base.
+
+    O erro relativo típico (um desvio-padrão) é `1.04 / sqrt(2**precisao)`, cerca de 0,8% no padrão.
+    """
+
+    def __init__(self, precisao=PRECISAO_HLL):
+        self.precisao = precisao
+        self.registros = np.zeros(2 ** precisao, dtype=np.uint8)
+
+    def adicionar(self, valores):
+        indices, posicoes = _registros_e_posicoes(_hashes(valores), self.precisao)
+        np.maximum.at(self.registros, indices, posicoes)
+        return self
+
+    def combinar(self, outro):
+        combinado = HyperLogLog(self.precisao)
+        combinado.registros = np.maximum(self.registros, outro.registros)
+        return combinado
+
+    @property
+    def erro_relativo(self):
+        return 1.04 / np.sqrt(len(self.registros))
+
+    def estimativa(self):
+        return int(estimativas(self.registros)[0])
+
+    def memoria(self):
+        return self.registros.nbytes
+
+
+@dataclass
+class SpaceSaving:
+    """Resumo Space-Saving dos valores mais frequentes, combinável entre partes da base.
+
+    Cada valor monitorado tem uma contagem estimada que nunca fica abaixo da real e
+    supera a real em no máximo `erros[valor]`. Valores fora do resumo têm no máximo
+    `limite` ocorrências.
+    """
+    contagens: pd.Series
+    erros: pd.Series
+    limite: int = 0
+    capacidade: int = CAPACIDADE_SPACE_SAVING
+
+    @classmethod
+    def de_contagens(cls, contagens, capacidade=CAPACIDADE_SPACE_SAVING):
+        """Resumo de contagens exatas (ex.: de um bloco), mantendo apenas os `capacidade` maiores."""
+        contagens = contagens[contagens > 0].sort_values(ascending=False, kind='stable')
+        limite = int(contagens.iloc[capacidade]) if len(contagens) > capacidade else 0
+        contagens = contagens.iloc[:capacidade]
+        return cls(contagens, pd.Series(0, index=contagens.index), limite, capacidade)
+
+    @classmethod
+    def de_valores(cls, valores, capacidade=CAPACIDADE_SPACE_SAVING):
+        valores = pd.Series(valores).dropna()
+        valores = valores.astype(str) if not isinstance(valores.dtype, pd.CategoricalDtype) else valores
+        contagens = valores.value_counts(sort=False)
+        contagens.index = contagens.index.astype(str)
+        return cls.de_contagens(contagens.astype(np.int64), capacidade)
+
+    def combinar(self, outro):
+        indice = self.contagens.index.union(outro.contagens.index, sort=False)
+        # Um valor ausente de um dos resumos pode ter ocorrido nele até `limite` vezes
+        contagens = (self.contagens.reindex(indice, fill_value=self.limite)
+                     + outro.contagens.reindex(indice, fill_value=outro.limite))
+        erros = (self.erros.reindex(indice, fill_value=self.limite)
+                 + outro.erros.reindex(indice, fill_value=outro.limite))
+
+        contagens = contagens.sort_values(ascending=False, kind='stable')
+        descartadas = contagens.iloc[self.capacidade:]
+        contagens = contagens.iloc[:self.capacidade]
+        limite = max(self.limite + outro.limite, int(descartadas.max()) if len(descartadas) else 0)
+        return SpaceSaving(contagens, erros[contagens.index], limite, self.capacidade)
+
+    def top(self, n=3):
+        """Os `n` valores mais frequentes, com a contagem estimada e o erro máximo de cada um."""
+        return pd.DataFrame({'count': self.contagens, 'erro': self.erros}).iloc[:n]
+
+    def memoria(self):
+        return int(self.contagens.memory_usage(deep=True) + self.erros.memory_usage(deep=True))
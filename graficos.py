@@ -0,0 +1,299 @@
+"""Gráficos Altair do dashboard, montados a partir das tabelas de `relatorio`.
+
+Os dados de cada gráfico são reduzidos antes de entrar na especificação Vega-Lite
+enviada ao navegador: apenas as colunas usadas, valores arredondados e no máximo
+`LIMITE_LINHAS` linhas (as demais categorias somadas em "Outros" ou a série temporal
+agrupada em períodos maiores).
+"""
+import math
+
+import altair as alt
+import pandas as pd
+
+import relatorio
+
+
+# Máximo de linhas enviadas ao navegador por gráfico
+LIMITE_LINHAS = 500
+
+ROTULO_OUTROS = 'Outros'
+
+CORES_PERFIS = alt.Scale(domain=['1', '2', '3'], range=['#00FF3C', '#00B432', '#006343'])
+
+
+#-------------------------------
+# Redução dos dados
+
+def compactar(tabela, colunas):
+    """Mantém só as `colunas` usadas pelo gráfico, com os valores decimais arredondados."""
+    tabela = tabela[colunas].copy()
+    for coluna in tabela.select_dtypes('float').columns:
+        tabela[coluna] = tabela[coluna].round(2)
+    return tabela
+
+
+def top_com_outros(tabela, rotulo, valor, limite=LIMITE_LINHAS):
+    """As `limite` - 1 linhas de maior `valor`, com as demais somadas em uma linha "Outros"."""
+    if len(tabela) <= limite:
+        return tabela
+    tabela = tabela.sort_values(valor, ascending=False, kind='stable')
+    outros = pd.DataFrame({rotulo: [ROTULO_OUTROS], valor: [tabela[valor].iloc[limite - 1:].sum()]})
+    return pd.concat([tabela.iloc[:limite - 1], outros], ignore_index=True)
+
+
+def reduzir_serie(tabela, coluna_tempo, valor, limite=LIMITE_LINHAS):
+    """Agrupa uma série mensal em janelas de meses consecutivos até caber em `limite` pontos.
+
+    Cada ponto fica no início da janela, com a média mensal do período (a escala do eixo Y não muda).
+    """
+    if len(tabela) <= limite:
+        return tabela
+    janela = math.ceil(len(tabela) / limite)
+    grupos = tabela.reset_index(drop=True).groupby(lambda posicao: posicao // janela)
+    return grupos.agg({coluna_tempo: 'first', valor: 'mean'}).reset_index(drop=True)
+
+
+#-------------------------------
+# Página inicial
+
+def grafico_sexo(resumo):
+    data_sexo = compactar(relatorio.distribuicao_sexo(resumo), ['Sexo', 'Quantidade de Ocorrências'])
+
+    return alt.Chart(data_sexo).mark_arc().encode(
+        theta=alt.Theta(field="Quantidade de Ocorrências", type="quantitative"),
+        color=alt.Color('Sexo:N', scale=alt.Scale(domain=['Feminino', 'Masculino'],
+                                                  range=['#008A26', '#00FF3C'])),
+        tooltip=['Sexo', 'Quantidade de Ocorrências']
+    ).properties(
+        title='Distribuição de Sexo por Sinistro'
+    )
+
+
+def grafico_elegibilidade(resumo):
+    data_elegibilidade = top_com_outros(relatorio.distribuicao_elegibilidade(resumo),
+                                        'Elegibilidade', 'Quantidade de Ocorrências')
+
+    return alt.Chart(compactar(data_elegibilidade, ['Elegibilidade', 'Quantidade de Ocorrências'])).mark_arc().encode(
+        theta=alt.Theta(field="Quantidade de Ocorrências", type="quantitative"),
+        color=alt.Color('Elegibilidade:N', scale=alt.Scale(domain=['Dependente', 'Titular'],
+                                                           range=['#006343', 'lightgreen'])),
+        tooltip=['Elegibilidade', 'Quantidade de Ocorrências']
+    ).properties(
+        title='Distribuição de Elegibilidade por Sinistro'
+    )
+
+
+def grafico_faixa_etaria_sexo(resumo):
+    colunas = ['faixa_etaria_colaborador_sinistro', 'sexo_colaborador_sinistro', 'count']
+    grouped = compactar(relatorio.faixa_etaria_sexo(resumo), colunas)
+
+    return alt.Chart(grouped).mark_bar().encode(
+        x=alt.X('faixa_etaria_colaborador_sinistro:O', title='Faixa Etária'),
+        y=alt.Y('count:Q', title='Número de Ocorrências'),
+        color=alt.Color('sexo_colaborador_sinistro:N', title='Gênero', scale=alt.Scale(
+                            domain=['Masculino', 'Feminino'],
+                            range=['#00FF3C', '#008A26']
+                        )),
+        xOffset='sexo_colaborador_sinistro:N',  # Desloca as barras pelo gênero
+        tooltip=colunas
+    ).properties(
+        title='Distribuição por Faixa Etária e Gênero'
+    )
+
+
+def _linha_mensal(dados_mes, titulo):
+    return alt.Chart(compactar(reduzir_serie(dados_mes, 'month', 'count'), ['month', 'count'])).mark_line(point=True).encode(
+        x=alt.X('month:T', title='Mês/Ano', axis=alt.Axis(format='%b %Y')),  # Formatação correta do eixo X
+        y=alt.Y('count:Q', title='Número de Ocorrências'),
+        tooltip=[alt.Tooltip('month:T', title='Mês/Ano', format='%b %Y'), alt.Tooltip('count:Q', title='Número de Ocorrências')],
+        color=alt.value('#0eae37')
+    ).properties(
+        title=titulo
+    )
+
+
+def grafico_ocorrencias_mes(resumo):
+    return _linha_mensal(relatorio.ocorrencias_por_mes(resumo), 'Número de Ocorrências por Mês')
+
+
+def grafico_serie_categoria(resumo, categoria, elegibilidades):
+    return _linha_mensal(relatorio.serie_categoria(resumo, categoria, elegibilidades),
+                         f'Número de Ocorrências de {categoria} por Mês')
+
+
+def grafico_top_categorias(resumo, elegibilidade, cor, titulo):
+    data_categoria = relatorio.top_categorias(resumo, elegibilidade)
+    return alt.Chart(compactar(data_categoria, ['Categoria', 'Quantidade de Ocorrências'])).mark_bar().encode(
+        x='Quantidade de Ocorrências',
+        y='Categoria',
+        color=alt.value(cor)
+    ).properties(
+        title=titulo
+    )
+
+
+def grafico_top_prestadores(resumo, elegibilidade, cor, titulo):
+    data_prestador = relatorio.top_prestadores(resumo, elegibilidade)
+    return alt.Chart(compactar(data_prestador, list(data_prestador.columns))).mark_bar().encode(
+        x='Quantidade de Ocorrências',
+        y='Prestador',
+        color=alt.value(cor),
+        tooltip=list(data_prestador.columns)  # Inclui o erro máximo no modo aproximado
+    ).properties(
+        title=titulo
+    )
+
+
+#-------------------------------
+# Página de análises
+
+def grafico_perfis_ocorrencias(resumo_perfis):
+    data_quantidade_cluster = compactar(relatorio.perfis_ocorrencias(resumo_perfis), ['cluster', 'quantidade'])
+    return alt.Chart(data_quantidade_cluster).mark_bar().encode(
+        x=alt.X('cluster:O', title='Perfil'),
+        y=alt.Y('quantidade:Q', title='Número de Ocorrências'),
+        color=alt.Color('cluster:N', title='Perfil', scale=CORES_PERFIS),
+    ).properties(
+        title='Distribuição de Ocorrências por Perfil'
+    )
+
+
+def grafico_perfis_segurados(resumo_perfis):
+    data_quantidade_cluster_segurado = compactar(relatorio.perfis_segurados(resumo_perfis), ['cluster', 'quantidade'])
+    return alt.Chart(data_quantidade_cluster_segurado).mark_bar().encode(
+        x=alt.X('cluster:O', title='Perfil'),
+        y=alt.Y('quantidade:Q', title='Número de Ocorrências'),
+        color=alt.Color('cluster:N', title='Perfil', scale=CORES_PERFIS),
+    ).properties(
+        title='Distribuição de Segurados por Perfil'
+    )
+
+
+def grafico_perfis_top(resumo_perfis, coluna, titulo_eixo, titulo):
+    # Para cada cluster, os três valores mais frequentes de `coluna`
+    top_3_por_cluster = compactar(relatorio.perfis_top(resumo_perfis, coluna, 3), ['cluster', coluna, 'count'])
+    return alt.Chart(top_3_por_cluster).mark_bar().encode(
+        x=alt.X('count:Q', title='Número de Ocorrências'),
+        y=alt.Y(f'{coluna}:O', title=titulo_eixo, sort='-x'),
+        color=alt.Color('cluster:N', title='Perfil', scale=CORES_PERFIS),
+        yOffset='cluster:N',  # Desloca as barras pelo cluster
+        tooltip=['cluster', coluna, 'count']
+    ).properties(
+        title=titulo
+    )
+
+
+def grafico_perfis_valor_pago(resumo_perfis):
+    colunas = ['cluster', 'valor_pago', 'valor_mediano', 'valor_p90']
+    df_clusters_valor_pago = compactar(relatorio.perfis_valor_pago(resumo_perfis), colunas)
+    return alt.Chart(df_clusters_valor_pago).mark_bar().encode(
+        x=alt.X('cluster:O', title='Perfil'),
+        y=alt.Y('valor_pago:Q', title='Média de Valor Pago', sort='-x'),
+        color=alt.Color('cluster:N', title='Perfil', scale=CORES_PERFIS),
+        tooltip=['cluster:O', 'valor_pago:Q', 'valor_mediano:Q', 'valor_p90:Q']
+    ).properties(
+        title='Distribuição da Média do Valor Pago por Perfil'
+    )
+
+
+#-------------------------------
+# Página de custos
+
+def grafico_custos_mes(resumo, meses, categorias, faixas, medida, titulo_eixo):
+    dados_mes = relatorio.custos_por_mes(resumo, meses, categorias, faixas)
+    dados_mes = compactar(reduzir_serie(dados_mes, 'month', medida), ['month', medida])
+    return alt.Chart(dados_mes).mark_line(point=True).encode(
+        x=alt.X('month:T', title='Mês/Ano', axis=alt.Axis(format='%b %Y')),
+        y=alt.Y(f'{medida}:Q', title=titulo_eixo),
+        tooltip=[alt.Tooltip('month:T', title='Mês/Ano', format='%b %Y'),
+                 alt.Tooltip(f'{medida}:Q', title=titulo_eixo, format=',.2f')],
+        color=alt.value('#0eae37')
+    ).properties(
+        title=f'{titulo_eixo} por Mês'
+    )
+
+
+def grafico_custos_faixa(resumo, meses, categorias, faixas):
+    colunas = ['faixa_etaria_colaborador_sinistro', 'custo_per_capita', 'valor_total', 'segurados']
+    dados_faixa = compactar(relatorio.custos_por_faixa(resumo, meses, categorias, faixas), colunas)
+    return alt.Chart(dados_faixa).mark_bar().encode(
+        x=alt.X('faixa_etaria_colaborador_sinistro:O', title='Faixa Etária'),
+        y=alt.Y('custo_per_capita:Q', title='Custo per Capita'),
+        color=alt.value('#008A26'),
+        tooltip=colunas
+    ).properties(
+        title='Custo per Capita por Faixa Etária'
+    )
+
+
+def grafico_custos_categoria(resumo, meses, categorias, faixas):
+    dados_categoria = top_com_outros(relatorio.custos_por_categoria(resumo, meses, categorias, faixas)
+                                     [['categoria', 'valor_total']], 'categoria', 'valor_total')
+    return alt.Chart(compactar(dados_categoria, ['categoria', 'valor_total'])).mark_bar().encode(
+        x=alt.X('valor_total:Q', title='Valor Pago'),
+        y=alt.Y('categoria:N', title='Categoria', sort='-x'),
+        color=alt.value('lightgreen'),
+        tooltip=['categoria', 'valor_total']
+    ).properties(
+        title='Valor Pago por Categoria'
+    )
+
+
+def grafico_ranking_prestadores(resumo, meses, categorias, faixas):
+    data_prestador = relatorio.ranking_prestadores_custo(resumo, meses, categorias, faixas)
+    return alt.Chart(compactar(data_prestador, list(data_prestador.columns))).mark_bar().encode(
+        x=alt.X('Valor Pago:Q'),
+        y=alt.Y('Prestador:N', sort='-x'),
+        color=alt.value('#006343'),
+        tooltip=list(data_prestador.columns)  # Inclui o erro máximo no modo aproximado
+    ).properties(
+        title='Prestadores com Maior Valor Pago'
+    )
+
+
+#-------------------------------
+# Comparação de bases
+
+def grafico_comparacao_mes(resumos, medida, titulo_eixo, alinhamento):
+    dados_mes = relatorio.comparacao_por_mes(resumos, medida, alinhamento)
+    # Cada base é reduzida separadamente: a soma das séries não passa de LIMITE_LINHAS pontos
+    limite = max(1, LIMITE_LINHAS // max(1, len(resumos)))
+    dados_mes = pd.concat([reduzir_serie(grupo, 'month', 'valor', limite) for _, grupo in dados_mes.groupby('base', sort=False)])
+    if alinhamento == 'relativo':
+        x = alt.X('month:Q', title='Meses desde o início da base')
+    else:
+        x = alt.X('month:T', title='Mês/Ano', axis=alt.Axis(format='%b %Y'))
+    return alt.Chart(compactar(dados_mes, ['base', 'month', 'valor'])).mark_line(point=True).encode(
+        x=x,
+        y=alt.Y('valor:Q', title=titulo_eixo),
+        color=alt.Color('base:N', title='Base'),
+        tooltip=['base', 'month', alt.Tooltip('valor:Q', title=titulo_eixo, format=',.2f')]
+    ).properties(
+        title=f'{titulo_eixo} por Mês'
+    )
+
+
+def grafico_comparacao_categorias(resumos):
+    dados_categoria = compactar(relatorio.comparacao_categorias(resumos), ['base', 'categoria', 'participacao'])
+    return alt.Chart(dados_categoria).mark_bar().encode(
+        x=alt.X('participacao:Q', title='Participação nos Sinistros (%)'),
+        y=alt.Y('categoria:N', title='Categoria', sort='-x'),
+        color=alt.Color('base:N', title='Base'),
+        yOffset='base:N',  # Desloca as barras pela base
+        tooltip=['base', 'categoria', 'participacao']
+    ).properties(
+        title='Participação das Categorias'
+    )
+
+
+def grafico_comparacao_faixas(resumos, medida, titulo_eixo):
+    dados_faixa = compactar(relatorio.comparacao_faixas(resumos), ['base', 'faixa_etaria_colaborador_sinistro', medida])
+    return alt.Chart(dados_faixa).mark_bar().encode(
+        x=alt.X('faixa_etaria_colaborador_sinistro:O', title='Faixa Etária'),
+        y=alt.Y(f'{medida}:Q', title=titulo_eixo),
+        color=alt.Color('base:N', title='Base'),
+        xOffset='base:N',  # Desloca as barras pela base
+        tooltip=['base', 'faixa_etaria_colaborador_sinistro', medida]
+    ).properties(
+        title=f'{titulo_eixo} por Faixa Etária'
+    )
@@ -0,0 +1,152 @@
+"""Medição das etapas do pipeline (leitura, preparação, agregação, perfis e gráficos).
+
+Cada etapa registra tempo de parede, linhas processadas e, se o `tracemalloc`
+estiver ativo, o pico de memória alocada além do que já estava em uso no início
+dela. Os registros ficam em memória (os `MAX_REGISTROS` mais recentes do processo)
+e são emitidos como uma linha JSON no logger `unidata.desempenho`.
+
+O `tracemalloc` e o seu pico são do processo inteiro: enquanto a memória é medida,
+as etapas de threads diferentes são executadas uma de cada vez, para que uma não
+zere o pico da outra. Alocações feitas fora de etapas medidas (por exemplo, pela
+interface) ainda entram no pico, que é, portanto, aproximado.
+"""
+import functools
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+
+
+MAX_REGISTROS = 1000
+
+logger = logging.getLogger('unidata.desempenho')
+
+_registros = deque(maxlen=MAX_REGISTROS)
+_local = threading.local()
+# Serializa as etapas (mais externas de cada thread) enquanto a memória é medida
+_trava_memoria = threading.Lock()
+
+
+def medindo_memoria():
+    return tracemalloc.is_tracing()
+
+
+def ativar_memoria(ativo=True):
+    """Liga ou desliga, para todo o processo, a medição de memória (o `tracemalloc` deixa as etapas mais lentas)."""
+    if ativo and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not ativo and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def configurar_log(caminho):
+    """Acrescenta os registros, uma linha JSON por etapa, ao arquivo `caminho`."""
+    manipulador = logging.FileHandler(caminho, encoding='utf-8')
+    for existente in logger.handlers:
+        # O mesmo processo pode configurar o log mais de uma vez (ex.: várias bases na linha de comando)
+        if isinstance(existente, logging.FileHandler) and existente.baseFilename == manipulador.baseFilename:
+            manipulador.close()
+            return existente
+    manipulador.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(manipulador)
+    logger.setLevel(logging.INFO)
+    return manipulador
+
+
+@contextmanager
+def etapa(nome, linhas=None, **detalhes):
+    """Mede o bloco `with` como a etapa `nome`.
+
+    O registro é devolvido ao bloco, que pode preencher `linhas` depois de calculá-las.
+    Em etapas aninhadas, o pico de memória da etapa interna também conta para a externa.
+    """
+    pilha = _local.__dict__.setdefault('pilha', [])
+    registro = {'etapa': nome, 'linhas': linhas, **detalhes}
+
+    # Só a etapa mais externa da thread espera a vez: as aninhadas já estão dentro dela
+    serializada = not pilha and tracemalloc.is_tracing()
+    if serializada:
+        _trava_memoria.acquire()
+
+    medir_memoria = tracemalloc.is_tracing()
+    if medir_memoria:
+        atual, pico = tracemalloc.get_traced_memory()
+        if pilha:
+            pilha[-1]['_pico'] = max(pilha[-1]['_pico'], pico)
+        tracemalloc.reset_peak()
+        registro['_inicio_memoria'] = registro['_pico'] = atual
+
+    pilha.append(registro)
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    finally:
+        registro['duracao_s'] = round(time.perf_counter() - inicio, 6)
+        pilha.pop()
+        registro['pico_memoria_mb'] = None
+        if medir_memoria and tracemalloc.is_tracing():
+            pico = max(registro['_pico'], tracemalloc.get_traced_memory()[1])
+            registro['pico_memoria_mb'] = round((pico - registro['_inicio_memoria']) / 2**20, 3)
+            if pilha:
+                pilha[-1]['_pico'] = max(pilha[-1].get('_pico', 0), pico)
+        registro.pop('_pico', None)
+        registro.pop('_inicio_memoria', None)
+        if serializada:
+            _trava_memoria.release()
+        registro['momento'] = datetime.now(timezone.utc).isoformat(timespec='milliseconds')
+
+        _registros.append(registro)
+        logger.info(json.dumps(registro, ensure_ascii=False, default=str))
+
+
+def medido(nome):
+    """Decorador: mede cada chamada da função como a etapa `nome`.
+
+    As linhas são as do primeiro argumento que for um DataFrame ou, se não houver, as do resultado.
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            entrada = next((arg for arg in args if isinstance(arg, pd.DataFrame)), None)
+            with etapa(nome, linhas=None if entrada is None else len(entrada)) as registro:
+                resultado = funcao(*args, **kwargs)
+                if entrada is None and isinstance(resultado, pd.DataFrame):
+                    registro['linhas'] = len(resultado)
+            return resultado
+        return medida
+    return decorador
+
+
+def registros():
+    """Os registros mais recentes, do mais antigo para o mais novo."""
+    colunas = ['momento', 'etapa', 'duracao_s', 'linhas', 'pico_memoria_mb']
+    tabela = pd.DataFrame(list(_registros))
+    return tabela.reindex(columns=colunas + [coluna for coluna in tabela.columns if coluna not in colunas])
+
+
+def resumo_etapas():
+    """Tempo total e médio, chamadas e linhas de cada etapa entre os registros mantidos."""
+    tabela = registros()
+    if tabela.empty:
+        return tabela
+    return (
+        tabela.groupby('etapa')
+        .agg(chamadas=('duracao_s', 'size'), duracao_total_s=('duracao_s', 'sum'),
+             duracao_media_s=('duracao_s', 'mean'), linhas=('linhas', 'sum'),
+             pico_memoria_mb=('pico_memoria_mb', 'max'))
+        .sort_values('duracao_total_s', ascending=False)
+    )
+
+
+def exportar_jsonl():
+    return '\n'.join(json.dumps(registro, ensure_ascii=False, default=str) for registro in list(_registros))
+
+
+def limpar():
+    _registros.clear()
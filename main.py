@@ -1,7 +1,46 @@
+import hashlib
+import os
+
 import pandas as pd
 import numpy as np
 import streamlit as st
-import altair as alt
+
+import agregados
+import dados
+import graficos
+import instrumentacao
+import perfis
+import registro
+import relatorio
+
+
+# Quantidade de bases sem nenhuma sessão ativa que continuam em memória (as mais recentes)
+MAX_BASES_OCIOSAS = 4
+
+# Memória (em MB) que as bases sem sessão ativa podem ocupar juntas; acima dela, as mais antigas são descartadas
+MAX_MEMORIA_OCIOSAS_MB = int(os.environ.get('UNIDATA_MEMORIA_OCIOSAS_MB', 1024))
+
+# Limite padrão de memória (em MB) da leitura em blocos
+LIMITE_MEMORIA_MB = 1024
+
+# Uploads a partir deste tamanho (em MB) usam a leitura em blocos por padrão. Ele precisa ficar abaixo
+# do limite de upload do Streamlit (`server.maxUploadSize`, 200 MB por padrão), senão nunca é atingido
+TAMANHO_LEITURA_EM_BLOCOS_MB = 100
+
+# Intervalo (em segundos) entre as atualizações do progresso de um carregamento em segundo plano
+INTERVALO_PROGRESSO = 1
+
+# Processos usados para agregar a base em paralelo
+PROCESSOS_AGREGACAO = int(os.environ.get('UNIDATA_PROCESSOS', os.cpu_count() or 1))
+
+# Especificações de gráficos mantidas em cache (por base e estado dos widgets)
+MAX_GRAFICOS_CACHE = 256
+
+# Painel de desempenho na barra lateral, apenas para administradores
+MODO_ADMIN = os.environ.get('UNIDATA_ADMIN') == '1'
+
+# Arquivo opcional onde as medições de cada etapa são gravadas, uma linha JSON por etapa
+LOG_DESEMPENHO = os.environ.get('UNIDATA_LOG_DESEMPENHO')
 
 
 #-------------------------------
@@ -36,22 +75,545 @@ if 'page' not in st.session_state:
 
 
 #-------------------------------
+def hash_upload(uploaded_file):
+    # O hash do conteúdo é guardado por upload, evitando reler os bytes a cada rerun; ele é calculado
+    # direto do buffer do upload, sem copiar o conteúdo
+    hashes = st.session_state.setdefault('hashes_upload', {})
+    if uploaded_file.file_id not in hashes:
+        hashes[uploaded_file.file_id] = hashlib.file_digest(uploaded_file, 'sha256').hexdigest()
+    return hashes[uploaded_file.file_id]
+
+
+def tamanho_base(valor):
+    df, resumo = valor
+    return resumo.memoria() + (0 if df is None else int(df.memory_usage(deep=True).sum()))
+
+
+@st.cache_resource
+def obter_registro():
+    # Registro único do processo: sessões que abrem a mesma base compartilham uma só cópia
+    return registro.RegistroBases(max_ociosas=MAX_BASES_OCIOSAS, max_memoria_ociosas=MAX_MEMORIA_OCIOSAS_MB * 2**20,
+                                  tamanho=tamanho_base)
+
+
+@st.cache_resource(on_release=lambda executor: executor is not None and executor.shutdown(wait=False))
+def obter_executor():
+    # Pool único do processo, limitado a PROCESSOS_AGREGACAO, para todas as sessões e carregamentos
+    return agregados.criar_executor(PROCESSOS_AGREGACAO) if PROCESSOS_AGREGACAO > 1 else None
+
+
+def abrir_base(chave, carregar):
+    # Cada sessão guarda uma referência à base em uso; ao trocar de base, a anterior é liberada
+    referencia = st.session_state.get('referencia_base')
+    if referencia is None or referencia.chave != chave:
+        nova = obter_registro().adquirir(chave, carregar)
+        if referencia is not None:
+            referencia.liberar()
+        st.session_state.referencia_base = referencia = nova
+
+    df, resumo = referencia.valor
+    # Visão rasa: a sessão pode criar colunas sem alterar a base compartilhada
+    return (None if df is None else df.copy(deep=False)), resumo
+
+
+def fechar_base():
+    referencia = st.session_state.pop('referencia_base', None)
+    if referencia is not None:
+        referencia.liberar()
+
+
+def carregar_base(arquivo, modo_perfis, aproximado):
+    with st.spinner('Carregando a base de sinistros...'):
+        # Cubo de contagens calculado uma vez por base; os gráficos leem apenas dele
+        return relatorio.carregar_base(arquivo, modo_perfis, PROCESSOS_AGREGACAO, aproximado, obter_executor())
+
+
+@st.cache_resource
+def obter_carregamentos():
+    # Carregamentos em segundo plano do processo: sessões que abrem a mesma base acompanham o mesmo.
+    # Ao terminar, cada um entrega os agregados ao registro de bases, com o mesmo formato de `carregar`
+    return registro.Carregamentos(obter_registro(), lambda resumo: (None, resumo))
+
+
+def carregar_delta(resumo, arquivo, modo_perfis):
+    # Só o lote novo é lido e preparado; os agregados existentes são atualizados incrementalmente
+    with st.spinner(f'Anexando {arquivo.name}...'):
+        return relatorio.anexar_delta(resumo, arquivo, modo_perfis)
+
+
+def abrir_base_com_deltas(chave_base, carregar, deltas, modo_perfis):
+    # A chave da base com lotes anexados acumula os hashes dos lotes, na ordem
+    chaves = [chave_base]
+    for hash_delta, _ in deltas:
+        chaves.append(f'{chaves[-1]}+{hash_delta}')
+    if not deltas:
+        return abrir_base(chave_base, carregar)
+
+    def carregar_com_deltas():
+        # Parte do estado mais avançado já disponível: a versão em uso pela sessão, se for
+        # um prefixo da sequência pedida, ou a base sem lotes
+        atual = st.session_state.get('referencia_base')
+        if atual is not None and atual.chave in chaves:
+            inicio = chaves.index(atual.chave)
+            _, resumo = atual.valor
+        else:
+            inicio = 0
+            referencia = obter_registro().adquirir(chave_base, carregar)
+            _, resumo = referencia.valor
+            referencia.liberar()
+
+        for _, arquivo in deltas[inicio:]:
+            resumo = carregar_delta(resumo, arquivo, modo_perfis)
+        # Com lotes anexados, só os agregados são mantidos: a base original não é reprocessada
+        return None, resumo
+
+    return abrir_base(chaves[-1], carregar_com_deltas)
+
+
+def carregar_snapshot(caminho, modo_perfis, aproximado):
+    with st.spinner('Abrindo snapshot...'):
+        return relatorio.carregar_snapshot(caminho, modo_perfis, PROCESSOS_AGREGACAO, aproximado, obter_executor())
+
+
+def carregar_comparacao(nome, carregar):
+    # Só os agregados de cada base comparada ficam em memória
+    with st.spinner(f'Carregando {nome} para a comparação...'):
+        return None, carregar()
+
+
+def abrir_bases_comparacao(bases):
+    """Referências da sessão às bases comparadas (chave -> (rótulo, carregar)); as removidas são liberadas."""
+    referencias = st.session_state.setdefault('referencias_comparacao', {})
+    for chave in set(referencias) - set(bases):
+        referencias.pop(chave).liberar()
+
+    resumos, chaves = {}, []
+    for chave, (rotulo, carregar) in bases.items():
+        if chave not in referencias:
+            try:
+                referencias[chave] = obter_registro().adquirir(chave, carregar)
+            except (dados.LimiteMemoriaExcedido, dados.ColunasAusentes) as erro:
+                st.sidebar.error(f'{rotulo}: {erro}')
+                continue
+        # Rótulos repetidos (ex.: arquivos de mesmo nome) ganham um número
+        rotulo_unico, n = rotulo, 2
+        while rotulo_unico in resumos:
+            rotulo_unico, n = f'{rotulo} ({n})', n + 1
+        resumos[rotulo_unico] = referencias[chave].valor[1]
+        chaves.append(chave)
+    return resumos, tuple(chaves)
+
+
+@st.cache_resource
+def configurar_log_desempenho(caminho):
+    # Um único manipulador por processo, não importa quantas sessões rodem o script
+    return instrumentacao.configurar_log(caminho)
+
+
+@st.cache_data(max_entries=MAX_GRAFICOS_CACHE)
+def especificacao_grafico(chave_base, nome, parametros, _construir, _resumo):
+    # A base entra no cache pela chave; o resumo (não hasheável) é ignorado pelo Streamlit
+    with instrumentacao.etapa(f'grafico:{nome}') as medicao:
+        especificacao = _construir(_resumo, *parametros).to_dict()
+        medicao['linhas'] = sum(len(linhas) for linhas in especificacao.get('datasets', {}).values())
+    return especificacao
+
+
+def painel_desempenho():
+    with st.sidebar.expander("Painel de desempenho"):
+        # A medição vale para o processo inteiro: o valor inicial vem do estado atual, que
+        # outro administrador pode ter mudado, e só uma mudança desta sessão liga ou desliga
+        medindo = instrumentacao.medindo_memoria()
+        medir_memoria = st.checkbox("Medir pico de memória em todo o servidor (deixa as etapas mais lentas)",
+                                    value=medindo)
+        if medir_memoria != medindo:
+            instrumentacao.ativar_memoria(medir_memoria)
+        if medir_memoria:
+            st.caption('Picos aproximados: com a medição ligada, as etapas das sessões são executadas uma de cada '
+                       'vez, mas alocações fora delas também contam.')
+
+        st.markdown('**Por etapa**')
+        st.dataframe(instrumentacao.resumo_etapas())
+        st.markdown('**Últimas medições**')
+        st.dataframe(instrumentacao.registros().tail(50).iloc[::-1], hide_index=True)
+
+        st.markdown('**Bases em memória**')
+        registro_bases = obter_registro()
+        st.dataframe(pd.DataFrame({'memoria_mb': pd.Series(registro_bases.memoria()) / 2**20,
+                                   'sessoes': pd.Series(registro_bases.referencias())}).round(2))
+
+        st.download_button("Exportar medições (JSON Lines)", instrumentacao.exportar_jsonl(),
+                           file_name='desempenho.jsonl', mime='application/x-ndjson')
+        if st.button("Limpar medições"):
+            instrumentacao.limpar()
+
+
+def exibir_grafico(construir, resumo, *parametros, chave_base=None):
+    # A especificação Vega-Lite, já com os dados reduzidos, é gerada uma vez por base e parâmetros
+    if chave_base is None:
+        chave_base = st.session_state.referencia_base.chave
+    especificacao = especificacao_grafico(chave_base, construir.__name__, parametros, construir, resumo)
+    st.vega_lite_chart(especificacao, use_container_width=True)
+
+
+def exibir_metricas(resumo):
+    metricas = relatorio.metricas_resumo(resumo)
+    # No modo aproximado, cada estimativa vem acompanhada da sua margem de erro
+    margem_segurados = f" (± {metricas['n_segurados_erro']})" if resumo.aproximado else ''
+    margem_prestador = (f" (contagem até {metricas['prestador_mais_frequente_erro']} acima da real)"
+                        if resumo.aproximado else '')
+    st.markdown(f"""
+    <ul>
+        <li><strong>Quantidade de Sinistros na base:</strong> 
+        <span style="color: #0eae37;">{metricas['n_sinistros']}</span></li>
+        <li><strong>Quantidade de Pessoas que ativaram o sinistro:</strong> 
+        <span style="color: #0eae37;">{metricas['n_segurados']}{margem_segurados}</span></li>
+        <li><strong>Quantidade Média de Sinistro por Pessoa:</strong> 
+        <span style="color: #0eae37;">{metricas['sinistros_por_segurado']}</span></li>
+        <li><strong>Máximo Valor Pago: </strong> 
+        <span style="color: #0eae37;">R${metricas['valor_maximo']}</span></li>
+        <li><strong>Prestador Mais Frequente:</strong> 
+        <span style="color: #0eae37;">{metricas['prestador_mais_frequente']}{margem_prestador}</span></li>
+    </ul>
+    """, unsafe_allow_html=True)
+
+
+@st.fragment(run_every=INTERVALO_PROGRESSO)
+def acompanhar_carregamento(carregamento):
+    # Reexecutado a cada INTERVALO_PROGRESSO segundos enquanto a base carrega; ao terminar, a página toda é refeita
+    if carregamento.concluido:
+        st.rerun()
+
+    st.progress(carregamento.progresso, text=f'Carregando a base de sinistros em blocos... '
+                                             f'{carregamento.progresso:.0%}')
+    parcial = carregamento.parcial
+    if parcial is None:
+        st.info('Calculando os perfis da base; os resultados parciais aparecem em seguida.')
+        return
+
+    # Resultados parciais: os blocos lidos até agora (os gráficos não vão para o cache, pois ainda mudam)
+    metricas = relatorio.metricas_resumo(parcial)
+    st.caption(f"Resultados parciais, com {metricas['n_sinistros']} sinistros lidos até agora.")
+    exibir_metricas(parcial)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.vega_lite_chart(graficos.grafico_sexo(parcial).to_dict(), use_container_width=True)
+    with col2:
+        st.vega_lite_chart(graficos.grafico_elegibilidade(parcial).to_dict(), use_container_width=True)
+    st.vega_lite_chart(graficos.grafico_ocorrencias_mes(parcial).to_dict(), use_container_width=True)
+
+
+#-------------------------------
+# Seções da página inicial: cada uma é um fragmento, reexecutado sozinho quando um
+# widget dela muda, e só é calculada quando a sua aba está aberta
+
+@st.fragment
+def secao_distribuicoes(resumo):
+    st.header('Visualizando Distribuições')
+    st.markdown('&ensp; Após compreender o básico do que era a base de dados, partimos para algumas distribuições preliminares <br> <br>', unsafe_allow_html=True)
+
+    # Cria duas colunas
+    col1, col2 = st.columns(2)
+
+    # Coloca cada gráfico em uma coluna
+    with col1:
+        exibir_grafico(graficos.grafico_sexo, resumo)
+
+    with col2:
+        exibir_grafico(graficos.grafico_elegibilidade, resumo)
+
+    st.markdown('<br><br>', unsafe_allow_html=True)
+    # Gráfico Sexo por faixa etária
+    exibir_grafico(graficos.grafico_faixa_etaria_sexo, resumo)
+    st.write('<br><br>', unsafe_allow_html=True)
+
+    # Gráfico ocorrências por mês
+    exibir_grafico(graficos.grafico_ocorrencias_mes, resumo)
+
+
+@st.fragment
+def secao_mais_utilizados(resumo):
+    # Create two columns
+    col3, col4 = st.columns(2)
+
+    # Top 3 categorias e prestadores mais usados por titulares e por dependentes
+    with col3:
+        exibir_grafico(graficos.grafico_top_categorias, resumo, 'Titular', 'lightgreen',
+                       'Top 3 Categorias mais utilizadas por Titulares')
+        st.markdown('<br>', unsafe_allow_html=True)
+        exibir_grafico(graficos.grafico_top_prestadores, resumo, 'Titular', 'lightgreen',
+                       'Top 3 Prestadores mais utilizados por Titulares')
+
+    with col4:
+        exibir_grafico(graficos.grafico_top_categorias, resumo, 'Dependente', '#006343',
+                       'Top 3 Categorias mais utilizadas por Dependentes')
+        st.markdown('<br>', unsafe_allow_html=True)
+        exibir_grafico(graficos.grafico_top_prestadores, resumo, 'Dependente', '#006343',
+                       'Top 3 Prestadores mais utilizadas por Dependentes')
+
+    if resumo.aproximado:
+        st.caption('Modo aproximado: número de segurados estimado por HyperLogLog e prestadores mais '
+                   'frequentes por Space-Saving; o tooltip mostra quanto cada contagem pode superar a real.')
+
+
+@st.fragment
+def secao_serie_temporal(resumo):
+    st.header('Série Temporal das Categorias')
+    st.markdown('&ensp; Entre todas as colunas, uma se destaca: a categoria. Esta se relaciona à que categoria de serviço foi utilizada no sinistro. Abaixo é possível visualizar o uso dessas categorias no tempo. Para tanto, basta escolher se deseja ver de titulares, dependentes ou ambos e qual categoria se busca.')
+
+    st.markdown('<br>', unsafe_allow_html=True)
+
+    # Seleção de elegibilidade
+    elegibilidade_selecionada = st.multiselect("Escolha a Elegibilidade", ['Titular', 'Dependente'], default=['Titular'])
+
+    if elegibilidade_selecionada:
+        # Seleção da categoria
+        categoria_selecionada = st.selectbox("Selecione uma Categoria", list(resumo.serie_temporal.categorias)[::-1])
+
+        # A série já vem com todos os meses do período (eixo X constante): basta somar as elegibilidades
+        full_monthly_counts = relatorio.serie_categoria(resumo, categoria_selecionada, elegibilidade_selecionada)
+
+        if full_monthly_counts['count'].any():
+
+            # Exibindo o gráfico
+            exibir_grafico(graficos.grafico_serie_categoria, resumo, categoria_selecionada, elegibilidade_selecionada)
+            st.markdown('<br>', unsafe_allow_html=True)
+        else:
+            st.markdown('<br>', unsafe_allow_html=True)
+            st.markdown('Não há dados disponíveis para estes parâmetros')
+            st.markdown('<br>', unsafe_allow_html=True)
+
+
+@st.fragment
+def secao_custos(resumo):
+    # Filtros da fatia; listas vazias ou completas selecionam tudo (None), sem filtrar o índice
+    meses_base = resumo.cubo_custos.index.levels[0]
+    meses_base = meses_base[meses_base != dados.MES_AUSENTE]
+    if len(meses_base) == 0:
+        st.info('A base não tem datas de ocorrência válidas.')
+        return
+    if len(meses_base) > 1:
+        rotulos = list(dados.datas_dos_meses(meses_base).strftime('%m/%Y'))
+        inicio, fim = st.select_slider("Período", options=rotulos, value=(rotulos[0], rotulos[-1]))
+        inicio, fim = rotulos.index(inicio), rotulos.index(fim)
+        meses = None if (inicio, fim) == (0, len(rotulos) - 1) else (int(meses_base[inicio]), int(meses_base[fim]))
+    else:
+        meses = None
+
+    col1, col2 = st.columns(2)
+    with col1:
+        categorias = st.multiselect("Categorias", list(resumo.categorias), placeholder='Todas') or None
+    with col2:
+        faixas_base = list(resumo.cubo_custos.index.levels[2])
+        faixas = st.multiselect("Faixas Etárias", faixas_base, placeholder='Todas') or None
+    fatia = (meses, None if categorias is None else tuple(categorias), None if faixas is None else tuple(faixas))
+
+    metricas = relatorio.custos_metricas(resumo, *fatia)
+    if not metricas['n_sinistros']:
+        st.markdown('Não há dados disponíveis para estes parâmetros')
+        return
+
+    colunas = st.columns(4)
+    colunas[0].metric("Valor Pago", f"R$ {metricas['valor_total']:,.2f}")
+    colunas[1].metric("Sinistros", metricas['n_sinistros'])
+    colunas[2].metric("Custo per Capita", f"R$ {metricas['custo_per_capita']:,.2f}",
+                      help='Valor pago dividido pelos segurados distintos com sinistros no período, categorias e '
+                           'faixas etárias escolhidos' + (' (estimados, com erro típico de ~6,5%).' if resumo.aproximado
+                                                          else '.'))
+    colunas[3].metric("Valor Médio por Sinistro", f"R$ {metricas['valor_medio']:,.2f}",
+                      help=f"Mediana R$ {metricas['valor_p50']:,.2f}; P90 R$ {metricas['valor_p90']:,.2f}; "
+                           f"P99 R$ {metricas['valor_p99']:,.2f} (quantis de todo o período, com erro de até 5%).")
+
+    medida = st.radio("Série mensal", ['Valor Pago', 'Custo per Capita'], horizontal=True)
+    exibir_grafico(graficos.grafico_custos_mes, resumo, *fatia,
+                   'valor_total' if medida == 'Valor Pago' else 'custo_per_capita', medida)
+
+    col3, col4 = st.columns(2)
+    with col3:
+        exibir_grafico(graficos.grafico_custos_faixa, resumo, *fatia)
+    with col4:
+        exibir_grafico(graficos.grafico_custos_categoria, resumo, *fatia)
+
+    col5, col6 = st.columns(2)
+    with col5:
+        exibir_grafico(graficos.grafico_ranking_prestadores, resumo, *fatia)
+        st.caption('O ranking de prestadores cobre todo o período e categorias; só o filtro de faixas etárias se aplica.')
+    with col6:
+        st.markdown('**Segurados com Maior Valor Pago** (todo o período e categorias)')
+        st.dataframe(relatorio.top_segurados_custo(resumo, fatia[2]), hide_index=True)
+
+
+@st.fragment
+def secao_comparacao(resumos, chaves):
+    # A chave dos gráficos inclui os rótulos, que aparecem na legenda
+    chaves = (chaves, tuple(resumos))
+    metricas = relatorio.comparacao_metricas(resumos)
+    metricas['inicio'] = metricas['inicio'].dt.strftime('%m/%Y')
+    metricas['fim'] = metricas['fim'].dt.strftime('%m/%Y')
+    st.dataframe(metricas.rename(columns={
+        'base': 'Base', 'inicio': 'Início', 'fim': 'Fim', 'n_sinistros': 'Sinistros', 'n_segurados': 'Segurados',
+        'sinistros_por_segurado': 'Sinistros por Segurado', 'valor_total': 'Valor Pago',
+        'custo_per_capita': 'Custo per Capita', 'valor_medio': 'Valor Médio', 'valor_p50': 'Mediana',
+        'valor_p90': 'P90',
+    }), hide_index=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        medida = st.radio("Série mensal", ['Sinistros', 'Valor Pago', 'Custo per Capita'], horizontal=True)
+    with col2:
+        alinhamento = st.radio("Eixo do tempo", ['Calendário', 'Meses desde o início da base'], horizontal=True,
+                               help='Para comparar períodos diferentes (ex.: ano contra ano), alinhe pelo início de cada base.')
+    colunas_medida = {'Sinistros': 'count', 'Valor Pago': 'valor_total', 'Custo per Capita': 'custo_per_capita'}
+    exibir_grafico(graficos.grafico_comparacao_mes, resumos, colunas_medida[medida], medida,
+                   'relativo' if alinhamento != 'Calendário' else 'calendario', chave_base=chaves)
+
+    col3, col4 = st.columns(2)
+    with col3:
+        exibir_grafico(graficos.grafico_comparacao_faixas, resumos, 'custo_per_capita', 'Custo per Capita',
+                       chave_base=chaves)
+    with col4:
+        exibir_grafico(graficos.grafico_comparacao_faixas, resumos, 'sinistros_por_segurado', 'Sinistros por Segurado',
+                       chave_base=chaves)
+    exibir_grafico(graficos.grafico_comparacao_categorias, resumos, chave_base=chaves)
+
+
+#-------------------------------
+
+if LOG_DESEMPENHO:
+    configurar_log_desempenho(LOG_DESEMPENHO)
+
 df = None
+resumo = None
+carregamento = None
+# Lido uma única vez por execução: o carregamento pode terminar a qualquer momento em segundo plano
+concluido = True
 # Load the data
 with st.sidebar.header("Faça aqui o Upload da Base de Dados da Unipar"):
     uploaded_file = st.sidebar.file_uploader("Base de Sinistros enviada pelo Inteli")
+    # Com um limite de upload menor, a leitura em blocos passa a valer a partir da metade dele
+    tamanho_blocos_mb = min(TAMANHO_LEITURA_EM_BLOCOS_MB, st.get_option('server.maxUploadSize') / 2)
+    grande = uploaded_file is not None and uploaded_file.size >= tamanho_blocos_mb * 2**20
+    leitura_em_blocos = st.sidebar.checkbox(
+        "Leitura em blocos (apenas os agregados em memória)", value=grande,
+        help='A base é lida do arquivo enviado, sem montar a tabela completa; o arquivo enviado continua '
+             'na memória do servidor. Bases maiores que a memória devem ser processadas pela linha de '
+             'comando (relatorio.py).')
+    if leitura_em_blocos:
+        limite_memoria_mb = st.sidebar.number_input("Limite de memória (MB)", min_value=64, value=LIMITE_MEMORIA_MB, step=64)
+
+    # Os perfis da página de análises vêm da coluna `cluster` da base ou do GMM calculado no próprio app
+    modo_perfis = 'base'
+    if st.sidebar.radio("Origem dos perfis", ["Coluna cluster da base", "Modelo GMM do app"]) == "Modelo GMM do app":
+        modo_perfis = 'reajustar' if st.sidebar.checkbox("Reajustar o modelo salvo com esta base") else 'modelo'
+
+    # Segurados distintos e prestadores mais frequentes estimados com esboços de memória fixa
+    aproximado = st.sidebar.checkbox("Modo aproximado (bases muito grandes)")
+    modo = f'{modo_perfis}:aproximado' if aproximado else modo_perfis
+
+    chave_base = None
+    etapas = None
     if uploaded_file is not None:
-        df = pd.read_csv(uploaded_file)
+        hash_base = hash_upload(uploaded_file)
+        if leitura_em_blocos:
+            limite_memoria = limite_memoria_mb * 2**20
+            chave_base = f'{hash_base}:blocos:{limite_memoria}:{modo}'
+            # Apenas os agregados ficam em memória, além do próprio upload, lido aos blocos direto do buffer;
+            # a leitura roda em segundo plano, com resultados parciais
+            etapas = lambda: relatorio.carregar_base_progressivamente(uploaded_file, limite_memoria, modo_perfis,
+                                                                      PROCESSOS_AGREGACAO, aproximado,
+                                                                      obter_executor())
+        else:
+            chave_base = f'{hash_base}:{modo}'
+            carregar = lambda: carregar_base(uploaded_file, modo_perfis, aproximado)
+    else:
+        # Sem upload, é possível abrir uma base salva anteriormente como snapshot colunar
+        snapshots = dados.listar_snapshots()
+        if snapshots:
+            snapshot = st.sidebar.selectbox("Ou abra uma base salva", [None] + snapshots,
+                                            format_func=lambda caminho: '' if caminho is None else caminho.stem)
+            if snapshot is not None:
+                # A data de modificação entra na chave para que um snapshot regravado seja relido
+                chave_base = f'snapshot:{snapshot.stem}:{snapshot.stat().st_mtime}:{modo}'
+                carregar = lambda: carregar_snapshot(snapshot, modo_perfis, aproximado)
+
+    if chave_base is not None:
+        # Lotes de sinistros novos (ex.: o mês mais recente), aplicados na ordem de upload
+        arquivos_delta = st.sidebar.file_uploader("Anexar novos sinistros à base", accept_multiple_files=True)
+        deltas = [(hash_upload(arquivo), arquivo) for arquivo in arquivos_delta or []]
+        if etapas is not None:
+            # Se a base não estiver no registro (ou for descartada dele antes de aberta), a leitura
+            # roda em segundo plano; ao terminar, ela mesma entrega o resultado ao registro
+            carregar = lambda: (None, obter_carregamentos().iniciar(chave_base, etapas).resultado())
+            if not obter_registro().carregada(chave_base):
+                carregamento = obter_carregamentos().iniciar(chave_base, etapas)
+                concluido = carregamento.concluido
+        try:
+            if concluido:
+                df, resumo = abrir_base_com_deltas(chave_base, carregar, deltas, modo_perfis)
+        except dados.LimiteMemoriaExcedido as erro:
+            st.sidebar.error(f'{erro}. Aumente o limite de memória ou use uma base menor.')
+        except dados.ColunasAusentes as erro:
+            st.sidebar.error(str(erro))
+        finally:
+            if carregamento is not None and concluido:
+                # Só um carregamento que falhou continua na lista: uma nova tentativa recomeça a leitura
+                obter_carregamentos().remover(chave_base, carregamento)
+
+    if uploaded_file is not None and df is not None:
+        if st.sidebar.button("Salvar snapshot da base"):
+            # Com os perfis do GMM do app, a coluna `cluster` tem os componentes do modelo: os rótulos vão junto
+            rotulos = resumo.resumo_perfis.rotulos if modo_perfis != 'base' else None
+            caminho = dados.salvar_snapshot(df, dados.caminho_snapshot(uploaded_file.name, hash_base), rotulos)
+            st.sidebar.success(f'Snapshot salvo em {caminho}')
+
+# Bases comparadas lado a lado, além da base principal (se houver); cada uma entra só com os agregados
+bases_comparacao = {}
+with st.sidebar.expander("Comparar bases"):
+    modo_comparacao = 'base:aproximado' if aproximado else 'base'
+    uploads_comparacao = st.file_uploader("Bases a comparar", accept_multiple_files=True, key='uploads_comparacao')
+    for arquivo in uploads_comparacao or []:
+        limite_comparacao = LIMITE_MEMORIA_MB * 2**20
+        # Mesma chave da leitura em blocos com o limite padrão: a base já aberta assim é reaproveitada
+        chave = f'{hash_upload(arquivo)}:blocos:{limite_comparacao}:{modo_comparacao}'
+        bases_comparacao[chave] = (arquivo.name.rsplit('.', 1)[0], lambda arquivo=arquivo, limite=limite_comparacao: carregar_comparacao(
+            arquivo.name, lambda: relatorio.carregar_base_em_blocos(arquivo, limite, 'base',
+                                                                    PROCESSOS_AGREGACAO, aproximado,
+                                                                    obter_executor())))
+    snapshots_comparacao = st.multiselect("Snapshots a comparar", dados.listar_snapshots(),
+                                          format_func=lambda caminho: caminho.stem)
+    for caminho in snapshots_comparacao:
+        chave = f'snapshot:{caminho.stem}:{caminho.stat().st_mtime}:agregados:{modo_comparacao}'
+        bases_comparacao[chave] = (caminho.stem, lambda caminho=caminho: carregar_comparacao(
+            caminho.stem, lambda: relatorio.carregar_snapshot(caminho, 'base', PROCESSOS_AGREGACAO, aproximado,
+                                                              obter_executor())[1]))
+
+    if bases_comparacao and st.button("Abrir comparação"):
+        st.session_state.page = "comparacao"
+
+resumos_comparacao, chaves_comparacao = abrir_bases_comparacao(bases_comparacao)
+if resumo is not None:
+    nome_base = uploaded_file.name.rsplit('.', 1)[0] if uploaded_file is not None else 'Base atual'
+    resumos_comparacao = {nome_base: resumo, **resumos_comparacao}
+    chaves_comparacao = (st.session_state.referencia_base.chave,) + chaves_comparacao
+
+if resumo is None:
+    fechar_base()
 
 st.title('UniData')
 st.markdown('&ensp; Esse projeto visa auxiliar a Unipar na tomada de decisões para desenvolver programas de saúde mais eficazes e eficientes, proporcionando melhorias significativas no bem-estar dos colaboradores a longo prazo.')
 
-if df is not None:
-    df['categoria'] = df['categoria'].str.lower()
-    df['categoria'] = df['categoria'].str.title()
-    df['elegibilidade_sinistro'] = df['elegibilidade_sinistro'].str.lower()
-    df['elegibilidade_sinistro'] = df['elegibilidade_sinistro'].str.title()
+if st.session_state.page == "comparacao":
+    st.title("Comparação de Bases")
+    if len(resumos_comparacao) < 2:
+        st.info('Escolha ao menos duas bases (a base principal e as de "Comparar bases", na barra lateral) para compará-las.')
+    else:
+        st.write("&ensp;As bases abaixo são comparadas lado a lado, a partir dos agregados de cada uma. Para comparar empresas de tamanhos diferentes, prefira as medidas por segurado.<br>", unsafe_allow_html=True)
+        secao_comparacao(resumos_comparacao, chaves_comparacao)
+
+    if st.button("Voltar para Home"):
+        st.session_state.page = "home"
 
+elif resumo is not None:
     if st.session_state.page == "home":
 
         st.header('Impressões Iniciais')
@@ -59,234 +621,25 @@ if df is not None:
         st.write('')
 
         # Your summary metrics
-        st.markdown(f"""
-        <ul>
-            <li><strong>Quantidade de Sinistros na base:</strong> 
-            <span style="color: #0eae37;">{df.shape[0]}</span></li>
-            <li><strong>Quantidade de Pessoas que ativaram o sinistro:</strong> 
-            <span style="color: #0eae37;">{df['segurado'].nunique()}</span></li>
-            <li><strong>Quantidade Média de Sinistro por Pessoa:</strong> 
-            <span style="color: #0eae37;">{round(df.shape[0]/df['segurado'].nunique(), 2)}</span></li>
-            <li><strong>Máximo Valor Pago: </strong> 
-            <span style="color: #0eae37;">R${round(df['valor_pago_sinistro'].max(), 2)}</span></li>
-            <li><strong>Prestador Mais Frequente:</strong> 
-            <span style="color: #0eae37;">{df['nome_prestador_sinistro'].mode()[0]}</span></li>
-        </ul>
-        """, unsafe_allow_html=True)
+        exibir_metricas(resumo)
 
         st.markdown('<br>', unsafe_allow_html=True)
 
-        st.header('Visualizando Distribuições')
-        st.markdown('&ensp; Após compreender o básico do que era a base de dados, partimos para algumas distribuições preliminares <br> <br>', unsafe_allow_html=True)
-
-        # Gráfico Sexo
-        quantidade_sexo = df['sexo_colaborador_sinistro'].value_counts()
-        data_sexo = pd.DataFrame({
-            'Sexo': ['Feminino', 'Masculino'],
-            'Quantidade de Ocorrências': quantidade_sexo.values
-        })
-
-        chart_sexo = alt.Chart(data_sexo).mark_arc().encode(
-            theta=alt.Theta(field="Quantidade de Ocorrências", type="quantitative"),
-            color=alt.Color('Sexo:N', scale=alt.Scale(domain=['Feminino', 'Masculino'], 
-                                                      range=['#008A26', '#00FF3C'])),
-            tooltip=['Sexo', 'Quantidade de Ocorrências']
-        ).properties(
-            title='Distribuição de Sexo por Sinistro'
-        )
-        #00FF3C
-
-        # Gráfico Elegibilidade
-        quantidade_elegibilidade = df['elegibilidade_sinistro'].value_counts()
-        data_elegibilidade = pd.DataFrame({
-            'Elegibilidade': quantidade_elegibilidade.index,
-            'Quantidade de Ocorrências': quantidade_elegibilidade.values
-        })
-
-        chart_elegibilidade = alt.Chart(data_elegibilidade).mark_arc().encode(
-            theta=alt.Theta(field="Quantidade de Ocorrências", type="quantitative"),
-            color=alt.Color('Elegibilidade:N', scale=alt.Scale(domain=['Dependente', 'Titular'], 
-                                                               range=['#006343', 'lightgreen'])),
-            tooltip=['Elegibilidade', 'Quantidade de Ocorrências']
-        ).properties(
-            title='Distribuição de Elegibilidade por Sinistro'
-        )
-
-        # Cria duas colunas
-        col1, col2 = st.columns(2)
-
-        # Coloca cada gráfico em uma coluna
-        with col1:
-            st.altair_chart(chart_sexo, use_container_width=True)
-
-        with col2:
-            st.altair_chart(chart_elegibilidade, use_container_width=True)
-
-        # Gráfico Sexo por faixa etária
-        grouped = df.groupby(['faixa_etaria_colaborador_sinistro', 'sexo_colaborador_sinistro']).size().reset_index(name='count')
-        grouped['sexo_colaborador_sinistro'] = grouped['sexo_colaborador_sinistro'].map({'M': 'Masculino', 'F': 'Feminino'})
-
-        chart_faixa_etaria_sexo = alt.Chart(grouped).mark_bar().encode(
-            x=alt.X('faixa_etaria_colaborador_sinistro:O', title='Faixa Etária'),
-            y=alt.Y('count:Q', title='Número de Ocorrências'),
-            color=alt.Color('sexo_colaborador_sinistro:N', title='Gênero', scale=alt.Scale(
-                                domain=['Masculino', 'Feminino'],
-                                range=['#00FF3C', '#008A26']
-                            )),
-            xOffset='sexo_colaborador_sinistro:N',  # Desloca as barras pelo gênero
-            tooltip=['faixa_etaria_colaborador_sinistro', 'sexo_colaborador_sinistro', 'count']
-        ).properties(
-            title='Distribuição por Faixa Etária e Gênero'
-        )
+        # Só a aba aberta é calculada; trocar de aba reexecuta a página sem recalcular as demais
+        aba_distribuicoes, aba_mais_utilizados, aba_serie = st.tabs(
+            ['Distribuições', 'Mais Utilizados', 'Série Temporal das Categorias'], key='aba_home', on_change='rerun')
+        with aba_distribuicoes:
+            if aba_distribuicoes.open:
+                secao_distribuicoes(resumo)
+        with aba_mais_utilizados:
+            if aba_mais_utilizados.open:
+                secao_mais_utilizados(resumo)
+        with aba_serie:
+            if aba_serie.open:
+                secao_serie_temporal(resumo)
 
-        st.markdown('<br><br>', unsafe_allow_html=True)
-        st.altair_chart(chart_faixa_etaria_sexo, use_container_width=True)
-        st.write('<br><br>', unsafe_allow_html=True)
-
-        # Gráfico ocorrências por mês
-        df['data_ocorrencia_sinistro'] = pd.to_datetime(df['data_ocorrencia_sinistro'], format='%d/%m/%Y')
-        df['month'] = df['data_ocorrencia_sinistro'].dt.to_period('M')
-        monthly_counts = df.groupby('month').size().reset_index(name='count')
-        monthly_counts['month'] = monthly_counts['month'].dt.to_timestamp()
-
-        line_chart_mes = alt.Chart(monthly_counts).mark_line(point=True).encode(
-            x=alt.X('month:T', title='Mês/Ano', axis=alt.Axis(format='%b %Y')),  # Formatação correta do eixo X
-            y=alt.Y('count:Q', title='Número de Ocorrências'), 
-            tooltip=[alt.Tooltip('month:T', title='Mês/Ano', format='%b %Y'), alt.Tooltip('count:Q',    title='Número de Ocorrências')],
-            color=alt.value('#0eae37')
-        ).properties(
-            title='Número de Ocorrências por Mês'
-        )
-
-        st.altair_chart(line_chart_mes, use_container_width=True)
         st.markdown('<br><br>', unsafe_allow_html=True)
 
-        #Gráfico top 3 categorias mais usadas por titulares
-        categorias_mais_usadas_titulares = df.loc[df['elegibilidade_sinistro'] == 'Titular', 'categoria'].value_counts()[:3]
-
-        data_categoria_titulares = pd.DataFrame({
-            'Categoria': categorias_mais_usadas_titulares.index,
-            'Quantidade de Ocorrências': categorias_mais_usadas_titulares.values
-        })
-        chart_categoria_titulares = alt.Chart(data_categoria_titulares).mark_bar().encode(
-            x='Quantidade de Ocorrências',
-            y='Categoria',
-            color=alt.value('lightgreen') 
-        ).properties(
-            title='Top 3 Categorias mais utilizadas por Titulares'
-        )
-
-        #Gráfico top 3 categorias mais usadas por dependentes
-        categorias_mais_usadas_dependentes = df.loc[df['elegibilidade_sinistro'] == 'Dependente', 'categoria'].value_counts()[:3]
-        data_categoria_dependentes = pd.DataFrame({
-            'Categoria': categorias_mais_usadas_dependentes.index,
-            'Quantidade de Ocorrências': categorias_mais_usadas_dependentes.values
-        })
-        chart_categoria_dependentes = alt.Chart(data_categoria_dependentes).mark_bar().encode(
-            x='Quantidade de Ocorrências',
-            y='Categoria',
-            color=alt.value('#006343') 
-        ).properties(
-            title='Top 3 Categorias mais utilizadas por Dependentes'
-        )
-
-        #Gráfico top 3 prestadores mais usadas por titulares
-        prestadores_mais_usados_titulares = df.loc[df['elegibilidade_sinistro'] == 'Titular', 'nome_prestador_sinistro'].value_counts()[:3]
-
-        data_prestador_titulares = pd.DataFrame({
-            'Prestador': prestadores_mais_usados_titulares.index,
-            'Quantidade de Ocorrências': prestadores_mais_usados_titulares.values
-        })
-        chart_prestador_titulares = alt.Chart(data_prestador_titulares).mark_bar().encode(
-            x='Quantidade de Ocorrências',
-            y='Prestador',
-            color=alt.value('lightgreen') 
-        ).properties(
-            title='Top 3 Prestadores mais utilizados por Titulares'
-        )
-
-        #Gráfico top 3 categorias mais usadas por dependentes
-        prestadores_mais_usados_dependentes = df.loc[df['elegibilidade_sinistro'] == 'Dependente', 'nome_prestador_sinistro'].value_counts()[:3]
-        data_prestador_dependentes = pd.DataFrame({
-            'Prestador': prestadores_mais_usados_dependentes.index,
-            'Quantidade de Ocorrências': prestadores_mais_usados_dependentes.values
-        })
-        chart_prestador_dependentes = alt.Chart(data_prestador_dependentes).mark_bar().encode(
-            x='Quantidade de Ocorrências',
-            y='Prestador',
-            color=alt.value('#006343') 
-        ).properties(
-            title='Top 3 Prestadores mais utilizadas por Dependentes'
-        )
-
-
-        # Create two columns
-        col3, col4 = st.columns(2)
-
-        # Place the charts in each column
-        with col3:
-            st.altair_chart(chart_categoria_titulares, use_container_width=True)
-            st.markdown('<br>', unsafe_allow_html=True)
-            st.altair_chart(chart_prestador_titulares, use_container_width=True)
-
-        with col4:
-            st.altair_chart(chart_categoria_dependentes, use_container_width=True)
-            st.markdown('<br>', unsafe_allow_html=True)
-            st.altair_chart(chart_prestador_dependentes, use_container_width=True)
-
-        st.markdown('<br><br>', unsafe_allow_html=True)
-        st.header('Série Temporal das Categorias')
-        st.markdown('&ensp; Entre todas as colunas, uma se destaca: a categoria. Esta se relaciona à que categoria de serviço foi utilizada no sinistro. Abaixo é possível visualizar o uso dessas categorias no tempo. Para tanto, basta escolher se deseja ver de titulares, dependentes ou ambos e qual categoria se busca.')
-
-        st.markdown('<br>', unsafe_allow_html=True)
-
-        df['data_ocorrencia_sinistro'] = pd.to_datetime(df['data_ocorrencia_sinistro'], format='%d/%m/%Y')
-        df['month'] = df['data_ocorrencia_sinistro'].dt.to_period('M')
-
-        # Seleção de elegibilidade
-        elegibilidade_selecionada = st.multiselect("Escolha a Elegibilidade", ['Titular', 'Dependente'], default=['Titular'])
-
-        if elegibilidade_selecionada:
-            # Seleção da categoria
-            categoria_selecionada = st.selectbox("Selecione uma Categoria", list(df['categoria'].unique())[::-1])
-
-            # Filtrando os dados
-            df_filtrado = df[(df['categoria'] == categoria_selecionada) & (df['elegibilidade_sinistro'].isin(elegibilidade_selecionada))]
-
-            if not df_filtrado.empty:
-                # Agrupando os dados e contando as ocorrências por mês
-                monthly_counts = df_filtrado.groupby('month').size().reset_index(name='count')
-                monthly_counts['month'] = monthly_counts['month'].dt.to_timestamp()
-
-                # Gerando uma lista de meses completa para garantir que o eixo X seja constante
-                min_month = df['data_ocorrencia_sinistro'].min().to_period('M').to_timestamp()
-                max_month = df['data_ocorrencia_sinistro'].max().to_period('M').to_timestamp()
-                all_months = pd.date_range(start=min_month, end=max_month, freq='MS')  # 'MS' para o início de cada mês
-
-                # Criando um DataFrame com todos os meses
-                all_months_df = pd.DataFrame({'month': all_months})
-
-                # Fazendo um merge para garantir que todos os meses estejam presentes no gráfico
-                full_monthly_counts = pd.merge(all_months_df, monthly_counts, on='month', how='left').fillna(0)
-
-                # Criação do gráfico com a formatação do eixo X e tooltip
-                line_chart_mes = alt.Chart(full_monthly_counts).mark_line(point=True).encode(
-                    x=alt.X('month:T', title='Mês/Ano', axis=alt.Axis(format='%b %Y')),  # Formatação do eixo X
-                    y=alt.Y('count:Q', title='Número de Ocorrências'), 
-                    tooltip=[alt.Tooltip('month:T', title='Mês/Ano', format='%b %Y'), alt.Tooltip('count:Q', title='Número de Ocorrências')],
-                    color=alt.value('#0eae37')
-                ).properties(
-                    title=f'Número de Ocorrências de {categoria_selecionada} por Mês'
-                )
-
-                # Exibindo o gráfico
-                st.altair_chart(line_chart_mes, use_container_width=True)
-                st.markdown('<br>', unsafe_allow_html=True)
-            else:
-                st.markdown('<br>', unsafe_allow_html=True)
-                st.markdown('Não há dados disponíveis para estes parâmetros')
-                st.markdown('<br>', unsafe_allow_html=True)
-
         footer = """
         <style>
         .footer {
@@ -319,10 +672,28 @@ if df is not None:
         # Navigation button
         if st.button("Veja Nossas Análises"):
             st.session_state.page = "analises"
+        if st.button("Veja os Custos"):
+            st.session_state.page = "custos"
 
         st.markdown("<br><br><br>", unsafe_allow_html=True)
         st.markdown(footer, unsafe_allow_html=True)
 
+    elif st.session_state.page == "custos":
+        st.title("Custos")
+        st.write("&ensp;Valor pago pelo convênio por mês, categoria e faixa etária. Escolha o período, as categorias e as faixas etárias abaixo: todos os números e gráficos são recalculados para a seleção.<br>", unsafe_allow_html=True)
+
+        secao_custos(resumo)
+
+        if st.button("Voltar para Home"):
+            st.session_state.page = "home"
+
+    elif st.session_state.page == "analises" and resumo.resumo_perfis is None:
+        st.title("Nossas Análises")
+        st.info('A base carregada não tem a coluna cluster. Escolha "Modelo GMM do app" na barra lateral para calcular os perfis.')
+
+        if st.button("Voltar para Home"):
+            st.session_state.page = "home"
+
     elif st.session_state.page == "analises":
         st.title("Nossas Análises")
 
@@ -332,165 +703,76 @@ if df is not None:
 
         st.header("Resultados Preditivos")
 
-        st.write("&ensp;A máquina, usando-se de técnicas matemáticas, é capaz de agrupar perfis com base em sua similaridade de comportamento por vezes ocultos à reflexão humana. Um dos métodos de se aplicar isso é baseando-se no agrupamento gerado pelo Gaussian Mixture Model. Este algoritmo de agrupamento encontrou nos dados os seguintes perfis:<br>", unsafe_allow_html=True)
+        # O texto desta página descreve os clusters da análise original (`perfis.PERFIS`); com os perfis
+        # do GMM do app (ou de um snapshot gravado com eles), os grupos podem ser outros
+        resumo_perfis = resumo.resumo_perfis
+        perfis_originais = resumo_perfis.rotulos == perfis.PERFIS
 
-        st.write("- Homens jovens de 0 a 18 anos;", unsafe_allow_html=True)
-        st.write("- Homens mais velhos, prioritariamente de 59 anos ou mais;", unsafe_allow_html=True)
-        st.write("- Mulheres entre 34 e 43 ou de 59 ou mais.", unsafe_allow_html=True)
+        if perfis_originais:
+            st.write("&ensp;A máquina, usando-se de técnicas matemáticas, é capaz de agrupar perfis com base em sua similaridade de comportamento por vezes ocultos à reflexão humana. Um dos métodos de se aplicar isso é baseando-se no agrupamento gerado pelo Gaussian Mixture Model. Este algoritmo de agrupamento encontrou nos dados os seguintes perfis:<br>", unsafe_allow_html=True)
 
-        st.write("&ensp;Segundo os resultados do GMM, esses três grupos apresentam comportamentos distintos entre si à maneira como utilizam o plano de saúde. Vejamos abaixo algumas características desses três grupos.", unsafe_allow_html=True)
+            st.write("- Homens jovens de 0 a 18 anos;", unsafe_allow_html=True)
+            st.write("- Homens mais velhos, prioritariamente de 59 anos ou mais;", unsafe_allow_html=True)
+            st.write("- Mulheres entre 34 e 43 ou de 59 ou mais.", unsafe_allow_html=True)
 
-        st.write("<br><br>", unsafe_allow_html=True)
+            st.write("&ensp;Segundo os resultados do GMM, esses três grupos apresentam comportamentos distintos entre si à maneira como utilizam o plano de saúde. Vejamos abaixo algumas características desses três grupos.", unsafe_allow_html=True)
+        else:
+            st.write("&ensp;Os perfis abaixo foram calculados pelo modelo GMM do app para a base carregada. Os gráficos mostram, para cada perfil, as ocorrências, os segurados, as categorias e os prestadores mais frequentes e a distribuição do valor pago.", unsafe_allow_html=True)
 
+        st.write("<br><br>", unsafe_allow_html=True)
 
-        df_clusters = df.loc[df['cluster'].isin([1,7,8])]
-        quantidade_cluster = df_clusters['cluster'].value_counts()
-        data_quantidade_cluster = pd.DataFrame({
-            'cluster': ['3', '2', '1'],
-            'quantidade': quantidade_cluster.values
-        })
-        chart_quantidade_cluster = alt.Chart(data_quantidade_cluster).mark_bar().encode(
-            x=alt.X('cluster:O', title='Perfil'),
-            y=alt.Y('quantidade:Q', title='Número de Ocorrências'),
-            color=alt.Color('cluster:N', title='Perfil', scale=alt.Scale(
-                                domain=['1', '2', '3'],
-                                range=['#00FF3C', '#00B432', '#006343']
-                            )),
-        ).properties(
-            title='Distribuição de Ocorrências por Perfil'
-        )
-
-        quantidade_cluster_segurado = df_clusters.drop_duplicates(subset=['segurado'], keep=
-        'first')['cluster'].value_counts()
-        data_quantidade_cluster_segurado = pd.DataFrame({
-            'cluster': ['2', '1', '3'],
-            'quantidade': quantidade_cluster_segurado.values
-        })
-        chart_quantidade_cluster_segurado = alt.Chart(data_quantidade_cluster_segurado).mark_bar().encode(
-            x=alt.X('cluster:O', title='Perfil'),
-            y=alt.Y('quantidade:Q', title='Número de Ocorrências'),
-            color=alt.Color('cluster:N', title='Perfil', scale=alt.Scale(
-                                domain=['1', '2', '3'],
-                                range=['#00FF3C', '#00B432', '#006343']
-                            )),
-        ).properties(
-            title='Distribuição de Segurados por Perfil'
-        )
 
+        # Estatísticas por perfil, calculadas uma única vez no carregamento da base
         col5, col6 = st.columns(2)
 
         with col5:
-            st.altair_chart(chart_quantidade_cluster, use_container_width=True)
+            exibir_grafico(graficos.grafico_perfis_ocorrencias, resumo_perfis)
         with col6:
-            st.altair_chart(chart_quantidade_cluster_segurado, use_container_width=True)
+            exibir_grafico(graficos.grafico_perfis_segurados, resumo_perfis)
 
         st.write("<br>", unsafe_allow_html=True)
 
-        st.write("&ensp;Pelos gráficos acima, verifica-se que os três perfis comprimem poucas ocorrências do total do banco de dados. Mesmo o mais proeminente deles (mulheres entre 34 e 43 ou de 59 ou mais) não chega a 10000 ocorrências. Deve-se notar, porém, que comprimem uma quantidade significativa de segurados: o comportamento de, pelo menos, 250 pessoas em cada<br>", unsafe_allow_html=True)
+        if perfis_originais:
+            st.write("&ensp;Pelos gráficos acima, verifica-se que os três perfis comprimem poucas ocorrências do total do banco de dados. Mesmo o mais proeminente deles (mulheres entre 34 e 43 ou de 59 ou mais) não chega a 10000 ocorrências. Deve-se notar, porém, que comprimem uma quantidade significativa de segurados: o comportamento de, pelo menos, 250 pessoas em cada<br>", unsafe_allow_html=True)
 
         st.header('Comportamento por perfil')
 
-        st.write("&ensp;O GMM conseguiu encontrar a relação entre esses perfis demográficos em nosso banco de dados. É necessário agora, investigar seus comportamentos.", unsafe_allow_html=True)
+        if perfis_originais:
+            st.write("&ensp;O GMM conseguiu encontrar a relação entre esses perfis demográficos em nosso banco de dados. É necessário agora, investigar seus comportamentos.", unsafe_allow_html=True)
 
         st.write("&ensp;Primeiro, em relação à categoria do sinistro:<br><br>", unsafe_allow_html=True)
 
-        # Agrupar por categoria e cluster, e contar as ocorrências
-        grouped_cluster_categoria = df_clusters.groupby(['categoria', 'cluster']).size().reset_index    (name='count')
-
-        # Para cada cluster, obter as três maiores categorias
-        top_3_categorias_por_cluster = (
-            grouped_cluster_categoria
-            .sort_values(by=['cluster', 'count'], ascending=[True, False])
-            .groupby('cluster')
-            .head(3)
-        )
-        top_3_categorias_por_cluster['cluster'] = top_3_categorias_por_cluster['cluster'].replace({8: '1', 1: '2', 7: '3'})
-
-
-        # Criar o gráfico de barras com Altair
-        chart_categoria_cluster = alt.Chart(top_3_categorias_por_cluster).mark_bar().encode(
-            x=alt.X('count:Q', title='Número de Ocorrências'),
-            y=alt.Y('categoria:O', title='Categoria', sort='-x'),
-            color=alt.Color('cluster:N', title='Perfil', scale=alt.Scale(
-                domain=['1', '2', '3'],
-                range=['#00FF3C', '#00B432', '#006343']
-            )),
-            yOffset='cluster:N',  # Desloca as barras pelo cluster
-            tooltip=['cluster', 'categoria', 'count']
-        ).properties(
-            title='Distribuição de Categorias por Perfil'
-        )
-
-        # Exibir o gráfico com Streamlit
-        st.altair_chart(chart_categoria_cluster, use_container_width=True)
+        # Para cada cluster, as três maiores categorias
+        exibir_grafico(graficos.grafico_perfis_top, resumo_perfis, 'categoria', 'Categoria',
+                       'Distribuição de Categorias por Perfil')
 
         st.write("<br>", unsafe_allow_html=True)
-        st.write("&ensp;Em relação à categoria, observa-se a predominância de categorias gerais. Os três perfis utilizam o plano de saúde, principalmente, para realizar exames clínicos e procedimentos diagnósticos. Entretanto, uma categoria que se destaca no perfil de jovens de 0 à 18 anos é o recorrente uso do plano para consultas.<br>", unsafe_allow_html=True)
+        if perfis_originais:
+            st.write("&ensp;Em relação à categoria, observa-se a predominância de categorias gerais. Os três perfis utilizam o plano de saúde, principalmente, para realizar exames clínicos e procedimentos diagnósticos. Entretanto, uma categoria que se destaca no perfil de jovens de 0 à 18 anos é o recorrente uso do plano para consultas.<br>", unsafe_allow_html=True)
 
         st.write("&ensp;Segundo, em relação ao prestador:<br><br>", unsafe_allow_html=True)
 
-        # Agrupar por categoria e cluster, e contar as ocorrências
-        grouped_cluster_prestador = df_clusters.groupby(['nome_prestador_sinistro', 'cluster']).size().reset_index    (name='count')
-
-        # Para cada cluster, obter as três maiores categorias
-        top_3_prestadores_por_cluster = (
-            grouped_cluster_prestador
-            .sort_values(by=['cluster', 'count'], ascending=[True, False])
-            .groupby('cluster')
-            .head(3)
-        )
-        top_3_prestadores_por_cluster['cluster'] = top_3_prestadores_por_cluster['cluster'].replace({8: '1', 1: '2', 7: '3'})
-
-        # Criar o gráfico de barras com Altair
-        chart_prestador_cluster = alt.Chart(top_3_prestadores_por_cluster).mark_bar().encode(
-            x=alt.X('count:Q', title='Número de Ocorrências'),
-            y=alt.Y('nome_prestador_sinistro:O', title='Prestador', sort='-x'),
-            color=alt.Color('cluster:N', title='Perfil', scale=alt.Scale(
-                domain=['1', '2', '3'],
-                range=['#00FF3C', '#00B432', '#006343']
-            )),
-            yOffset='cluster:N',  # Desloca as barras pelo cluster
-            tooltip=['cluster', 'nome_prestador_sinistro', 'count']
-        ).properties(
-            title='Distribuição de Prestadores por Perfil'
-        )
-
-        st.altair_chart(chart_prestador_cluster, use_container_width=True)
+        # Para cada cluster, os três maiores prestadores
+        exibir_grafico(graficos.grafico_perfis_top, resumo_perfis, 'nome_prestador_sinistro', 'Prestador',
+                       'Distribuição de Prestadores por Perfil')
         st.write("<br>", unsafe_allow_html=True)
 
-        st.write("&ensp;A partir da distribuição acima, observa-se que entre os três, o prestador predominante é o Instituto de Análises Clinícas de Santos, uma instituição voltada à medicina diagnóstica. Porém, evidencia-se à ida frequente de pessoas do perfil 1 ao Hospital Ribeirão Pires e de homens idosos no prestador Delboni Auriemo. <br>", unsafe_allow_html=True)
+        if perfis_originais:
+            st.write("&ensp;A partir da distribuição acima, observa-se que entre os três, o prestador predominante é o Instituto de Análises Clinícas de Santos, uma instituição voltada à medicina diagnóstica. Porém, evidencia-se à ida frequente de pessoas do perfil 1 ao Hospital Ribeirão Pires e de homens idosos no prestador Delboni Auriemo. <br>", unsafe_allow_html=True)
 
         st.write("&ensp;Por último, em relação ao valor pago:<br><br>", unsafe_allow_html=True)
-        df_clusters_valor_pago = pd.DataFrame({
-         'cluster': ['1', '2', '3'],
-         'valor_pago': [
-             df_clusters.loc[df_clusters['cluster'] == 8, 'valor_pago_sinistro'].mean(),
-             df_clusters.loc[df_clusters['cluster'] == 1, 'valor_pago_sinistro'].mean(),
-             df_clusters.loc[df_clusters['cluster'] == 7, 'valor_pago_sinistro'].mean()
-        ]
-        })
-        # Criar o gráfico de barras com Altair
-        chart_valor_cluster = alt.Chart(df_clusters_valor_pago).mark_bar().encode(
-            x=alt.X('cluster:O', title='Perfil'),
-            y=alt.Y('valor_pago:Q', title='Média de Valor Pago', sort='-x'),
-            color=alt.Color('cluster:N', title='Perfil', scale=alt.Scale(
-                domain=['1', '2', '3'],
-                range=['#00FF3C', '#00B432', '#006343']
-            )),
-            tooltip=['cluster:O', 'valor_pago:Q']  # Garantir que a quantidade esteja no tooltip como úmero
-        ).properties(
-            title='Distribuição da Média do Valor Pago por Perfil'
-        )
-        st.altair_chart(chart_valor_cluster, use_container_width=True)
+        exibir_grafico(graficos.grafico_perfis_valor_pago, resumo_perfis)
 
         st.write("<br>", unsafe_allow_html=True)
 
-        st.write("&ensp;A partir da análise do gráfico acima, observa-se que em ordem decrescente os que pagam os maiores valores em média são: homens mais velhos, mulheres mais velhas e, só então jovens. <br>", unsafe_allow_html=True)
+        if perfis_originais:
+            st.write("&ensp;A partir da análise do gráfico acima, observa-se que em ordem decrescente os que pagam os maiores valores em média são: homens mais velhos, mulheres mais velhas e, só então jovens. <br>", unsafe_allow_html=True)
 
-        st.header("Conclusões")
+        if perfis_originais:
+            st.header("Conclusões")
 
-        st.write("&ensp; A análise aprofundada dos perfis identificados pelo modelo preditivo denota os diferentes comportamentos destes tipos de colaboradores Unipar. Os homens mais jovens, utilizam o plano principalmente para exames e consultas, sendo que a maior parte deles é feita no Instituto de Análises Clinícas de Santos, enquanto uma parte significativa o faz no Hospital Ribeirão Pires. Os homens mais velhos, por sua vez, são os que utilizam o plano de forma mais custosa, apesar de também o fazerem para medicina diagnóstica, desta vez, em um prestador de nome Delboni Auriemo. Algo a se notar é a sua sinistralidade mais frequente para exames endócrinos (medição de glicose e níveis hormonais). Essa característica também se repete em mulheres mais velhas, as quais se utilizam bastante do prestador A+ Medicina Diagnóstica. <br>", unsafe_allow_html=True)
-        st.write("&ensp; A partir dessas conclusões, observa-se o potencial da análise preditiva para a segmentação de perfis na Unipar. Para maiores eludicações, porém, deve-se angariar mais dados, dentro do permitido pela lei, do comportamento de saúde dos funcionários, como, por exemplo: sua participação em campanhas de conscientização e prevenção na empresa. Caso contrário, as limitações impostas pela Lei Geral de Proteção de Dados não permitirão maiores insights acerca do comportamento de saúde dos funcionários. <br><br>", unsafe_allow_html=True)
+            st.write("&ensp; A análise aprofundada dos perfis identificados pelo modelo preditivo denota os diferentes comportamentos destes tipos de colaboradores Unipar. Os homens mais jovens, utilizam o plano principalmente para exames e consultas, sendo que a maior parte deles é feita no Instituto de Análises Clinícas de Santos, enquanto uma parte significativa o faz no Hospital Ribeirão Pires. Os homens mais velhos, por sua vez, são os que utilizam o plano de forma mais custosa, apesar de também o fazerem para medicina diagnóstica, desta vez, em um prestador de nome Delboni Auriemo. Algo a se notar é a sua sinistralidade mais frequente para exames endócrinos (medição de glicose e níveis hormonais). Essa característica também se repete em mulheres mais velhas, as quais se utilizam bastante do prestador A+ Medicina Diagnóstica. <br>", unsafe_allow_html=True)
+            st.write("&ensp; A partir dessas conclusões, observa-se o potencial da análise preditiva para a segmentação de perfis na Unipar. Para maiores eludicações, porém, deve-se angariar mais dados, dentro do permitido pela lei, do comportamento de saúde dos funcionários, como, por exemplo: sua participação em campanhas de conscientização e prevenção na empresa. Caso contrário, as limitações impostas pela Lei Geral de Proteção de Dados não permitirão maiores insights acerca do comportamento de saúde dos funcionários. <br><br>", unsafe_allow_html=True)
 
         footer = """
         <style>
@@ -528,7 +810,12 @@ if df is not None:
 
         st.markdown(footer, unsafe_allow_html=True)
 
+elif not concluido:
+    acompanhar_carregamento(carregamento)
+
 else:
     st.info('Aguardando o upload do banco de dados enviado pelo Inteli. É necessária a base de dados tratada para a veracidade das informações apresentadas.')
 
-
+# Ao final do script, para incluir as medições desta execução
+if MODO_ADMIN:
+    painel_desempenho()
@@ -0,0 +1,112 @@
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+import dados
+
+
+# Clusters do GMM apresentados na página de análises e o número do perfil exibido para cada um
+PERFIS = {8: '1', 1: '2', 7: '3'}
+
+# Percentis do valor pago guardados no resumo de cada perfil
+PERCENTIS = [0.25, 0.5, 0.75, 0.9]
+
+
+def quantis_ponderados(valores, pesos, qs):
+    """Quantis (interpolação linear, como `Series.quantile`) de valores ordenados com repetições `pesos`."""
+    acumulado = np.cumsum(pesos)
+    posicoes = np.asarray(qs) * (acumulado[-1] - 1)
+    inferiores = valores[np.searchsorted(acumulado, np.floor(posicoes), side='right')]
+    superiores = valores[np.searchsorted(acumulado, np.ceil(posicoes), side='right')]
+    return inferiores + (superiores - inferiores) * (posicoes - np.floor(posicoes))
+
+
+@dataclass
+class ResumoPerfis:
+    """Estatísticas por cluster dos sinistros dos perfis, combináveis entre partes da base."""
+    contagem_categoria: pd.DataFrame
+    contagem_prestador: pd.DataFrame
+    valores: pd.DataFrame
+    primeiro_cluster: pd.Series
+    # Número do perfil exibido para cada cluster
+    rotulos: dict
+
+    def ocorrencias(self):
+        """Número de sinistros por cluster."""
+        return self.contagem_categoria.groupby('cluster')['count'].sum()
+
+    def segurados(self):
+        """Número de segurados por cluster, considerando o cluster do primeiro sinistro de cada segurado."""
+        return self.primeiro_cluster.value_counts()
+
+    def top(self, coluna, n=3):
+        """Os `n` valores de `coluna` ('categoria' ou 'nome_prestador_sinistro') mais frequentes em cada cluster."""
+        contagem = self.contagem_categoria if coluna == 'categoria' else self.contagem_prestador
+        return (
+            contagem.dropna(subset=[coluna])
+            .sort_values(by=['cluster', 'count'], ascending=[True, False], kind='stable')
+            .groupby('cluster')
+            .head(n)
+            .reset_index(drop=True)
+        )
+
+    @cached_property
+    def tabela(self):
+        """Tabela-resumo: uma linha por cluster com contagens e estatísticas do valor pago."""
+        linhas = {}
+        for cluster, grupo in self.valores.groupby('cluster'):
+            grupo = grupo.sort_values('valor_pago_sinistro')
+            valores = grupo['valor_pago_sinistro'].to_numpy()
+            pesos = grupo['count'].to_numpy()
+            quantis = quantis_ponderados(valores, pesos, PERCENTIS)
+            linhas[cluster] = {
+                'valor_medio': (valores * pesos).sum() / pesos.sum(),
+                **{f'valor_p{int(q * 100)}': valor for q, valor in zip(PERCENTIS, quantis)},
+            }
+
+        tabela = pd.DataFrame({'ocorrencias': self.ocorrencias(), 'segurados': self.segurados()})
+        tabela = tabela.join(pd.DataFrame.from_dict(linhas, orient='index')).fillna({'segurados': 0})
+        tabela.index.name = 'cluster'
+        tabela['perfil'] = tabela.index.map(self.rotulos)
+        return tabela
+
+
+def construir_resumo_perfis(df, rotulos=PERFIS):
+    """Calcula, em uma passada agrupada, o resumo dos sinistros dos clusters presentes em `rotulos`."""
+    df = df.loc[df['cluster'].isin(list(rotulos)), ['segurado', 'categoria', 'nome_prestador_sinistro',
+                                                     'valor_pago_sinistro', 'cluster']]
+
+    def contar(colunas):
+        return df.groupby(colunas, observed=True, dropna=False).size().reset_index(name='count')
+
+    primeiros = df.drop_duplicates(subset=['segurado'], keep='first')
+    return ResumoPerfis(
+        contagem_categoria=contar(['cluster', 'categoria']),
+        contagem_prestador=contar(['cluster', 'nome_prestador_sinistro']),
+        valores=contar(['cluster', 'valor_pago_sinistro']).dropna(subset=['valor_pago_sinistro']),
+        primeiro_cluster=pd.Series(primeiros['cluster'].to_numpy(), index=primeiros['segurado'].astype(str)),
+        rotulos=rotulos,
+    )
+
+
+def combinar_resumos_perfis(partes):
+    """Combina resumos de partes da base, na ordem em que elas aparecem no arquivo."""
+    def somar(atributo, colunas):
+        tabela = dados.concatenar(getattr(parte, atributo) for parte in partes)
+        return tabela.groupby(colunas, observed=True, dropna=False)['count'].sum().reset_index()
+
+    # O cluster de cada segurado é o do seu primeiro sinistro: partes posteriores só acrescentam segurados novos
+    primeiro_cluster = partes[0].primeiro_cluster
+    for parte in partes[1:]:
+        novos = parte.primeiro_cluster[~parte.primeiro_cluster.index.isin(primeiro_cluster.index)]
+        primeiro_cluster = pd.concat([primeiro_cluster, novos])
+
+    return ResumoPerfis(
+        contagem_categoria=somar('contagem_categoria', ['cluster', 'categoria']),
+        contagem_prestador=somar('contagem_prestador', ['cluster', 'nome_prestador_sinistro']),
+        valores=somar('valores', ['cluster', 'valor_pago_sinistro']),
+        primeiro_cluster=primeiro_cluster,
+        rotulos=partes[0].rotulos,
+    )
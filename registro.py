@@ -0,0 +1,195 @@
+import threading
+import traceback
+import weakref
+from collections import OrderedDict
+
+
+class _Entrada:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.carregada = False
+        self.valor = None
+        self.referencias = 0
+        self.tamanho = 0
+
+
+class Referencia:
+    """Posse de uma base do registro por uma sessão.
+
+    Enquanto a referência existir (por exemplo, guardada no `st.session_state`), a
+    base não é descartada. Ela é devolvida com `liberar()` ou, automaticamente,
+    quando a referência é coletada junto com a sessão encerrada.
+    """
+
+    def __init__(self, registro, chave, valor):
+        self.chave = chave
+        self.valor = valor
+        self._finalizador = weakref.finalize(self, registro._liberar, chave)
+
+    def liberar(self):
+        self._finalizador()
+
+
+class RegistroBases:
+    """Registro de bases do processo, compartilhadas entre todas as sessões.
+
+    Cada base é identificada por uma chave (o fingerprint do arquivo) e carregada
+    uma única vez, não importa quantas sessões a usem. As sessões recebem o mesmo
+    objeto, que deve ser tratado como somente leitura. Bases sem nenhuma sessão são
+    descartadas, exceto as `max_ociosas` liberadas mais recentemente, mantidas para
+    que um recarregamento da página não exija reprocessar o arquivo. Com
+    `max_memoria_ociosas` (em bytes), as ociosas mais antigas também são descartadas
+    enquanto a soma de `tamanho(valor)` delas ultrapassar esse limite, exceto a mais
+    recente: uma base recém-carregada em segundo plano fica disponível para a sessão
+    que a pediu mesmo que, sozinha, ultrapasse o limite.
+    """
+
+    def __init__(self, max_ociosas=1, max_memoria_ociosas=None, tamanho=None):
+        self.max_ociosas = max_ociosas
+        self.max_memoria_ociosas = max_memoria_ociosas
+        self.tamanho = tamanho
+        self._lock = threading.Lock()
+        self._entradas = {}
+        self._ociosas = OrderedDict()
+
+    def adquirir(self, chave, carregar):
+        """Devolve uma `Referencia` para a base `chave`, chamando `carregar()` se ela ainda não existir."""
+        with self._lock:
+            entrada = self._entradas.setdefault(chave, _Entrada())
+            entrada.referencias += 1
+            self._ociosas.pop(chave, None)
+
+        try:
+            # O carregamento trava apenas a própria entrada: outras bases seguem disponíveis
+            with entrada.lock:
+                if not entrada.carregada:
+                    entrada.valor = carregar()
+                    entrada.tamanho = self.tamanho(entrada.valor) if self.tamanho is not None else 0
+                    entrada.carregada = True
+        except BaseException:
+            self._liberar(chave)
+            raise
+
+        return Referencia(self, chave, entrada.valor)
+
+    def _liberar(self, chave):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return
+            entrada.referencias -= 1
+            if entrada.referencias > 0:
+                return
+
+            if entrada.carregada and self.max_ociosas > 0:
+                self._ociosas[chave] = entrada
+            else:
+                del self._entradas[chave]
+
+            while len(self._ociosas) > self.max_ociosas or (len(self._ociosas) > 1 and self._excede_memoria()):
+                descartada, _ = self._ociosas.popitem(last=False)
+                del self._entradas[descartada]
+
+    def _excede_memoria(self):
+        if self.max_memoria_ociosas is None:
+            return False
+        return sum(entrada.tamanho for entrada in self._ociosas.values()) > self.max_memoria_ociosas
+
+    def carregada(self, chave):
+        """Se a base `chave` já está carregada (em uso por alguma sessão ou ociosa)."""
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            return entrada is not None and entrada.carregada
+
+    def referencias(self):
+        """Quantidade de sessões usando cada base carregada."""
+        with self._lock:
+            return {chave: entrada.referencias for chave, entrada in self._entradas.items()}
+
+    def memoria(self):
+        """Tamanho de cada base carregada, segundo `tamanho` (zero se não houver)."""
+        with self._lock:
+            return {chave: entrada.tamanho for chave, entrada in self._entradas.items() if entrada.carregada}
+
+
+class Carregamento:
+    """Carregamento de uma base executado em uma thread, com progresso e resultados parciais.
+
+    `etapas` é um iterável de pares (resultado parcial, fração concluída); o último
+    resultado parcial é o resultado final. Se informado, `ao_concluir(carregamento)` é
+    chamado na própria thread quando ele termina sem erro, com o resultado já disponível.
+    """
+
+    def __init__(self, etapas, ao_concluir=None):
+        self.progresso = 0.0
+        self.parcial = None
+        self._resultado = None
+        self._erro = None
+        self._concluido = threading.Event()
+        self._thread = threading.Thread(target=self._executar, args=(etapas, ao_concluir), daemon=True)
+        self._thread.start()
+
+    def _executar(self, etapas, ao_concluir):
+        try:
+            for parcial, progresso in etapas:
+                if parcial is not None:
+                    self.parcial = parcial
+                self.progresso = progresso
+            self._resultado = self.parcial
+        except BaseException as erro:
+            # O erro fica guardado até uma sessão buscá-lo: sem as variáveis locais do traceback, ele
+            # não mantém vivos os blocos e agregados que estavam em uso, e nem os parciais
+            traceback.clear_frames(erro.__traceback__)
+            self._erro = erro
+            self.parcial = None
+        finally:
+            self._concluido.set()
+        if self._erro is None and ao_concluir is not None:
+            ao_concluir(self)
+
+    @property
+    def concluido(self):
+        return self._concluido.is_set()
+
+    def resultado(self):
+        """Espera o fim do carregamento; devolve o resultado final ou relança o erro ocorrido."""
+        self._concluido.wait()
+        if self._erro is not None:
+            raise self._erro
+        return self._resultado
+
+
+class Carregamentos:
+    """Carregamentos em andamento no processo, um por chave, compartilhados entre as sessões.
+
+    Ao terminar, um carregamento entrega `valor(resultado)` ao `registro` de bases (como
+    base ociosa, sujeita aos limites dele) e sai da lista, mesmo que nenhuma sessão volte
+    a consultá-lo. Um carregamento que falhou fica na lista até ser removido, para que as
+    sessões que o acompanham vejam o erro.
+    """
+
+    def __init__(self, registro=None, valor=lambda resultado: resultado):
+        self.registro = registro
+        self.valor = valor
+        self._lock = threading.Lock()
+        self._carregamentos = {}
+
+    def iniciar(self, chave, etapas):
+        """O carregamento da chave, iniciado agora com `etapas()` se ainda não existir."""
+        with self._lock:
+            if chave not in self._carregamentos:
+                self._carregamentos[chave] = Carregamento(
+                    etapas(), ao_concluir=lambda carregamento: self._entregar(chave, carregamento))
+            return self._carregamentos[chave]
+
+    def _entregar(self, chave, carregamento):
+        # Sessões que aguardam o resultado já o têm; a entrega só inclui a base entre as ociosas
+        if self.registro is not None:
+            self.registro.adquirir(chave, lambda: self.valor(carregamento.resultado())).liberar()
+        self.remover(chave, carregamento)
+
+    def remover(self, chave, carregamento=None):
+        """Tira o carregamento da chave da lista (só se for `carregamento`, quando informado)."""
+        with self._lock:
+            if carregamento is None or self._carregamentos.get(chave) is carregamento:
+                self._carregamentos.pop(chave, None)
@@ -0,0 +1,506 @@
+"""Análises da base de sinistros sem depender da interface.
+
+Reúne o carregamento das bases e as tabelas exibidas pelo dashboard, para uso
+pelo `main.py` e em lote, pela linha de comando:
+
+    python relatorio.py base_a.csv base_b.csv --saida relatorios --formato parquet --processos 4
+"""
+import argparse
+import io
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+import agregados
+import custos
+import dados
+import instrumentacao
+import perfis
+import segmentacao
+
+
+MODOS_PERFIS = ['base', 'modelo', 'reajustar']
+
+
+def _abrir(fonte):
+    # Bytes viram um arquivo em memória; arquivos abertos (ex.: upload do Streamlit) são lidos
+    # desde o início, sem cópia; caminhos são lidos do disco
+    if isinstance(fonte, bytes):
+        return io.BytesIO(fonte)
+    if hasattr(fonte, 'read'):
+        fonte.seek(0)
+    return fonte
+
+
+class _Leitura:
+    """Leitura em blocos que informa a fração do arquivo já lida."""
+
+    def __init__(self, fonte, limite_memoria=None):
+        self.fonte = fonte
+        self.limite_memoria = limite_memoria
+        if isinstance(fonte, bytes):
+            self.tamanho = len(fonte)
+        elif hasattr(fonte, 'read'):
+            self.tamanho = fonte.seek(0, io.SEEK_END)
+        else:
+            self.tamanho = os.path.getsize(fonte)
+        self.arquivo = None
+
+    @property
+    def fracao(self):
+        if self.arquivo is None:
+            return 0.0
+        if self.arquivo.closed or not self.tamanho:
+            return 1.0
+        return min(self.arquivo.tell() / self.tamanho, 1.0)
+
+    def blocos(self):
+        # O arquivo só é aberto quando a leitura começa, e fechado ao fim dela; um arquivo já
+        # aberto recebido do chamador é lido do início e continua aberto
+        if hasattr(self.fonte, 'read'):
+            self.arquivo = _abrir(self.fonte)
+            yield from dados.ler_em_blocos(self.arquivo, limite_memoria=self.limite_memoria)
+            return
+        with (io.BytesIO(self.fonte) if isinstance(self.fonte, bytes) else open(self.fonte, 'rb')) as self.arquivo:
+            yield from dados.ler_em_blocos(self.arquivo, limite_memoria=self.limite_memoria)
+
+
+#-------------------------------
+# Carregamento
+
+def preparar_perfis(df, modo_perfis='base'):
+    """Garante a coluna `cluster` conforme o modo e devolve o número do perfil de cada cluster.
+
+    'base' usa a coluna da própria base; 'modelo' e 'reajustar' usam o GMM do app.
+    """
+    if modo_perfis == 'base':
+        return perfis.PERFIS
+    clusters, rotulos = segmentacao.aplicar_modelo(segmentacao.caracteristicas_parciais(df),
+                                                   reajustar=modo_perfis == 'reajustar')
+    segmentacao.atribuir_clusters(df, clusters)
+    return rotulos
+
+
+def carregar_base(fonte, modo_perfis='base', processos=1, aproximado=False, executor=None):
+    """Lê a base inteira; devolve o DataFrame preparado e seus agregados."""
+    df = dados.preparar_base(dados.ler_base(_abrir(fonte)))
+    rotulos = preparar_perfis(df, modo_perfis)
+    return df, agregados.construir_agregados_paralelo(df, rotulos, processos, aproximado, executor)
+
+
+def carregar_base_em_blocos(fonte, limite_memoria=None, modo_perfis='base', processos=1, aproximado=False,
+                            executor=None):
+    """Lê a base em blocos e devolve apenas os agregados.
+
+    Com a coluna `cluster` da base, é uma única leitura; com o GMM do app, uma
+    primeira leitura acumula as características dos segurados e a segunda atribui
+    os clusters a cada bloco. Com `processos` > 1, os blocos são agregados em paralelo
+    (no `executor` compartilhado, se informado).
+    """
+    resumo = None
+    for resumo, _ in carregar_base_progressivamente(fonte, limite_memoria, modo_perfis, processos, aproximado,
+                                                    executor):
+        pass
+    return resumo
+
+
+def carregar_base_progressivamente(fonte, limite_memoria=None, modo_perfis='base', processos=1, aproximado=False,
+                                   executor=None):
+    """Como `carregar_base_em_blocos`, gerando a cada bloco os agregados parciais e a fração lida.
+
+    Com o GMM do app, a primeira leitura (características dos segurados) ocupa a
+    primeira metade do progresso e ainda não tem agregados parciais (`None`).
+    """
+    # Em paralelo, até dois blocos por processo ficam em memória ao mesmo tempo
+    limite_blocos = limite_memoria / processos if limite_memoria is not None else None
+
+    rotulos = perfis.PERFIS
+    inicio, peso = 0.0, 1.0
+    leitura = _Leitura(fonte, limite_blocos)
+    blocos = leitura.blocos()
+    if modo_perfis != 'base':
+        primeira = _Leitura(fonte, limite_blocos)
+        parciais = None
+        for bloco in primeira.blocos():
+            atual = segmentacao.caracteristicas_parciais(bloco)
+            parciais = atual if parciais is None else segmentacao.combinar_caracteristicas([parciais, atual])
+            yield None, primeira.fracao / 2
+
+        clusters, rotulos = segmentacao.aplicar_modelo(parciais, reajustar=modo_perfis == 'reajustar')
+        blocos = (segmentacao.atribuir_clusters(bloco, clusters) for bloco in blocos)
+        inicio, peso = 0.5, 0.5
+
+    for resumo in agregados.agregados_parciais(blocos, limite_memoria=limite_memoria, rotulos_perfis=rotulos,
+                                               processos=processos, aproximado=aproximado, executor=executor):
+        yield resumo, inicio + peso * leitura.fracao
+
+
+def carregar_snapshot(caminho, modo_perfis='base', processos=1, aproximado=False, executor=None):
+    """Abre um snapshot; no modo 'base', os clusters gravados usam os rótulos salvos com ele, se houver."""
+    df = dados.carregar_snapshot(caminho)
+    rotulos = preparar_perfis(df, modo_perfis)
+    if modo_perfis == 'base':
+        rotulos = dados.rotulos_snapshot(caminho) or rotulos
+    return df, agregados.construir_agregados_paralelo(df, rotulos, processos, aproximado, executor)
+
+
+def anexar_delta(resumo, fonte, modo_perfis='base'):
+    """Atualiza os agregados com um lote de sinistros novos, lendo e preparando só o lote.
+
+    No modo 'base', se os agregados têm perfis, o lote também precisa da coluna `cluster`.
+    """
+    delta = dados.preparar_base(dados.ler_base(_abrir(fonte)))
+    if modo_perfis != 'base':
+        segmentacao.atribuir_clusters_incremental(delta, resumo.resumo_perfis.primeiro_cluster)
+    elif resumo.resumo_perfis is not None and 'cluster' not in delta.columns:
+        # Sem ela, os perfis da base não poderiam ser atualizados com o lote
+        raise dados.ColunasAusentes('Colunas ausentes no lote: cluster (a base principal tem a coluna)')
+    return agregados.atualizar_agregados(resumo, delta)
+
+
+#-------------------------------
+# Página inicial
+
+def metricas_resumo(resumo):
+    n_sinistros = resumo.n_sinistros
+    metricas = {
+        'n_sinistros': n_sinistros,
+        'n_segurados': resumo.n_segurados,
+        'sinistros_por_segurado': round(n_sinistros / resumo.n_segurados, 2),
+        'valor_maximo': round(float(resumo.valor_maximo), 2),
+        'prestador_mais_frequente': resumo.top('nome_prestador_sinistro', 1).index[0],
+    }
+    if resumo.aproximado:
+        # Margens das estimativas: erro típico dos segurados e excesso máximo da contagem do prestador
+        metricas['n_segurados_erro'] = resumo.erro_segurados
+        metricas['prestador_mais_frequente_erro'] = int(resumo.erro_top('nome_prestador_sinistro', 1).iloc[0])
+    return metricas
+
+
+def distribuicao_sexo(resumo):
+    quantidade = resumo.contagem('sexo_colaborador_sinistro').reindex(['F', 'M'], fill_value=0)
+    return pd.DataFrame({
+        'Sexo': ['Feminino', 'Masculino'],
+        'Quantidade de Ocorrências': quantidade.values
+    })
+
+
+def distribuicao_elegibilidade(resumo):
+    quantidade = resumo.contagem('elegibilidade_sinistro').sort_values(ascending=False)
+    return pd.DataFrame({
+        'Elegibilidade': quantidade.index.astype(str),
+        'Quantidade de Ocorrências': quantidade.values
+    })
+
+
+def faixa_etaria_sexo(resumo):
+    grouped = resumo.contagem(['faixa_etaria_colaborador_sinistro', 'sexo_colaborador_sinistro']).reset_index(name='count')
+    grouped['sexo_colaborador_sinistro'] = grouped['sexo_colaborador_sinistro'].map({'M': 'Masculino', 'F': 'Feminino'})
+    return grouped
+
+
+def ocorrencias_por_mes(resumo):
+    monthly_counts = resumo.contagem('month').drop(dados.MES_AUSENTE, errors='ignore').reset_index(name='count')
+    monthly_counts['month'] = dados.datas_dos_meses(monthly_counts['month'])
+    return monthly_counts
+
+
+def top_categorias(resumo, elegibilidade, n=3):
+    mais_usadas = resumo.top('categoria', n, elegibilidade_sinistro=elegibilidade)
+    return pd.DataFrame({
+        'Categoria': mais_usadas.index.astype(str),
+        'Quantidade de Ocorrências': mais_usadas.values
+    })
+
+
+def top_prestadores(resumo, elegibilidade, n=3):
+    mais_usados = resumo.top('nome_prestador_sinistro', n, elegibilidade_sinistro=elegibilidade)
+    tabela = pd.DataFrame({
+        'Prestador': mais_usados.index.astype(str),
+        'Quantidade de Ocorrências': mais_usados.values
+    })
+    if resumo.aproximado:
+        tabela['Erro Máximo'] = resumo.erro_top('nome_prestador_sinistro', n, elegibilidade_sinistro=elegibilidade).values
+    return tabela
+
+
+def serie_categoria(resumo, categoria, elegibilidades):
+    return resumo.serie_temporal.serie(categoria, elegibilidades)
+
+
+def series_categorias(resumo):
+    """Todas as séries da seção 'Série Temporal das Categorias', em formato longo."""
+    serie_temporal = resumo.serie_temporal
+    indice = pd.MultiIndex.from_product(
+        [serie_temporal.categorias, serie_temporal.elegibilidades, dados.datas_dos_meses(serie_temporal.meses)],
+        names=['categoria', 'elegibilidade_sinistro', 'month'],
+    )
+    return pd.DataFrame({'count': serie_temporal.contagens.ravel()}, index=indice).reset_index()
+
+
+#-------------------------------
+# Página de análises
+
+def perfis_ocorrencias(resumo_perfis):
+    tabela = resumo_perfis.tabela
+    return pd.DataFrame({'cluster': tabela['perfil'], 'quantidade': tabela['ocorrencias']}).reset_index(drop=True)
+
+
+def perfis_segurados(resumo_perfis):
+    tabela = resumo_perfis.tabela
+    return pd.DataFrame({'cluster': tabela['perfil'], 'quantidade': tabela['segurados']}).reset_index(drop=True)
+
+
+def perfis_top(resumo_perfis, coluna, n=3):
+    top = resumo_perfis.top(coluna, n)
+    top['cluster'] = top['cluster'].map(resumo_perfis.rotulos)
+    return top
+
+
+def perfis_valor_pago(resumo_perfis):
+    tabela = resumo_perfis.tabela
+    return pd.DataFrame({
+        'cluster': tabela['perfil'],
+        'valor_pago': tabela['valor_medio'],
+        'valor_mediano': tabela['valor_p50'],
+        'valor_p90': tabela['valor_p90']
+    }).reset_index(drop=True)
+
+
+#-------------------------------
+# Página de custos: cada fatia é um par (primeiro, último) de meses e listas de categorias
+# e faixas etárias (None seleciona tudo), lida dos cubos indexados dos agregados
+
+def custos_metricas(resumo, meses=None, categorias=None, faixas=None):
+    fatia = custos.fatiar(resumo.cubo_custos, meses, categorias, faixas)
+    n_sinistros = int(fatia['count'].sum())
+    valor_total = float(fatia['valor_total'].sum())
+    # Custo per capita: valor da fatia dividido pelos segurados distintos com sinistros na própria fatia
+    n_segurados = resumo.resumo_custos.n_segurados(meses, categorias, faixas)
+    # Quantis do período inteiro: o histograma de valores não é separado por mês
+    quantis = resumo.resumo_custos.quantis(custos.PERCENTIS_CUSTOS, categorias, faixas)
+    return {
+        'n_sinistros': n_sinistros,
+        'valor_total': round(valor_total, 2),
+        'valor_medio': round(valor_total / n_sinistros, 2) if n_sinistros else None,
+        **{f'valor_p{int(q * 100)}': round(float(valor), 2) for q, valor in quantis.items()},
+        'n_segurados': n_segurados,
+        'custo_per_capita': round(valor_total / n_segurados, 2) if n_segurados else None,
+    }
+
+
+def custos_por_mes(resumo, meses=None, categorias=None, faixas=None):
+    fatia = custos.fatiar(resumo.cubo_custos, meses, categorias, faixas)
+    por_mes = fatia.groupby(level='month').sum().drop(dados.MES_AUSENTE, errors='ignore').reset_index()
+    segurados = resumo.resumo_custos.segurados_por_mes(meses, categorias, faixas)
+    por_mes['segurados'] = segurados.reindex(por_mes['month'], fill_value=0).to_numpy()
+    por_mes['custo_per_capita'] = por_mes['valor_total'] / por_mes['segurados'].where(por_mes['segurados'] > 0)
+    por_mes['month'] = dados.datas_dos_meses(por_mes['month'])
+    return por_mes
+
+
+def custos_por_faixa(resumo, meses=None, categorias=None, faixas=None):
+    fatia = custos.fatiar(resumo.cubo_custos, meses, categorias, faixas)
+    por_faixa = fatia.groupby(level='faixa_etaria_colaborador_sinistro').sum()
+    por_faixa['segurados'] = (resumo.resumo_custos.segurados_por_faixa(meses, categorias, faixas)
+                              .reindex(por_faixa.index, fill_value=0))
+    por_faixa['custo_per_capita'] = por_faixa['valor_total'] / por_faixa['segurados'].where(por_faixa['segurados'] > 0)
+    return por_faixa.reset_index()
+
+
+def custos_por_categoria(resumo, meses=None, categorias=None, faixas=None):
+    fatia = custos.fatiar(resumo.cubo_custos, meses, categorias, faixas)
+    por_categoria = fatia.groupby(level='categoria').sum().sort_values('valor_total', ascending=False)
+    por_categoria['valor_medio'] = por_categoria['valor_total'] / por_categoria['count']
+    return por_categoria.reset_index()
+
+
+def top_segurados_custo(resumo, faixas=None, n=10):
+    """Segurados de maior valor pago em todo o período, nas faixas escolhidas."""
+    top = resumo.resumo_custos.top_segurados(n, faixas)
+    tabela = pd.DataFrame({'Segurado': top.index.astype(str), 'Valor Pago': top['valor_total'].values})
+    if resumo.aproximado:
+        tabela['Erro Máximo'] = top['erro'].values
+    else:
+        tabela['Sinistros'] = top['count'].values
+    return tabela
+
+
+def ranking_prestadores_custo(resumo, meses=None, categorias=None, faixas=None, n=10):
+    """Prestadores de maior valor pago em todo o período (da fatia, só o filtro de faixas se aplica)."""
+    top = resumo.resumo_custos.top_prestadores(n, faixas)
+    tabela = pd.DataFrame({'Prestador': top.index.astype(str), 'Valor Pago': top['valor_total'].values})
+    if resumo.aproximado:
+        tabela['Erro Máximo'] = top['erro'].values
+    else:
+        tabela['Sinistros'] = top['count'].values
+        tabela['Valor Médio'] = (top['valor_total'] / top['count']).values
+    return tabela
+
+
+#-------------------------------
+# Comparação de bases: `resumos` é um dicionário rótulo -> agregados de cada base.
+# Cada tabela é montada com as tabelas já calculadas de cada base (pequenas), sem juntar as linhas
+
+def _por_base(resumos, tabela):
+    return pd.concat({rotulo: tabela(resumo) for rotulo, resumo in resumos.items()},
+                     names=['base']).reset_index(level='base').reset_index(drop=True)
+
+
+def comparacao_metricas(resumos):
+    """Uma linha por base com o tamanho, a utilização e o custo (totais e por segurado)."""
+    linhas = {}
+    for rotulo, resumo in resumos.items():
+        metricas = metricas_resumo(resumo)
+        custo = custos_metricas(resumo)
+        meses = resumo.cubo_custos.index.get_level_values('month')
+        meses = dados.datas_dos_meses(meses[meses != dados.MES_AUSENTE])
+        linhas[rotulo] = {
+            'inicio': meses.min() if len(meses) else None,
+            'fim': meses.max() if len(meses) else None,
+            'n_sinistros': metricas['n_sinistros'],
+            'n_segurados': metricas['n_segurados'],
+            'sinistros_por_segurado': metricas['sinistros_por_segurado'],
+            'valor_total': custo['valor_total'],
+            'custo_per_capita': custo['custo_per_capita'],
+            'valor_medio': custo['valor_medio'],
+            'valor_p50': custo['valor_p50'],
+            'valor_p90': custo['valor_p90'],
+        }
+    tabela = pd.DataFrame.from_dict(linhas, orient='index')
+    tabela.index.name = 'base'
+    return tabela.reset_index()
+
+
+def comparacao_por_mes(resumos, medida='count', alinhamento='calendario'):
+    """Série mensal de `medida` ('count', 'valor_total' ou 'custo_per_capita') de cada base.
+
+    Com `alinhamento='relativo'`, o eixo é o número de meses desde o início de cada base, o
+    que permite sobrepor períodos diferentes (ex.: um ano contra o anterior).
+    """
+    def serie(resumo):
+        por_mes = custos_por_mes(resumo)[['month', medida]].rename(columns={medida: 'valor'})
+        if alinhamento == 'relativo':
+            inicio = por_mes['month'].min()
+            por_mes['month'] = ((por_mes['month'].dt.year - inicio.year) * 12
+                                + por_mes['month'].dt.month - inicio.month + 1)
+        return por_mes
+
+    return _por_base(resumos, serie)
+
+
+def comparacao_categorias(resumos, n=10):
+    """Participação (%) das `n` categorias mais frequentes no conjunto das bases, em cada base."""
+    def participacao(resumo):
+        contagem = resumo.contagem('categoria')
+        return (100 * contagem / contagem.sum()).rename('participacao').rename_axis('categoria').reset_index()
+
+    tabela = _por_base(resumos, participacao)
+    tabela['categoria'] = tabela['categoria'].astype(str)
+    principais = tabela.groupby('categoria')['participacao'].sum().nlargest(n).index
+    return tabela[tabela['categoria'].isin(principais)].reset_index(drop=True)
+
+
+def comparacao_faixas(resumos):
+    """Custo per capita e sinistros por segurado de cada faixa etária, em cada base."""
+    def por_faixa(resumo):
+        tabela = custos_por_faixa(resumo)
+        tabela['sinistros_por_segurado'] = tabela['count'] / tabela['segurados'].where(tabela['segurados'] > 0)
+        return tabela[['faixa_etaria_colaborador_sinistro', 'custo_per_capita', 'sinistros_por_segurado']]
+
+    return _por_base(resumos, por_faixa)
+
+
+#-------------------------------
+# Relatório em lote
+
+def gerar_relatorio(resumo):
+    """Todas as tabelas exibidas pelo dashboard, calculadas a partir dos agregados."""
+    tabelas = {
+        'metricas': pd.DataFrame([metricas_resumo(resumo)]),
+        'distribuicao_sexo': distribuicao_sexo(resumo),
+        'distribuicao_elegibilidade': distribuicao_elegibilidade(resumo),
+        'faixa_etaria_sexo': faixa_etaria_sexo(resumo),
+        'ocorrencias_por_mes': ocorrencias_por_mes(resumo),
+        'series_categorias': series_categorias(resumo),
+    }
+    for elegibilidade in ['Titular', 'Dependente']:
+        tabelas[f'top_categorias_{elegibilidade.lower()}'] = top_categorias(resumo, elegibilidade)
+        tabelas[f'top_prestadores_{elegibilidade.lower()}'] = top_prestadores(resumo, elegibilidade)
+
+    tabelas['custos'] = pd.DataFrame([custos_metricas(resumo)])
+    tabelas['custos_por_mes'] = custos_por_mes(resumo)
+    tabelas['custos_por_faixa'] = custos_por_faixa(resumo)
+    tabelas['custos_por_categoria'] = custos_por_categoria(resumo)
+    tabelas['top_segurados_custo'] = top_segurados_custo(resumo)
+    tabelas['ranking_prestadores_custo'] = ranking_prestadores_custo(resumo)
+
+    if resumo.resumo_perfis is not None:
+        tabelas['perfis'] = resumo.resumo_perfis.tabela.reset_index()
+        tabelas['perfis_ocorrencias'] = perfis_ocorrencias(resumo.resumo_perfis)
+        tabelas['perfis_segurados'] = perfis_segurados(resumo.resumo_perfis)
+        tabelas['perfis_top_categorias'] = perfis_top(resumo.resumo_perfis, 'categoria')
+        tabelas['perfis_top_prestadores'] = perfis_top(resumo.resumo_perfis, 'nome_prestador_sinistro')
+        tabelas['perfis_valor_pago'] = perfis_valor_pago(resumo.resumo_perfis)
+
+    return tabelas
+
+
+def salvar_relatorio(tabelas, destino, formato='json'):
+    """Grava as tabelas em `destino`: um arquivo JSON ou um diretório com um Parquet por tabela."""
+    destino = Path(destino)
+    if formato == 'parquet':
+        destino.mkdir(parents=True, exist_ok=True)
+        for nome, tabela in tabelas.items():
+            tabela.to_parquet(destino / f'{nome}.parquet', index=False)
+    else:
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        conteudo = {nome: json.loads(tabela.to_json(orient='records', date_format='iso'))
+                    for nome, tabela in tabelas.items()}
+        destino.write_text(json.dumps(conteudo, ensure_ascii=False, indent=2), encoding='utf-8')
+    return destino
+
+
+def processar_arquivo(caminho, saida, formato='json', modo_perfis='base', limite_memoria=None, processos=1,
+                      aproximado=False, log_desempenho=None):
+    """Gera e grava o relatório de uma base (executado em um processo separado por base)."""
+    if log_desempenho:
+        instrumentacao.configurar_log(log_desempenho)
+    caminho = Path(caminho)
+    resumo = carregar_base_em_blocos(caminho, limite_memoria=limite_memoria, modo_perfis=modo_perfis,
+                                     processos=processos, aproximado=aproximado)
+    destino = Path(saida) / (caminho.stem if formato == 'parquet' else f'{caminho.stem}.json')
+    return salvar_relatorio(gerar_relatorio(resumo), destino, formato)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Gera os agregados do dashboard UniData para bases de sinistros.')
+    parser.add_argument('bases', nargs='+', help='arquivos CSV de sinistros')
+    parser.add_argument('--saida', default='relatorios', help='diretório de saída (padrão: relatorios)')
+    parser.add_argument('--formato', choices=['json', 'parquet'], default='json')
+    parser.add_argument('--perfis', choices=MODOS_PERFIS, default='base',
+                        help="origem dos perfis: coluna cluster da base, GMM salvo ou GMM reajustado")
+    parser.add_argument('--limite-memoria', type=int, help='limite de memória por base, em MB')
+    parser.add_argument('--processos', type=int, default=1, help='bases processadas em paralelo')
+    parser.add_argument('--processos-agregacao', type=int, default=1,
+                        help='processos que agregam os blocos de cada base em paralelo')
+    parser.add_argument('--aproximado', action='store_true',
+                        help='estima segurados distintos e prestadores mais frequentes com esboços de memória fixa')
+    parser.add_argument('--log-desempenho', help='arquivo JSON Lines com a duração e as linhas de cada etapa')
+    args = parser.parse_args(argv)
+
+    limite_memoria = args.limite_memoria * 2**20 if args.limite_memoria else None
+    with agregados.criar_executor(args.processos) as executor:
+        futuros = {
+            executor.submit(processar_arquivo, base, args.saida, args.formato, args.perfis, limite_memoria,
+                            args.processos_agregacao, args.aproximado, args.log_desempenho): base
+            for base in args.bases
+        }
+        for futuro, base in futuros.items():
+            print(f'{base} -> {futuro.result()}')
+
+
+if __name__ == '__main__':
+    main()
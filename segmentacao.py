@@ -0,0 +1,215 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import instrumentacao
+
+
+# Modelo salvo, reaproveitado pelas próximas bases (atualizações mensais apenas atribuem perfis)
+CAMINHO_MODELO = Path(os.environ.get('UNIDATA_MODELO', 'modelos/gmm.npz'))
+
+N_COMPONENTES = 3
+
+# Colunas cujas proporções por segurado formam o vetor de características
+COLUNAS_CARACTERISTICAS = ['sexo_colaborador_sinistro', 'faixa_etaria_colaborador_sinistro', 'categoria']
+
+# Variância mínima de cada componente, evitando componentes degenerados
+REGULARIZACAO = 1e-6
+
+
+@instrumentacao.medido('caracteristicas_segurados')
+def caracteristicas_parciais(df):
+    """Somas por segurado (contagens por sexo, faixa etária e categoria, e valor pago) de uma parte da base.
+
+    As somas de partes distintas são combinadas com `combinar_caracteristicas`.
+    """
+    partes = []
+    for coluna in COLUNAS_CARACTERISTICAS:
+        contagem = df.groupby(['segurado', coluna], observed=True).size().unstack(fill_value=0)
+        contagem.columns = [f'{coluna}={valor}' for valor in contagem.columns]
+        partes.append(contagem)
+
+    totais = df.groupby('segurado', observed=True)['valor_pago_sinistro'].agg(n_sinistros='size', valor_total='sum')
+    parciais = pd.concat([*partes, totais], axis=1).fillna(0)
+    parciais.index = parciais.index.astype(str)
+    return parciais
+
+
+def combinar_caracteristicas(partes):
+    return pd.concat(partes).fillna(0).groupby(level=0).sum()
+
+
+def caracteristicas_em_blocos(blocos):
+    """Acumula as somas por segurado de uma base lida em blocos."""
+    parciais = None
+    for bloco in blocos:
+        atual = caracteristicas_parciais(bloco)
+        parciais = atual if parciais is None else combinar_caracteristicas([parciais, atual])
+    return parciais
+
+
+def matriz_caracteristicas(parciais, colunas=None):
+    """Vetores por segurado: proporção de sinistros em cada valor das colunas e log do valor médio pago."""
+    n_sinistros = parciais['n_sinistros'].to_numpy()
+    proporcoes = parciais.drop(columns=['n_sinistros', 'valor_total'])
+    if colunas is not None:
+        # Alinha ao espaço de características do modelo já ajustado
+        proporcoes = proporcoes.reindex(columns=colunas, fill_value=0)
+
+    X = np.column_stack([
+        proporcoes.to_numpy(dtype=float) / n_sinistros[:, None],
+        np.log1p(parciais['valor_total'].to_numpy() / n_sinistros),
+    ])
+    return X, list(proporcoes.columns)
+
+
+class ModeloGMM:
+    """Mistura de gaussianas com covariâncias diagonais, ajustada por EM vetorizado em NumPy."""
+
+    def __init__(self, n_componentes=N_COMPONENTES, max_iteracoes=200, tolerancia=1e-4, semente=0):
+        self.n_componentes = n_componentes
+        self.max_iteracoes = max_iteracoes
+        self.tolerancia = tolerancia
+        self.semente = semente
+        self.colunas = None
+
+    @property
+    def ajustado(self):
+        return self.colunas is not None
+
+    def _padronizar(self, X):
+        return (X - self.centro_) / self.escala_
+
+    def _log_densidades(self, Z):
+        # log(peso) + log N(z | média, variância) para cada par (linha, componente), sem tensores n x k x d
+        precisoes = 1 / self.variancias_
+        distancias = (Z ** 2) @ precisoes.T - 2 * Z @ (self.medias_ * precisoes).T \
+            + (self.medias_ ** 2 * precisoes).sum(axis=1)
+        return np.log(self.pesos_) - 0.5 * (np.log(2 * np.pi * self.variancias_).sum(axis=1) + distancias)
+
+    def _responsabilidades(self, Z):
+        log_densidades = self._log_densidades(Z)
+        maximo = log_densidades.max(axis=1, keepdims=True)
+        log_total = maximo + np.log(np.exp(log_densidades - maximo).sum(axis=1, keepdims=True))
+        return np.exp(log_densidades - log_total), log_total.mean()
+
+    def ajustar(self, X, colunas):
+        """Ajusta o modelo por EM.
+
+        Se o modelo já estiver ajustado, o EM parte dos parâmetros atuais (warm start)
+        e `X` deve estar alinhado às colunas do ajuste anterior.
+        """
+        continuar = self.ajustado
+        if not continuar:
+            self.colunas = list(colunas)
+            self.centro_ = X.mean(axis=0)
+            self.escala_ = np.where(X.std(axis=0) > 0, X.std(axis=0), 1)
+
+        Z = self._padronizar(X)
+        if not continuar:
+            gerador = np.random.default_rng(self.semente)
+            self.medias_ = Z[gerador.choice(len(Z), self.n_componentes, replace=False)]
+            self.variancias_ = np.tile(Z.var(axis=0) + REGULARIZACAO, (self.n_componentes, 1))
+            self.pesos_ = np.full(self.n_componentes, 1 / self.n_componentes)
+
+        anterior = -np.inf
+        for _ in range(self.max_iteracoes):
+            R, log_verossimilhanca = self._responsabilidades(Z)
+
+            totais = R.sum(axis=0) + 10 * np.finfo(float).eps
+            self.pesos_ = totais / totais.sum()
+            self.medias_ = (R.T @ Z) / totais[:, None]
+            self.variancias_ = (R.T @ Z ** 2) / totais[:, None] - self.medias_ ** 2 + REGULARIZACAO
+
+            if abs(log_verossimilhanca - anterior) < self.tolerancia:
+                break
+            anterior = log_verossimilhanca
+
+        return self
+
+    def prever(self, X):
+        """Componente mais provável de cada linha (colunas alinhadas às do ajuste)."""
+        return self._log_densidades(self._padronizar(X)).argmax(axis=1)
+
+    def rotulos(self):
+        """Número do perfil exibido para cada componente."""
+        return {componente: str(componente + 1) for componente in range(self.n_componentes)}
+
+    def salvar(self, caminho=CAMINHO_MODELO):
+        caminho = Path(caminho)
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        # Grava em um arquivo temporário: outros processos podem estar lendo ou salvando o mesmo modelo
+        temporario = caminho.with_name(f'{caminho.stem}.{os.getpid()}.tmp.npz')
+        np.savez(temporario, colunas=np.array(self.colunas), centro=self.centro_, escala=self.escala_,
+                 pesos=self.pesos_, medias=self.medias_, variancias=self.variancias_)
+        temporario.replace(caminho)
+
+    @classmethod
+    def carregar(cls, caminho=CAMINHO_MODELO):
+        with np.load(caminho) as arquivo:
+            modelo = cls(n_componentes=len(arquivo['pesos']))
+            modelo.colunas = arquivo['colunas'].tolist()
+            modelo.centro_ = arquivo['centro']
+            modelo.escala_ = arquivo['escala']
+            modelo.pesos_ = arquivo['pesos']
+            modelo.medias_ = arquivo['medias']
+            modelo.variancias_ = arquivo['variancias']
+        return modelo
+
+
+def obter_modelo(caminho=CAMINHO_MODELO):
+    """O modelo salvo, se existir; caso contrário, um modelo novo ainda não ajustado."""
+    if Path(caminho).exists():
+        return ModeloGMM.carregar(caminho)
+    return ModeloGMM()
+
+
+def segmentar(parciais, modelo, reajustar=False):
+    """Atribui um cluster a cada segurado, ajustando o modelo antes se necessário.
+
+    Um modelo já ajustado só é reajustado com `reajustar=True`, partindo dos
+    parâmetros anteriores em vez de recomeçar do zero.
+    """
+    X, colunas = matriz_caracteristicas(parciais, modelo.colunas)
+    if not modelo.ajustado or reajustar:
+        modelo.ajustar(X, colunas)
+    return pd.Series(modelo.prever(X), index=parciais.index, name='cluster')
+
+
+def atribuir_clusters(df, clusters):
+    """Escreve no DataFrame o cluster de cada sinistro, a partir do cluster do seu segurado."""
+    df['cluster'] = df['segurado'].astype(str).map(clusters).astype('Int64')
+    return df
+
+
+@instrumentacao.medido('perfis_gmm')
+def aplicar_modelo(parciais, reajustar=False, caminho=CAMINHO_MODELO):
+    """Segmenta os segurados com o modelo salvo em `caminho`, ajustando-o e salvando-o se necessário.
+
+    Devolve o cluster de cada segurado e o número do perfil de cada cluster.
+    """
+    modelo = obter_modelo(caminho)
+    ajustar = reajustar or not modelo.ajustado
+    clusters = segmentar(parciais, modelo, reajustar=reajustar)
+    if ajustar:
+        modelo.salvar(caminho)
+    return clusters, modelo.rotulos()
+
+
+def atribuir_clusters_incremental(df, conhecidos, caminho=CAMINHO_MODELO):
+    """Atribui clusters a um lote novo sem reajustar o modelo.
+
+    Segurados já segmentados (`conhecidos`: segurado -> cluster) mantêm o cluster;
+    apenas os segurados novos passam pelo modelo salvo, com as características do lote.
+    """
+    segurados = df['segurado'].astype(str)
+    novos = df.loc[~segurados.isin(conhecidos.index)]
+    clusters = conhecidos
+    if len(novos):
+        modelo = ModeloGMM.carregar(caminho)
+        parciais = caracteristicas_parciais(novos)
+        X, _ = matriz_caracteristicas(parciais, modelo.colunas)
+        clusters = pd.concat([conhecidos, pd.Series(modelo.prever(X), index=parciais.index)])
+    return atribuir_clusters(df, clusters)
@@ -0,0 +1,36 @@
+"""Executa o `main.py` no AppTest com os uploads simulados (o AppTest não envia arquivos).
+
+A base enviada vem de `UNIDATA_TESTE_BASE` e os lotes anexados, de `UNIDATA_TESTE_LOTES`
+(caminhos separados por `os.pathsep`).
+"""
+import io
+import os
+import runpy
+from pathlib import Path
+
+import streamlit as st
+
+
+class ArquivoEnviado(io.BytesIO):
+    """O mínimo de `UploadedFile` usado pelo dashboard."""
+
+    def __init__(self, caminho):
+        super().__init__(Path(caminho).read_bytes())
+        self.name = Path(caminho).name
+        self.file_id = f'teste-{self.name}'
+        self.size = len(self.getvalue())
+
+
+def enviar_arquivo(*args, accept_multiple_files=False, key=None, **kwargs):
+    if key == 'uploads_comparacao':
+        return []
+    if accept_multiple_files:
+        return [ArquivoEnviado(caminho) for caminho in os.environ.get('UNIDATA_TESTE_LOTES', '').split(os.pathsep)
+                if caminho]
+    caminho = os.environ.get('UNIDATA_TESTE_BASE')
+    return ArquivoEnviado(caminho) if caminho else None
+
+
+st.file_uploader = enviar_arquivo
+st.sidebar.file_uploader = enviar_arquivo
+runpy.run_path(str(Path(__file__).resolve().parent.parent / 'main.py'), run_name='__main__')
@@ -0,0 +1,33 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from benchmarks import gerador  # noqa: E402
+
+
+# Linhas das bases sintéticas dos testes: o bastante para vários blocos e prestadores fora do top
+LINHAS_TESTE = 20_000
+
+
+@pytest.fixture(scope='session')
+def base_csv(tmp_path_factory):
+    return gerador.gerar_base(LINHAS_TESTE, tmp_path_factory.mktemp('bases') / 'base.csv')
+
+
+def assert_relatorios_iguais(esperado, obtido):
+    """Compara todas as tabelas do dashboard (`relatorio.gerar_relatorio`) de dois agregados."""
+    import relatorio
+
+    esperadas, obtidas = relatorio.gerar_relatorio(esperado), relatorio.gerar_relatorio(obtido)
+    assert esperadas.keys() == obtidas.keys()
+    for nome, tabela in esperadas.items():
+        if isinstance(tabela, pd.DataFrame):
+            pd.testing.assert_frame_equal(tabela.reset_index(drop=True), obtidas[nome].reset_index(drop=True),
+                                          check_dtype=False, check_categorical=False, obj=nome)
+        else:
+            assert tabela == obtidas[nome], nome
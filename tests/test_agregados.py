@@ -0,0 +1,115 @@
+"""Os caminhos de carregamento (em blocos, em paralelo, com lotes anexados) devem dar os mesmos agregados."""
+import pandas as pd
+import pytest
+
+import agregados
+import dados
+import relatorio
+from benchmarks import gerador
+from conftest import assert_relatorios_iguais
+
+
+TAMANHO_BLOCO_TESTE = 3_000
+
+
+@pytest.fixture(scope='module')
+def em_memoria(base_csv):
+    return relatorio.carregar_base(base_csv)[1]
+
+
+@pytest.fixture(scope='module')
+def executor():
+    with agregados.criar_executor(2) as executor:
+        yield executor
+
+
+def test_em_blocos_igual_em_memoria(base_csv, em_memoria):
+    resumo = agregados.agregar_em_blocos(dados.ler_em_blocos(base_csv, tamanho_bloco=TAMANHO_BLOCO_TESTE))
+    assert_relatorios_iguais(em_memoria, resumo)
+
+
+def test_em_blocos_de_arquivo_aberto(base_csv, em_memoria):
+    # Como o upload do Streamlit: lido do buffer, do início, e ainda aberto depois (para uma nova leitura)
+    with open(base_csv, 'rb') as arquivo:
+        arquivo.read(100)
+        resumo = relatorio.carregar_base_em_blocos(arquivo)
+        assert not arquivo.closed
+        assert_relatorios_iguais(em_memoria, resumo)
+        assert_relatorios_iguais(em_memoria, relatorio.carregar_base_em_blocos(arquivo))
+
+
+def test_em_blocos_mantem_categoricas(base_csv):
+    resumo = agregados.agregar_em_blocos(dados.ler_em_blocos(base_csv, tamanho_bloco=TAMANHO_BLOCO_TESTE))
+    for coluna in ['categoria', 'elegibilidade_sinistro', 'faixa_etaria_colaborador_sinistro']:
+        assert isinstance(resumo.cubo[coluna].dtype, pd.CategoricalDtype)
+    assert isinstance(resumo.prestadores['nome_prestador_sinistro'].dtype, pd.CategoricalDtype)
+
+
+def test_parciais_em_potencias_de_dois(base_csv):
+    blocos = dados.ler_em_blocos(base_csv, tamanho_bloco=TAMANHO_BLOCO_TESTE)
+    parciais = list(agregados.agregados_parciais(blocos))
+    # 7 blocos: acumulados após os blocos 1, 2 e 4 e, depois do sétimo, o resultado final
+    assert [i for i, parcial in enumerate(parciais, start=1) if parcial is not None] == [1, 2, 4, 8]
+    assert [parcial.n_sinistros for parcial in parciais if parcial is not None] == [3_000, 6_000, 12_000, 20_000]
+
+
+def test_parciais_a_cada_intervalo_de_blocos(base_csv, em_memoria, monkeypatch):
+    monkeypatch.setattr(agregados, 'BLOCOS_ENTRE_PARCIAIS', 2)
+    blocos = dados.ler_em_blocos(base_csv, tamanho_bloco=TAMANHO_BLOCO_TESTE)
+    parciais = list(agregados.agregados_parciais(blocos))
+    # Blocos 1 e 2 (potências de dois), depois a cada dois blocos e, ao final, o resultado completo
+    assert [i for i, parcial in enumerate(parciais, start=1) if parcial is not None] == [1, 2, 4, 6, 8]
+    assert [parcial.n_sinistros for parcial in parciais if parcial is not None] == [3_000, 6_000, 12_000, 18_000,
+                                                                                    20_000]
+    assert_relatorios_iguais(em_memoria, parciais[-1])
+
+
+def test_em_blocos_paralelo_igual_em_memoria(base_csv, em_memoria, executor):
+    blocos = dados.ler_em_blocos(base_csv, tamanho_bloco=TAMANHO_BLOCO_TESTE)
+    resumo = agregados.agregar_em_blocos(blocos, processos=2, executor=executor)
+    assert_relatorios_iguais(em_memoria, resumo)
+
+
+def test_paralelo_igual_em_memoria(base_csv, em_memoria, executor, monkeypatch):
+    monkeypatch.setattr(agregados, 'LINHAS_MINIMAS_PARALELO', 0)
+    _, resumo = relatorio.carregar_base(base_csv, processos=2, executor=executor)
+    assert_relatorios_iguais(em_memoria, resumo)
+
+
+def test_delta_igual_em_memoria(base_csv, em_memoria, tmp_path):
+    base = pd.read_csv(base_csv)
+    corte = len(base) * 3 // 4
+    base.iloc[:corte].to_csv(tmp_path / 'inicio.csv', index=False)
+    base.iloc[corte:].to_csv(tmp_path / 'delta.csv', index=False)
+
+    _, resumo = relatorio.carregar_base(tmp_path / 'inicio.csv')
+    resumo = relatorio.anexar_delta(resumo, tmp_path / 'delta.csv')
+    assert_relatorios_iguais(em_memoria, resumo)
+
+
+def test_delta_sem_cluster_recusado(base_csv, tmp_path):
+    _, resumo = relatorio.carregar_base(base_csv)
+    pd.read_csv(base_csv, nrows=100).drop(columns=['cluster']).to_csv(tmp_path / 'delta.csv', index=False)
+    with pytest.raises(dados.ColunasAusentes):
+        relatorio.anexar_delta(resumo, tmp_path / 'delta.csv')
+
+
+def test_limite_de_memoria(base_csv):
+    with pytest.raises(dados.LimiteMemoriaExcedido):
+        agregados.agregar_em_blocos(dados.ler_em_blocos(base_csv, tamanho_bloco=TAMANHO_BLOCO_TESTE),
+                                    limite_memoria=2**10)
+
+
+@pytest.mark.parametrize('aproximado', [False, True])
+def test_tamanho_nao_acompanha_as_linhas(aproximado):
+    # Mesma população de segurados e prestadores, quatro vezes mais sinistros. Sem a coluna `cluster`:
+    # o resumo dos perfis guarda a distribuição exata dos valores pagos de cada perfil
+    tamanhos = {}
+    for linhas in [100_000, 400_000]:
+        base = pd.concat(gerador.gerar_blocos(linhas, n_segurados=2_000)).drop(columns=['cluster'])
+        df, resumo = relatorio.carregar_base(base.to_csv(index=False).encode(), aproximado=aproximado)
+        tamanhos[linhas] = resumo.memoria(), int(df.memory_usage(deep=True).sum())
+
+    (agregados_menor, _), (agregados_maior, base_maior) = tamanhos[100_000], tamanhos[400_000]
+    assert agregados_maior < 1.5 * agregados_menor
+    assert agregados_maior < base_maior / 2
@@ -0,0 +1,68 @@
+"""Página de custos: população do custo per capita de cada fatia e quantis do valor pago."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import custos
+import relatorio
+
+FAIXA = 'faixa_etaria_colaborador_sinistro'
+
+
+@pytest.fixture(scope='module')
+def base(base_csv):
+    return relatorio.carregar_base(base_csv)
+
+
+@pytest.fixture(scope='module')
+def fatia(base):
+    # Doze meses do meio do período, duas categorias e três faixas
+    df, _ = base
+    meses = np.sort(df['month'].unique())
+    categorias = tuple(df['categoria'].value_counts().index[:2].astype(str))
+    faixas = tuple(df[FAIXA].value_counts().index[:3].astype(str))
+    return (int(meses[12]), int(meses[23])), categorias, faixas
+
+
+def na_fatia(df, meses, categorias, faixas):
+    return df[df['month'].between(*meses) & df['categoria'].isin(categorias) & df[FAIXA].isin(faixas)]
+
+
+def test_per_capita_da_fatia(base, fatia):
+    df, resumo = base
+    esperado = na_fatia(df, *fatia)
+
+    metricas = relatorio.custos_metricas(resumo, *fatia)
+    assert metricas['n_segurados'] == esperado['segurado'].nunique()
+    assert metricas['custo_per_capita'] == round(esperado['valor_pago_sinistro'].sum() / esperado['segurado'].nunique(), 2)
+
+    por_mes = relatorio.custos_por_mes(resumo, *fatia).set_index('month')
+    segurados_mes = esperado.groupby('month')['segurado'].nunique()
+    assert por_mes['segurados'].tolist() == segurados_mes.tolist()
+
+    por_faixa = relatorio.custos_por_faixa(resumo, *fatia).set_index(FAIXA)
+    segurados_faixa = esperado.groupby(FAIXA, observed=True)['segurado'].nunique()
+    assert por_faixa['segurados'].to_dict() == segurados_faixa.rename(str).to_dict()
+
+
+def test_per_capita_aproximado_dentro_do_erro(base_csv, base, fatia):
+    df, _ = base
+    _, aproximado = relatorio.carregar_base(base_csv, aproximado=True)
+    esperado = na_fatia(df, *fatia)
+
+    # HyperLogLog das células, com erro típico de ~6,5%: quatro desvios, folgados
+    reais = esperado.groupby('month')['segurado'].nunique().to_numpy()
+    estimados = relatorio.custos_por_mes(aproximado, *fatia)['segurados'].to_numpy()
+    assert (np.abs(estimados - reais) <= 4 * 0.065 * reais + 1).all()
+    real = esperado['segurado'].nunique()
+    assert abs(relatorio.custos_metricas(aproximado, *fatia)['n_segurados'] - real) <= 4 * 0.065 * real + 1
+
+
+@pytest.mark.parametrize('categorias', [None, ('Exames',), ('Terapias', 'Cirurgias')])
+def test_quantis_dentro_da_largura_da_classe(base, categorias):
+    df, resumo = base
+    valores = df['valor_pago_sinistro'] if categorias is None else df.loc[df['categoria'].isin(categorias),
+                                                                          'valor_pago_sinistro']
+    reais = np.quantile(valores.dropna(), custos.PERCENTIS_CUSTOS)
+    estimados = resumo.resumo_custos.quantis(custos.PERCENTIS_CUSTOS, categorias).to_numpy()
+    assert (np.abs(estimados / reais - 1) <= custos.RAZAO_CLASSES - 1).all()
@@ -0,0 +1,57 @@
+"""Limites de erro dos esboços do modo aproximado, inclusive depois de combinados entre blocos."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import esbocos
+import relatorio
+
+
+@pytest.mark.parametrize('distintos', [100, 5_000, 200_000])
+def test_hyperloglog_dentro_do_erro(distintos):
+    valores = pd.Series(np.arange(distintos)).astype(str)
+    hll = esbocos.HyperLogLog().adicionar(valores)
+    # Quatro desvios-padrão: uma falha aqui é um erro de implementação, não azar
+    assert abs(hll.estimativa() - distintos) <= 4 * hll.erro_relativo * distintos + 1
+
+
+def test_hyperloglog_combinado_igual_ao_direto():
+    valores = pd.Series(np.random.default_rng(0).integers(0, 50_000, 100_000)).astype(str)
+    direto = esbocos.HyperLogLog().adicionar(valores)
+    partes = [esbocos.HyperLogLog().adicionar(parte) for parte in np.array_split(valores, 7)]
+    combinado = partes[0]
+    for parte in partes[1:]:
+        combinado = combinado.combinar(parte)
+    assert np.array_equal(combinado.registros, direto.registros)
+
+
+def test_space_saving_limites():
+    gerador = np.random.default_rng(0)
+    pesos = 1 / np.arange(1, 2_001) ** 1.1
+    valores = pd.Series(gerador.choice(2_000, 60_000, p=pesos / pesos.sum())).astype(str)
+    reais = valores.value_counts()
+
+    partes = [esbocos.SpaceSaving.de_valores(parte, capacidade=50) for parte in np.array_split(valores, 12)]
+    resumo = partes[0]
+    for parte in partes[1:]:
+        resumo = resumo.combinar(parte)
+
+    # Cada contagem monitorada fica entre a real e a real mais o erro informado
+    monitoradas = reais.reindex(resumo.contagens.index, fill_value=0)
+    assert (resumo.contagens >= monitoradas).all()
+    assert (resumo.contagens - resumo.erros <= monitoradas).all()
+    # E nenhum valor fora do resumo ocorreu mais que `limite` vezes
+    assert (reais.drop(resumo.contagens.index) <= resumo.limite).all()
+
+
+def test_modo_aproximado_dentro_do_erro(base_csv):
+    df, exato = relatorio.carregar_base(base_csv)
+    _, aproximado = relatorio.carregar_base(base_csv, aproximado=True)
+
+    assert abs(aproximado.n_segurados - exato.n_segurados) <= 4 * aproximado.erro_segurados + 1
+    for elegibilidade in ['Titular', 'Dependente']:
+        reais = df.loc[df['elegibilidade_sinistro'] == elegibilidade, 'nome_prestador_sinistro'].value_counts()
+        top = aproximado.top('nome_prestador_sinistro', 3, elegibilidade_sinistro=elegibilidade)
+        erros = aproximado.erro_top('nome_prestador_sinistro', 3, elegibilidade_sinistro=elegibilidade)
+        assert (top >= reais[top.index]).all()
+        assert (top - erros <= reais[top.index]).all()
@@ -0,0 +1,85 @@
+"""Smoke test do dashboard: as páginas abrem sem exceções com uma base sintética."""
+import time
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from streamlit import config
+from streamlit.testing.v1 import AppTest
+
+APP = str(Path(__file__).resolve().parent / 'app_teste.py')
+
+
+@pytest.fixture
+def app(base_csv, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('UNIDATA_SNAPSHOTS', str(tmp_path / 'snapshots'))
+    monkeypatch.setenv('UNIDATA_PROCESSOS', '1')
+    monkeypatch.setenv('UNIDATA_TESTE_BASE', str(base_csv))
+    monkeypatch.delenv('UNIDATA_TESTE_LOTES', raising=False)
+    return AppTest.from_file(APP, default_timeout=120)
+
+
+def ler_em_blocos(app):
+    next(caixa for caixa in app.sidebar.checkbox if caixa.label.startswith('Leitura em blocos')).check().run()
+    # O carregamento roda em segundo plano: a página é reexecutada até a barra de progresso sumir
+    for _ in range(300):
+        if not app.get('progress'):
+            return app
+        time.sleep(0.1)
+        app.run()
+    raise TimeoutError('o carregamento em blocos não terminou')
+
+
+def abrir_pagina(app, rotulo):
+    next(botao for botao in app.button if botao.label == rotulo).click().run()
+    # A troca de página vale a partir da execução seguinte
+    app.run()
+
+
+def test_paginas(app):
+    app.run()
+    assert not app.exception
+    assert app.get('vega_lite_chart')
+
+    abrir_pagina(app, 'Veja Nossas Análises')
+    assert not app.exception
+    assert 'Conclusões' in [cabecalho.value for cabecalho in app.header]
+
+    abrir_pagina(app, 'Voltar para Home')
+    abrir_pagina(app, 'Veja os Custos')
+    assert not app.exception
+    assert app.get('vega_lite_chart')
+
+
+def test_lotes_anexados(app, base_csv, tmp_path, monkeypatch):
+    lote = tmp_path / 'lote.csv'
+    pd.read_csv(base_csv, nrows=500).to_csv(lote, index=False)
+    monkeypatch.setenv('UNIDATA_TESTE_LOTES', str(lote))
+    app.run()
+    assert not app.exception
+    assert not app.sidebar.error
+
+
+def test_leitura_em_blocos(app):
+    ler_em_blocos(app.run())
+    assert not app.exception
+    assert app.get('vega_lite_chart')
+
+    # Outra sessão abre a mesma base, já no registro, sem um novo carregamento
+    outra = ler_em_blocos(AppTest.from_file(APP, default_timeout=120).run())
+    assert not outra.exception
+    assert outra.get('vega_lite_chart')
+
+
+def test_upload_grande_em_blocos(app):
+    # Com um limite de upload de 1 MB, a base de teste (mais de 0,5 MB) já abre com a leitura em blocos
+    limite = config.get_option('server.maxUploadSize')
+    config.set_option('server.maxUploadSize', 1)
+    try:
+        app.run()
+    finally:
+        config.set_option('server.maxUploadSize', limite)
+    caixa = next(caixa for caixa in app.sidebar.checkbox if caixa.label.startswith('Leitura em blocos'))
+    assert caixa.value
+    assert not app.exception
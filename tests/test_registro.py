@@ -0,0 +1,55 @@
+"""Carregamentos em segundo plano entregam o resultado ao registro de bases, sem depender das sessões."""
+import time
+
+import pytest
+
+import registro
+
+
+def esperar_remocao(carregamentos, chave):
+    for _ in range(100):
+        if chave not in carregamentos._carregamentos:
+            return
+        time.sleep(0.01)
+    raise TimeoutError(chave)
+
+
+def test_carregamento_concluido_vai_para_o_registro():
+    bases = registro.RegistroBases(max_ociosas=2)
+    carregamentos = registro.Carregamentos(bases, lambda resultado: ('valor', resultado))
+
+    carregamento = carregamentos.iniciar('base', lambda: iter([(1, 0.5), (None, 0.8), (2, 1.0)]))
+    assert carregamento.resultado() == 2
+    esperar_remocao(carregamentos, 'base')
+
+    # Nenhuma sessão voltou a consultá-lo: a base está no registro, ociosa
+    assert bases.carregada('base')
+    assert bases.referencias() == {'base': 0}
+    assert bases.adquirir('base', lambda: pytest.fail('recarregada')).valor == ('valor', 2)
+
+
+def test_carregamento_com_erro_fica_ate_ser_removido():
+    def etapas():
+        yield 'parcial', 0.5
+        raise ValueError('base inválida')
+
+    bases = registro.RegistroBases()
+    carregamentos = registro.Carregamentos(bases)
+    carregamento = carregamentos.iniciar('base', etapas)
+    with pytest.raises(ValueError):
+        carregamento.resultado()
+
+    assert carregamento.parcial is None
+    assert not bases.carregada('base')
+    assert carregamentos.iniciar('base', etapas) is carregamento
+    carregamentos.remover('base', carregamento)
+    assert carregamentos.iniciar('base', lambda: iter([('nova', 1.0)])).resultado() == 'nova'
+
+
+def test_ociosa_mais_recente_acima_do_limite_de_memoria():
+    bases = registro.RegistroBases(max_ociosas=2, max_memoria_ociosas=10, tamanho=len)
+    bases.adquirir('a', lambda: 'x' * 8).liberar()
+    # Sozinha, `b` ultrapassa o limite: fica disponível, e a ociosa mais antiga é descartada
+    bases.adquirir('b', lambda: 'x' * 20).liberar()
+    assert bases.carregada('b')
+    assert not bases.carregada('a')